@@ -0,0 +1,29 @@
+"""
+Async version of the profile of the signed-in user, served under ASGI
+(see core.async_views).
+"""
+from rest_framework.response import Response
+
+from .models import User, EmployeeProfile, CompanyProfile
+from .serializers import UserSerializer
+
+PROFILE_MODELS = {
+    'EMPLOYEE': (EmployeeProfile, User.employeeprofile),
+    'EMPLOYER': (CompanyProfile, User.companyprofile),
+}
+
+
+async def user_profile(view, request):
+    user = request.user
+    # The user itself comes from the token; only the profile with the
+    # image is read, and cached on the user for the serializer
+    if user.role in PROFILE_MODELS:
+        model, descriptor = PROFILE_MODELS[user.role]
+        profile = await model.objects.filter(user_id=user.pk).afirst()
+        descriptor.related.set_cached_value(user, profile)
+    return Response(UserSerializer(user, context={'request': request}).data)
+
+
+HANDLERS = {
+    'user_profile': user_profile,
+}
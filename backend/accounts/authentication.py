@@ -0,0 +1,48 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+from .user_cache import user_cache
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that builds ``request.user`` from the token claims
+    instead of selecting the user row on every request.
+
+    For safe (read-only) methods the user is a real ``User`` instance with
+    only the id and the claim fields loaded; reading any other field loads
+    the full row once from the per-process user cache (see
+    ``User.refresh_from_db``). Writes, and tokens without the claims, get
+    the full user from the user cache and are refused if it is inactive.
+
+    So a deactivated user can still read until their access token expires,
+    but can no longer write once the user cache has seen the change (at
+    once in the process that saved it, within ``USER_CACHE_TTL`` elsewhere).
+    """
+    claims_only = False
+
+    def authenticate(self, request):
+        self.claims_only = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        if self.claims_only and all(claim in validated_token for claim in User.CLAIM_FIELDS):
+            return User.from_claims(user_id, validated_token)
+
+        try:
+            user = user_cache.get(user_id)
+        except User.DoesNotExist:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
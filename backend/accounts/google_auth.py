@@ -1,13 +1,11 @@
-from google.oauth2 import id_token
-from google.auth.transport import requests
 from django.conf import settings
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken
 from .models import User
-from .serializers import UserSerializer
+from .serializers import CustomTokenObtainPairSerializer, UserSerializer
+from .google_keys import get_key_store
 import os
 
 @api_view(['POST'])
@@ -23,11 +21,8 @@ def google_login(request):
 
         client_id = os.getenv('GOOGLE_CLIENT_ID')
         try:
-            idinfo = id_token.verify_oauth2_token(
-                token, 
-                requests.Request(), 
-                client_id
-            )
+            # Verified locally against cached Google signing keys
+            idinfo = get_key_store().verify(token, client_id)
 
             if idinfo['aud'] != client_id:
                 raise ValueError('Wrong audience.')
@@ -54,9 +49,9 @@ def google_login(request):
                     role='EMPLOYEE'
                 )
 
-            # Generate tokens
-            refresh = RefreshToken.for_user(user)
-            user_serializer = UserSerializer(user)
+            # Generate tokens carrying the claims ClaimsJWTAuthentication reads
+            refresh = CustomTokenObtainPairSerializer.get_token(user)
+            user_serializer = UserSerializer(user, context={'request': request})
 
             return Response({
                 'access': str(refresh.access_token),
@@ -0,0 +1,185 @@
+"""
+Process-wide cache of Google's ID token signing keys.
+
+Google publishes its signing keys as a JWKS document with HTTP cache headers.
+``KeyStore`` keeps the parsed keys for as long as those headers allow,
+refreshes them on a background thread shortly before they expire and verifies
+ID tokens locally, so a login does not wait on a round trip to Google.
+
+The key source is pluggable so verification can run offline against locally
+generated keys: ``GOOGLE_KEY_SOURCE`` is the dotted path of a key source
+class or of a factory returning one, called with the keyword arguments in
+``GOOGLE_KEY_SOURCE_OPTIONS``; ``reset_key_store(source)`` swaps in a source
+directly.
+"""
+import logging
+import re
+import threading
+import time
+
+import jwt
+import requests
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_CERTS_URL = 'https://www.googleapis.com/oauth2/v3/certs'
+GOOGLE_ISSUERS = ('accounts.google.com', 'https://accounts.google.com')
+ALGORITHMS = ['RS256']
+DEFAULT_MAX_AGE = 300
+# Start a background refresh once this fraction of the lifetime has passed
+REFRESH_AT = 0.8
+# Minimum seconds between refreshes forced by an unknown key id
+UNKNOWN_KID_COOLDOWN = 30
+CLOCK_SKEW = 10
+
+MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+class HTTPKeySource:
+    """Fetch a JWKS document over HTTP and honour its Cache-Control/Age headers."""
+
+    def __init__(self, url=GOOGLE_CERTS_URL, timeout=5):
+        self.url = url
+        self.timeout = timeout
+
+    def fetch(self):
+        response = requests.get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        match = MAX_AGE_RE.search(response.headers.get('Cache-Control', ''))
+        max_age = int(match.group(1)) if match else DEFAULT_MAX_AGE
+        try:
+            max_age -= int(response.headers.get('Age', 0))
+        except ValueError:
+            pass
+        return response.json(), max(max_age, 0)
+
+
+class StaticKeySource:
+    """Serve a fixed JWKS document, e.g. one built from locally generated keys."""
+
+    def __init__(self, jwks, max_age=3600):
+        self.jwks = jwks
+        self.max_age = max_age
+
+    def fetch(self):
+        return self.jwks, self.max_age
+
+
+class KeyStore:
+    def __init__(self, source, clock=time.monotonic):
+        self.source = source
+        self.clock = clock
+        self.keys = {}
+        self.fetched_at = None
+        # Of the last fetch, successful or not
+        self.attempted_at = None
+        self.expires_at = 0
+        self.refresh_at = 0
+        self.refreshing = False
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        self.attempted_at = self.clock()
+        jwks, max_age = self.source.fetch()
+        keys = {}
+        for data in jwks.get('keys', []):
+            try:
+                key = jwt.PyJWK(data)
+            except jwt.PyJWTError as exc:
+                logger.warning('Skipping unusable JWK %s: %s', data.get('kid'), exc)
+                continue
+            keys[data.get('kid')] = key
+        now = self.clock()
+        with self.lock:
+            self.keys = keys
+            self.fetched_at = now
+            self.expires_at = now + max_age
+            self.refresh_at = now + max_age * REFRESH_AT
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as exc:
+            # Keep serving the current keys until they actually expire
+            logger.warning('Background signing key refresh failed: %s', exc)
+        finally:
+            self.refreshing = False
+
+    def refresh_in_background(self):
+        with self.lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+        threading.Thread(target=self._background_refresh, daemon=True).start()
+
+    def get_key(self, kid):
+        now = self.clock()
+        if not self.keys:
+            self.refresh()
+        elif now >= self.expires_at:
+            try:
+                self.refresh()
+            except Exception as exc:
+                # Google's keys outlive their cache headers, so stale keys
+                # beat failing every login while the endpoint is unreachable
+                logger.warning('Signing key refresh failed, using cached keys: %s', exc)
+        elif now >= self.refresh_at:
+            self.refresh_in_background()
+
+        key = self.keys.get(kid)
+        if key is None and self.attempted_at is not None and now - self.attempted_at >= UNKNOWN_KID_COOLDOWN:
+            # Google may have rotated keys ahead of our cache expiry. Throttled
+            # on the last attempt, so failing fetches are not retried per login
+            try:
+                self.refresh()
+            except Exception as exc:
+                logger.warning('Signing key refresh for unknown key %r failed: %s', kid, exc)
+            key = self.keys.get(kid)
+        if key is None:
+            raise ValueError(f'Unknown signing key {kid!r}')
+        return key
+
+    def verify(self, token, audience):
+        """
+        Verify ``token``'s signature, expiry, audience and issuer and return
+        its claims. Raises ValueError for any invalid token.
+        """
+        try:
+            header = jwt.get_unverified_header(token)
+            key = self.get_key(header.get('kid'))
+            claims = jwt.decode(
+                token,
+                key.key,
+                algorithms=ALGORITHMS,
+                audience=audience,
+                leeway=CLOCK_SKEW,
+            )
+        except jwt.PyJWTError as exc:
+            raise ValueError(str(exc)) from exc
+        if claims.get('iss') not in GOOGLE_ISSUERS:
+            raise ValueError('Wrong issuer.')
+        return claims
+
+
+_key_store = None
+_key_store_lock = threading.Lock()
+
+
+def get_key_store():
+    global _key_store
+    if _key_store is None:
+        with _key_store_lock:
+            if _key_store is None:
+                source_path = getattr(settings, 'GOOGLE_KEY_SOURCE', 'accounts.google_keys.HTTPKeySource')
+                options = getattr(settings, 'GOOGLE_KEY_SOURCE_OPTIONS', {})
+                _key_store = KeyStore(import_string(source_path)(**options))
+    return _key_store
+
+
+def reset_key_store(source=None):
+    """Drop the cached keys, optionally switching to another key source."""
+    global _key_store
+    with _key_store_lock:
+        _key_store = KeyStore(source) if source is not None else None
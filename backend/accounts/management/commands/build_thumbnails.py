@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from accounts import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Build missing or outdated thumbnails for profile images and company logos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild thumbnails that are already current')
+
+    def handle(self, *args, **options):
+        for model, (image_field, thumbnails_field) in thumbnails.IMAGE_FIELDS.items():
+            built = failed = 0
+            queryset = (
+                model.objects.exclude(**{image_field: ''}).exclude(**{f'{image_field}__isnull': True})
+                .only('pk', image_field, thumbnails_field)
+                .order_by('pk')
+            )
+            for instance in queryset.iterator(chunk_size=200):
+                if not options['force'] and thumbnails.is_current(instance):
+                    continue
+                if thumbnails.generate(model, instance.pk, getattr(instance, image_field).name):
+                    built += 1
+                else:
+                    failed += 1
+            self.stdout.write(f'{model._meta.verbose_name_plural}: built {built}, failed {failed}')
@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from accounts import uploads
+
+
+class Command(BaseCommand):
+    help = 'Delete chunked uploads that were abandoned before completion'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=24, help='Age since the last chunk')
+
+    def handle(self, *args, **options):
+        count = uploads.purge_stale(timedelta(hours=options['hours']))
+        self.stdout.write(f'Purged {count} stale uploads')
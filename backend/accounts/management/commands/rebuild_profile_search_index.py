@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from accounts import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the candidate search index, extracting resume text that is missing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        indexed = search.rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} profiles'))
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts import outbox
+
+
+class Command(BaseCommand):
+    help = 'Send queued outbox emails in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--max-attempts', type=int, default=outbox.MAX_ATTEMPTS)
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting once drained')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep when the outbox is empty')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = outbox.drain(options['batch_size'], options['max_attempts'])
+            if sent or failed:
+                self.stdout.write(f'Sent {sent}, failed {failed}')
+            # A full batch means there is probably more waiting
+            if sent + failed < options['batch_size']:
+                if not options['loop']:
+                    return
+                time.sleep(options['interval'])
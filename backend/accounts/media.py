@@ -0,0 +1,110 @@
+"""
+Access control for uploaded media.
+
+Company logos and profile pictures are public. Resumes and degrees are
+private: an employee can fetch their own, an employer only those of
+people who applied to one of their jobs. Browsers cannot attach a bearer
+token to a plain link, so serializers hand out URLs carrying a short-lived
+signed token that names both the file and the user it was issued to; the
+view then applies the same rules to that user.
+"""
+import os
+from urllib.parse import urlencode
+
+from django.core import signing
+from django.core.exceptions import SuspiciousFileOperation
+from django.conf import settings
+from django.db.models import Q
+from django.http import Http404
+from django.utils._os import safe_join
+from django.views.decorators.http import require_safe
+from rest_framework import serializers
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.settings import api_settings
+
+from core.media import serve_file
+from .models import User, EmployeeProfile, Upload
+
+PUBLIC_PREFIXES = ('company_logos/', 'employee_profiles/', 'thumbnails/')
+TOKEN_SALT = 'accounts.media'
+TOKEN_MAX_AGE = 60 * 60
+
+
+def is_public(name):
+    return name.startswith(PUBLIC_PREFIXES)
+
+
+def can_access(user, name):
+    if is_public(name):
+        return True
+    if user is None or not user.is_authenticated:
+        return False
+    if user.is_staff:
+        return True
+    # Content-addressed files can be shared by several profiles, so access
+    # is granted if any profile using the file is visible to the user
+    visible = Q(user=user)
+    if user.role == 'EMPLOYER':
+        visible |= Q(user__jobapplication__job__employer=user)
+    if EmployeeProfile.objects.filter(Q(resume=name) | Q(degree=name)).filter(visible).exists():
+        return True
+    return Upload.objects.filter(user=user, file=name).exists()
+
+
+def make_token(name, user):
+    return signing.dumps({'n': name, 'u': user.pk}, salt=TOKEN_SALT, compress=True)
+
+
+def token_user(token, name):
+    try:
+        data = signing.loads(token, salt=TOKEN_SALT, max_age=TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    if data.get('n') != name:
+        return None
+    return User.objects.filter(pk=data.get('u')).first()
+
+
+class PrivateFileField(serializers.FileField):
+    """A FileField whose URL carries a media token for the requesting user."""
+
+    def to_representation(self, value):
+        url = super().to_representation(value)
+        request = self.context.get('request')
+        if url and request is not None and request.user.is_authenticated and not is_public(value.name):
+            url = f'{url}?{urlencode({"token": make_token(value.name, request.user)})}'
+        return url
+
+
+def request_user(request):
+    # A plain view, so Accept headers like application/pdf are not
+    # subject to DRF content negotiation; authenticate by hand instead
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        try:
+            result = authentication_class().authenticate(request)
+        except AuthenticationFailed:
+            return None
+        if result is not None:
+            return result[0]
+    return None
+
+
+@require_safe
+def serve_media(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    name = os.path.relpath(full_path, settings.MEDIA_ROOT).replace(os.sep, '/')
+
+    user = request_user(request)
+    token = request.GET.get('token')
+    if user is None and token:
+        user = token_user(token, name)
+    # Private files are reported as missing rather than forbidden, so their
+    # names cannot be probed
+    if not can_access(user, name) or not os.path.isfile(full_path):
+        raise Http404
+
+    cache_control = 'public, max-age=86400' if is_public(name) else 'private, no-cache'
+    return serve_file(request, full_path, name, cache_control)
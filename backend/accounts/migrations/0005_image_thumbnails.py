@@ -0,0 +1,23 @@
+# Generated by Django 4.2.2 on 2026-10-18 04:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_upload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='companyprofile',
+            name='company_logo_thumbnails',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='employeeprofile',
+            name='profile_image_thumbnails',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
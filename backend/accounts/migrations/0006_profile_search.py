@@ -0,0 +1,40 @@
+# Generated by Django 4.2.2 on 2026-10-18 04:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_image_thumbnails'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileSearchDocument',
+            fields=[
+                ('profile', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='accounts.employeeprofile')),
+                ('length', models.PositiveIntegerField()),
+                ('resume_name', models.CharField(blank=True, max_length=255)),
+                ('resume_text', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProfileSearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('frequency', models.PositiveIntegerField()),
+                ('length', models.PositiveIntegerField()),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_postings', to='accounts.employeeprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'profile', 'frequency', 'length'], name='profile_search_term_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='profilesearchposting',
+            constraint=models.UniqueConstraint(fields=('term', 'profile'), name='unique_profile_search_posting'),
+        ),
+    ]
@@ -1,7 +1,10 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
+from django.utils import timezone
 
 class User(AbstractUser):
     ROLE_CHOICES = (
@@ -31,9 +34,40 @@ class User(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'role']
 
+    CLAIM_FIELDS = ('email', 'username', 'role', 'is_email_verified')
+
+    @classmethod
+    def from_claims(cls, user_id, claims, using='default'):
+        # Only the id and the claim fields are loaded; the rest are deferred.
+        # from_db() expects the values in concrete field order.
+        values = {'id': user_id, **{field: claims[field] for field in cls.CLAIM_FIELDS}}
+        field_names = [f.attname for f in cls._meta.concrete_fields if f.attname in values]
+        user = cls.from_db(using, field_names, [values[name] for name in field_names])
+        user._from_claims = True
+        return user
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        # A deferred field read on a user built from token claims is served
+        # from the per-process user cache instead of the database
+        if fields and getattr(self, '_from_claims', False):
+            from .user_cache import user_cache
+            try:
+                cached = user_cache.get(self.pk)
+            except User.DoesNotExist:
+                pass
+            else:
+                for field in self._meta.concrete_fields:
+                    if field.attname not in self.__dict__:
+                        setattr(self, field.attname, getattr(cached, field.attname))
+                self._from_claims = False
+                return
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+
 class EmployeeProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     profile_image = models.ImageField(upload_to='employee_profiles/', null=True, blank=True)
+    # WEBP variants of profile_image, see accounts.thumbnails
+    profile_image_thumbnails = models.JSONField(default=dict, blank=True)
     resume = models.FileField(upload_to='resumes/')
     degree = models.FileField(upload_to='degrees/')
     skills = models.TextField()
@@ -47,10 +81,38 @@ class EmployeeProfile(models.Model):
         verbose_name = 'Employee Profile'
         verbose_name_plural = 'Employee Profiles'
 
+class ProfileSearchDocument(models.Model):
+    profile = models.OneToOneField(
+        EmployeeProfile,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document'
+    )
+    length = models.PositiveIntegerField()
+    # Text extracted from the resume file named here, see accounts.search
+    resume_name = models.CharField(max_length=255, blank=True)
+    resume_text = models.TextField(blank=True)
+
+
+class ProfileSearchPosting(models.Model):
+    term = models.CharField(max_length=64)
+    profile = models.ForeignKey(EmployeeProfile, on_delete=models.CASCADE, related_name='search_postings')
+    frequency = models.PositiveIntegerField()
+    length = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'profile'], name='unique_profile_search_posting'),
+        ]
+        indexes = [
+            models.Index(fields=['term', 'profile', 'frequency', 'length'], name='profile_search_term_idx'),
+        ]
+
 class CompanyProfile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     company_name = models.CharField(max_length=100)
     company_logo = models.ImageField(upload_to='company_logos/', null=True, blank=True)
+    company_logo_thumbnails = models.JSONField(default=dict, blank=True)
     company_description = models.TextField()
     industry = models.CharField(max_length=50)
     company_size = models.CharField(max_length=50)
@@ -61,4 +123,67 @@ class CompanyProfile(models.Model):
 
     class Meta:
         verbose_name = 'Company Profile'
-        verbose_name_plural = 'Company Profiles' 
\ No newline at end of file
+        verbose_name_plural = 'Company Profiles'
+
+class OutboxEmail(models.Model):
+    STATUS_CHOICES = (
+        ('PENDING', 'Pending'),
+        ('SENT', 'Sent'),
+        ('DEAD', 'Dead'),
+    )
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True)
+    recipients = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.recipients)}"
+
+    class Meta:
+        verbose_name = 'Outbox Email'
+        verbose_name_plural = 'Outbox Emails'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+class Upload(models.Model):
+    KIND_CHOICES = (
+        ('RESUME', 'Resume'),
+        ('DEGREE', 'Degree'),
+    )
+    STATUS_CHOICES = (
+        ('PENDING', 'Pending'),
+        ('COMPLETE', 'Complete'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='uploads')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    # Optional client-side hash, checked once the upload is complete
+    expected_sha256 = models.CharField(max_length=64, blank=True)
+    sha256 = models.CharField(max_length=64, blank=True)
+    # Content-addressed name in default storage once complete
+    file = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
+
+    class Meta:
+        verbose_name = 'Upload'
+        verbose_name_plural = 'Uploads'
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='upload_stale_idx'),
+        ]
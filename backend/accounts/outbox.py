@@ -0,0 +1,101 @@
+"""
+Transactional email outbox.
+
+Request handlers call ``enqueue`` inside the transaction that creates the
+data the email is about, so an email exists if and only if that data was
+committed. The ``send_outbox_emails`` worker drains the outbox with
+``drain``, sending each batch over one reused SMTP connection.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = timedelta(seconds=30)
+BACKOFF_MAX = timedelta(hours=6)
+
+
+def enqueue(subject, body, recipients, from_email=None):
+    return OutboxEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipients),
+    )
+
+
+def backoff(attempts):
+    return min(BACKOFF_BASE * (2 ** (attempts - 1)), BACKOFF_MAX)
+
+
+def drain(batch_size=100, max_attempts=MAX_ATTEMPTS, connection=None):
+    """
+    Send one batch of due emails and return ``(sent, failed)``. Rows are
+    locked with SKIP LOCKED, so several workers can drain concurrently
+    without sending the same email twice.
+    """
+    now = timezone.now()
+    sent = failed = 0
+    with transaction.atomic():
+        batch = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='PENDING', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if not batch:
+            return sent, failed
+
+        connection = connection or get_connection(fail_silently=False)
+        try:
+            connection.open()
+            for email in batch:
+                message = EmailMessage(
+                    email.subject,
+                    email.body,
+                    email.from_email or None,
+                    email.recipients,
+                    connection=connection,
+                )
+                email.attempts += 1
+                try:
+                    message.send()
+                except Exception as exc:
+                    failed += 1
+                    email.last_error = f'{type(exc).__name__}: {exc}'
+                    if email.attempts >= max_attempts:
+                        email.status = 'DEAD'
+                        logger.error('Outbox email %s dead-lettered: %s', email.pk, email.last_error)
+                    else:
+                        email.next_attempt_at = timezone.now() + backoff(email.attempts)
+                    # The server may have dropped us; start the next message
+                    # on a fresh connection
+                    connection.close()
+                    connection.open()
+                else:
+                    sent += 1
+                    email.status = 'SENT'
+                    email.sent_at = timezone.now()
+                    email.last_error = ''
+        except Exception as exc:
+            # Could not (re)connect at all: every unsent email in the batch
+            # is retried later without burning an attempt
+            logger.warning('Outbox SMTP connection failed: %s', exc)
+            for email in batch:
+                if email.status == 'PENDING' and email.next_attempt_at <= now:
+                    email.next_attempt_at = timezone.now() + BACKOFF_BASE
+        finally:
+            connection.close()
+
+        OutboxEmail.objects.bulk_update(
+            batch,
+            ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+        )
+    return sent, failed
@@ -0,0 +1,176 @@
+"""
+Candidate search over employee profiles.
+
+Profiles are indexed into term postings like jobs are (see jobs.search,
+whose tokenizer and BM25 scoring are reused), from their skills,
+experience and the text of their resume. Extracting a resume's text is
+slow, so it runs in the background after the profile is committed; the
+text is kept on the profile's search document together with the name of
+the resume it came from, so later saves reuse it until the resume changes.
+"""
+import logging
+import os
+from collections import Counter
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Avg, Count
+
+from core.tasks import defer
+from jobs.search import bm25_score, document_frequencies, query_terms, tokenize
+from .models import EmployeeProfile, ProfileSearchDocument, ProfileSearchPosting
+
+logger = logging.getLogger(__name__)
+
+# Skills are what employers search for; the resume repeats much of the rest
+FIELD_WEIGHTS = (
+    ('skills', 3),
+    ('experience', 1),
+    ('resume_text', 1),
+)
+MAX_RESUME_PAGES = 20
+MAX_RESUME_TEXT = 100000
+STATS_CACHE_KEY = 'accounts:search:stats'
+STATS_CACHE_TIMEOUT = 300
+
+
+def extract_resume_text(name):
+    """Return the text of the PDF resume ``name``, or '' if there is none."""
+    if os.path.splitext(name)[1].lower() != '.pdf':
+        return ''
+    # Imported here as only the background extraction needs pypdf
+    from pypdf import PdfReader
+    from pypdf.errors import PyPdfError
+
+    parts, length = [], 0
+    try:
+        with default_storage.open(name, 'rb') as f:
+            reader = PdfReader(f)
+            for page in reader.pages[:MAX_RESUME_PAGES]:
+                text = page.extract_text() or ''
+                parts.append(text)
+                length += len(text)
+                if length >= MAX_RESUME_TEXT:
+                    break
+    except (OSError, PyPdfError, ValueError) as exc:
+        logger.warning('Could not extract text from %s: %s', name, exc)
+    return '\n'.join(parts)[:MAX_RESUME_TEXT]
+
+
+def profile_terms(profile, resume_text):
+    counts = Counter()
+    fields = {'skills': profile.skills, 'experience': profile.experience, 'resume_text': resume_text}
+    for field, weight in FIELD_WEIGHTS:
+        for term in tokenize(fields[field]):
+            counts[term] += weight
+    return counts
+
+
+def index_profile(profile, resume_text=None):
+    """
+    (Re)index ``profile``. ``resume_text`` is freshly extracted text of
+    its current resume; without it, previously extracted text is reused if
+    it belongs to the current resume, and extraction is scheduled if not.
+    """
+    resume_name = profile.resume.name or ''
+    if resume_text is None:
+        document = (
+            ProfileSearchDocument.objects.filter(profile_id=profile.pk)
+            .values('resume_name', 'resume_text').first()
+        )
+        if document is not None and document['resume_name'] == resume_name:
+            resume_text = document['resume_text']
+        else:
+            resume_text = ''
+            if resume_name:
+                defer(extract_resume, profile.pk, resume_name)
+            # Not extracted yet, so no resume text is attributed to it
+            resume_name = ''
+
+    counts = profile_terms(profile, resume_text)
+    length = sum(counts.values())
+    with transaction.atomic():
+        ProfileSearchPosting.objects.filter(profile_id=profile.pk).delete()
+        ProfileSearchPosting.objects.bulk_create([
+            ProfileSearchPosting(term=term, profile_id=profile.pk, frequency=frequency, length=length)
+            for term, frequency in counts.items()
+        ])
+        ProfileSearchDocument.objects.update_or_create(
+            profile_id=profile.pk,
+            defaults={'length': length, 'resume_name': resume_name, 'resume_text': resume_text}
+        )
+
+
+def index_new_profiles(profiles):
+    """
+    Index profiles that have no search document yet, in bulk, without
+    resume text. No resume is recorded as extracted, so ``rebuild_index``
+    (or the next save) extracts it.
+    """
+    documents, postings = [], []
+    for profile in profiles:
+        counts = profile_terms(profile, '')
+        length = sum(counts.values())
+        documents.append(
+            ProfileSearchDocument(profile_id=profile.pk, length=length, resume_name='')
+        )
+        postings.extend(
+            ProfileSearchPosting(term=term, profile_id=profile.pk, frequency=frequency, length=length)
+            for term, frequency in counts.items()
+        )
+    ProfileSearchDocument.objects.bulk_create(documents)
+    ProfileSearchPosting.objects.bulk_create(postings, batch_size=5000)
+    return len(documents)
+
+
+def extract_resume(pk, name):
+    text = extract_resume_text(name)
+    # Skip it if the resume was replaced (or the profile removed) meanwhile
+    profile = EmployeeProfile.objects.filter(pk=pk, resume=name).only('skills', 'experience', 'resume').first()
+    if profile is not None:
+        index_profile(profile, resume_text=text)
+
+
+def rebuild_index(batch_size=100):
+    """
+    Index every profile, extracting resume text in this process for
+    profiles whose resume has not been extracted yet.
+    """
+    indexed = 0
+    current = dict(ProfileSearchDocument.objects.values_list('profile_id', 'resume_name'))
+    profiles = EmployeeProfile.objects.only('skills', 'experience', 'resume').order_by()
+    for profile in profiles.iterator(chunk_size=batch_size):
+        resume_text = None
+        if current.get(profile.pk) != profile.resume.name:
+            resume_text = extract_resume_text(profile.resume.name) if profile.resume else ''
+        index_profile(profile, resume_text)
+        indexed += 1
+    cache.delete(STATS_CACHE_KEY)
+    return indexed
+
+
+def corpus_stats():
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is None:
+        stats = ProfileSearchDocument.objects.aggregate(count=Count('pk'), avg_length=Avg('length'))
+        stats['avg_length'] = stats['avg_length'] or 1.0
+        cache.set(STATS_CACHE_KEY, stats, STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def search_profiles(queryset, query):
+    """
+    Filter ``queryset`` to the profiles matching ``query``, best match
+    first, scored in one GROUP BY over their postings of the query terms
+    as in ``jobs.search.search_jobs``.
+    """
+    terms = query_terms(query)
+    frequencies = document_frequencies(ProfileSearchPosting.objects.all(), terms) if terms else {}
+    if not frequencies:
+        return queryset.none()
+    return (
+        queryset.filter(search_postings__term__in=terms)
+        .annotate(search_score=bm25_score(frequencies, corpus_stats(), postings='search_postings__'))
+        .order_by('-search_score', '-pk')
+    )
@@ -1,24 +1,56 @@
+from django.core.files.storage import default_storage
+from django.db import models
 from rest_framework import serializers
-from .models import User, EmployeeProfile, CompanyProfile
+from .models import User, EmployeeProfile, CompanyProfile, Upload
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework_simplejwt.tokens import RefreshToken
+from core.serializers import SparseFieldsMixin
+from .media import PrivateFileField
 
-class UserSerializer(serializers.ModelSerializer):
+def thumbnail_urls(thumbnails, request=None):
+    urls = {}
+    for label, name in (thumbnails or {}).items():
+        if label == 'source':
+            continue
+        url = default_storage.url(name)
+        urls[label] = request.build_absolute_uri(url) if request is not None else url
+    return urls
+
+class ThumbnailsField(serializers.Field):
+    # URLs of the thumbnail variants in an accounts.thumbnails JSON field
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return thumbnail_urls(value, self.context.get('request'))
+
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     profile_image = serializers.SerializerMethodField()
+    profile_thumbnails = serializers.SerializerMethodField()
     password = serializers.CharField(write_only=True)
 
     class Meta:
         model = User
-        fields = ('id', 'email', 'username', 'password', 'role', 'is_email_verified', 'profile_image')
+        fields = ('id', 'email', 'username', 'password', 'role', 'is_email_verified', 'profile_image', 'profile_thumbnails')
         read_only_fields = ('is_email_verified',)
         extra_kwargs = {'password': {'write_only': True}}
 
-    def get_profile_image(self, obj):
+    def get_image_and_thumbnails(self, obj):
         if obj.role == 'EMPLOYEE' and hasattr(obj, 'employeeprofile'):
-            return obj.employeeprofile.profile_image.url if obj.employeeprofile.profile_image else None
+            return obj.employeeprofile.profile_image, obj.employeeprofile.profile_image_thumbnails
         elif obj.role == 'EMPLOYER' and hasattr(obj, 'companyprofile'):
-            return obj.companyprofile.company_logo.url if obj.companyprofile.company_logo else None
-        return None
+            return obj.companyprofile.company_logo, obj.companyprofile.company_logo_thumbnails
+        return None, None
+
+    def get_profile_image(self, obj):
+        image, _ = self.get_image_and_thumbnails(obj)
+        return image.url if image else None
+
+    def get_profile_thumbnails(self, obj):
+        # Empty until the background job has built them
+        _, thumbnails = self.get_image_and_thumbnails(obj)
+        return thumbnail_urls(thumbnails, self.context.get('request'))
 
     def create(self, validated_data):
         user = User.objects.create_user(
@@ -29,9 +61,21 @@ class UserSerializer(serializers.ModelSerializer):
         )
         return user
 
-class EmployeeProfileSerializer(serializers.ModelSerializer):
+class EmployeeProfileSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        models.FileField: PrivateFileField,
+    }
     user_email = serializers.CharField(source='user.email', read_only=True)
     user_name = serializers.CharField(source='user.username', read_only=True)
+    profile_image_thumbnails = ThumbnailsField()
+    # Completed chunked uploads can stand in for the resume and degree files
+    resume_upload = serializers.PrimaryKeyRelatedField(
+        queryset=Upload.objects.filter(status='COMPLETE'), write_only=True, required=False
+    )
+    degree_upload = serializers.PrimaryKeyRelatedField(
+        queryset=Upload.objects.filter(status='COMPLETE'), write_only=True, required=False
+    )
 
     class Meta:
         model = EmployeeProfile
@@ -41,25 +85,65 @@ class EmployeeProfileSerializer(serializers.ModelSerializer):
             'user_email',
             'user_name',
             'profile_image',
+            'profile_image_thumbnails',
             'resume',
             'degree',
             'skills',
             'experience',
-            'phone'
+            'phone',
+            'resume_upload',
+            'degree_upload'
         ]
         read_only_fields = ['user']
+        extra_kwargs = {
+            'resume': {'required': False},
+            'degree': {'required': False},
+        }
+
+    def validate(self, attrs):
+        user = self.context['request'].user
+        for field, kind in (('resume', 'RESUME'), ('degree', 'DEGREE')):
+            upload = attrs.pop(f'{field}_upload', None)
+            if upload is not None:
+                if upload.user_id != user.id or upload.kind != kind:
+                    raise serializers.ValidationError({f'{field}_upload': 'Invalid upload.'})
+                attrs[field] = upload.file
+            elif self.instance is None and not attrs.get(field):
+                raise serializers.ValidationError({field: 'This field is required.'})
+        return attrs
 
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
-class CompanyProfileSerializer(serializers.ModelSerializer):
+class UploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Upload
+        fields = [
+            'id',
+            'kind',
+            'filename',
+            'size',
+            'offset',
+            'status',
+            'expected_sha256',
+            'sha256'
+        ]
+        read_only_fields = ['offset', 'status', 'sha256']
+        extra_kwargs = {
+            'expected_sha256': {'write_only': True},
+        }
+
+class CompanyProfileSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    company_logo_thumbnails = ThumbnailsField()
+
     class Meta:
         model = CompanyProfile
         fields = [
             'id',
             'company_name',
             'company_logo',
+            'company_logo_thumbnails',
             'company_description',
             'industry',
             'company_size',
@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import User, EmployeeProfile, CompanyProfile
+from .user_cache import user_cache
+from . import search, thumbnails
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=EmployeeProfile)
+@receiver(post_save, sender=CompanyProfile)
+def schedule_thumbnails(sender, instance, raw=False, **kwargs):
+    if not raw:
+        thumbnails.schedule(instance)
+
+
+@receiver(post_save, sender=EmployeeProfile)
+def index_profile(sender, instance, raw=False, **kwargs):
+    # Postings and the search document go with the profile by cascade
+    if not raw:
+        search.index_profile(instance)
@@ -0,0 +1,506 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+from smtplib import SMTPException
+from unittest import mock
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from PIL import Image
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+
+from jobs.models import Job, JobApplication
+from . import google_keys, media, outbox, search, thumbnails
+from .authentication import ClaimsJWTAuthentication
+from .models import (
+    CompanyProfile, EmployeeProfile, OutboxEmail, ProfileSearchDocument, ProfileSearchPosting, Upload, User,
+)
+from .serializers import CustomTokenObtainPairSerializer
+from .user_cache import user_cache
+
+
+class FailingBackend(locmem.EmailBackend):
+    def send_messages(self, messages):
+        raise SMTPException('Mailbox unavailable')
+
+
+class OutboxTests(APITestCase):
+    def test_register_queues_the_verification_email(self):
+        self.client.force_authenticate(User.objects.create_user(
+            email='staff@example.com', username='staff', password='secret', is_staff=True
+        ))
+        response = self.client.post('/api/accounts/users/register/', {
+            'email': 'new@example.com', 'username': 'new', 'password': 'secret', 'role': 'EMPLOYEE',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(mail.outbox, [])
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.recipients, ['new@example.com'])
+        self.assertEqual(email.status, 'PENDING')
+
+    def test_drain_sends_due_emails(self):
+        first = outbox.enqueue('Hello', 'Body', ['a@example.com'])
+        second = outbox.enqueue('Hello', 'Body', ['b@example.com'])
+        later = outbox.enqueue('Later', 'Body', ['c@example.com'])
+        OutboxEmail.objects.filter(pk=later.pk).update(next_attempt_at=timezone.now() + timedelta(hours=1))
+
+        self.assertEqual(outbox.drain(), (2, 0))
+        self.assertEqual([message.to for message in mail.outbox], [['a@example.com'], ['b@example.com']])
+        for email in (first, second):
+            email.refresh_from_db()
+            self.assertEqual(email.status, 'SENT')
+            self.assertEqual(email.attempts, 1)
+            self.assertIsNotNone(email.sent_at)
+        self.assertEqual(outbox.drain(), (0, 0))
+
+    def test_drain_honours_the_batch_size(self):
+        for i in range(3):
+            outbox.enqueue('Hello', 'Body', [f'{i}@example.com'])
+        self.assertEqual(outbox.drain(batch_size=2), (2, 0))
+        self.assertEqual(outbox.drain(batch_size=2), (1, 0))
+
+    def test_failed_send_backs_off_then_dead_letters(self):
+        email = outbox.enqueue('Hello', 'Body', ['a@example.com'])
+        self.assertEqual(outbox.drain(max_attempts=2, connection=FailingBackend()), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'PENDING')
+        self.assertEqual(email.attempts, 1)
+        self.assertIn('Mailbox unavailable', email.last_error)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        # Not due again until the backoff has passed
+        self.assertEqual(outbox.drain(connection=FailingBackend()), (0, 0))
+
+        OutboxEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+        with self.assertLogs('accounts.outbox', 'ERROR'):
+            self.assertEqual(outbox.drain(max_attempts=2, connection=FailingBackend()), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'DEAD')
+        self.assertEqual(email.attempts, 2)
+
+
+def create_user(username, role='EMPLOYEE'):
+    return User.objects.create_user(
+        email=f'{username}@example.com', username=username, password='secret', role=role
+    )
+
+
+def bearer(user):
+    return f'Bearer {CustomTokenObtainPairSerializer.get_token(user).access_token}'
+
+
+class TemporaryMediaMixin:
+    """Stores media and partial uploads in directories removed after each test."""
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.media_root = os.path.join(directory, 'media')
+        settings = override_settings(
+            MEDIA_ROOT=self.media_root, CHUNKED_UPLOAD_DIR=os.path.join(directory, 'chunks'), MEDIA_OFFLOAD=''
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def write_media(self, name, content):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+
+
+class UploadTests(TemporaryMediaMixin, APITestCase):
+    content = b'%PDF-1.4 resume ' * 100
+
+    def setUp(self):
+        super().setUp()
+        self.user = create_user('employee')
+        self.client.force_authenticate(self.user)
+
+    def start(self, **fields):
+        response = self.client.post('/api/accounts/uploads/', {
+            'kind': 'RESUME', 'filename': 'resume.pdf', 'size': len(self.content), **fields
+        })
+        self.assertEqual(response.status_code, 201)
+        return response.json()['id']
+
+    def send(self, upload_id, offset, data):
+        return self.client.patch(
+            f'/api/accounts/uploads/{upload_id}/', data, content_type='application/octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def upload(self):
+        upload_id = self.start()
+        self.send(upload_id, 0, self.content[:600])
+        response = self.send(upload_id, 600, self.content[600:])
+        self.assertEqual(response.status_code, 200)
+        return Upload.objects.get(pk=upload_id)
+
+    def test_chunks_are_stored_under_the_content_hash(self):
+        upload = self.upload()
+        sha256 = hashlib.sha256(self.content).hexdigest()
+        self.assertEqual(upload.status, 'COMPLETE')
+        self.assertEqual(upload.file, f'documents/{sha256[:2]}/{sha256}.pdf')
+        with open(os.path.join(self.media_root, upload.file), 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+
+    def test_wrong_offset_reports_where_to_resume(self):
+        upload_id = self.start()
+        self.send(upload_id, 0, self.content[:600])
+        response = self.send(upload_id, 100, self.content[100:])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '600')
+        self.assertEqual(self.client.get(f'/api/accounts/uploads/{upload_id}/')['Upload-Offset'], '600')
+
+    def test_identical_documents_are_stored_once(self):
+        first, second = self.upload(), self.upload()
+        self.assertNotEqual(first.pk, second.pk)
+        self.assertEqual(first.file, second.file)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, os.path.dirname(first.file))), [os.path.basename(first.file)])
+
+    def test_checksum_mismatch_restarts_the_upload(self):
+        upload_id = self.start(expected_sha256='0' * 64)
+        response = self.send(upload_id, 0, self.content)
+        self.assertEqual(response.status_code, 400)
+        upload = Upload.objects.get(pk=upload_id)
+        self.assertEqual((upload.offset, upload.status), (0, 'PENDING'))
+
+    def test_disallowed_file_type_is_rejected(self):
+        response = self.client.post('/api/accounts/uploads/', {'kind': 'RESUME', 'filename': 'run.exe', 'size': 10})
+        self.assertEqual(response.status_code, 400)
+
+    def test_uploads_are_private_to_their_owner(self):
+        upload_id = self.start()
+        self.client.force_authenticate(create_user('other'))
+        self.assertEqual(self.client.get(f'/api/accounts/uploads/{upload_id}/').status_code, 404)
+        self.assertEqual(self.send(upload_id, 0, self.content).status_code, 404)
+
+
+class MediaAccessTests(TemporaryMediaMixin, APITestCase):
+    resume = 'documents/ab/resume.pdf'
+
+    def setUp(self):
+        super().setUp()
+        self.write_media(self.resume, b'0123456789')
+        self.write_media('company_logos/logo.png', b'logo')
+        self.employee = create_user('employee')
+        EmployeeProfile.objects.create(
+            user=self.employee, resume=self.resume, degree='documents/ab/degree.pdf',
+            skills='Python', experience='Some', phone='0'
+        )
+        self.employer = create_user('employer', role='EMPLOYER')
+        CompanyProfile.objects.create(
+            user=self.employer, company_name='Acme', company_description='Acme',
+            industry='Software', company_size='10', location='Remote'
+        )
+        job = Job.objects.create(
+            title='Python Developer', description='Python', requirements='Python', salary_range='1',
+            location='Remote', job_type='FULL_TIME', deadline=timezone.now() + timedelta(days=30),
+            employer=self.employer
+        )
+        JobApplication.objects.create(job=job, applicant=self.employee, cover_letter='Hello')
+
+    def get(self, user=None, name=None, **extra):
+        if user is not None:
+            extra['HTTP_AUTHORIZATION'] = bearer(user)
+        return self.client.get(f'/media/{name or self.resume}', **extra)
+
+    def test_public_files_need_no_authentication(self):
+        response = self.get(name='company_logos/logo.png')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'logo')
+
+    def test_owner_and_employers_applied_to_can_read_a_resume(self):
+        for user in (self.employee, self.employer):
+            with self.subTest(user.username):
+                response = self.get(user)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+
+    def test_other_users_cannot_read_a_resume(self):
+        self.assertEqual(self.get().status_code, 404)
+        self.assertEqual(self.get(create_user('stranger')).status_code, 404)
+        self.assertEqual(self.get(create_user('other-employer', role='EMPLOYER')).status_code, 404)
+
+    def test_signed_token_grants_access_to_its_file_only(self):
+        token = media.make_token(self.resume, self.employer)
+        self.assertEqual(self.get(name=f'{self.resume}?token={token}').status_code, 200)
+        self.write_media('documents/cd/other.pdf', b'other')
+        EmployeeProfile.objects.filter(user=self.employee).update(degree='documents/cd/other.pdf')
+        self.assertEqual(self.get(name=f'documents/cd/other.pdf?token={token}').status_code, 404)
+
+    def test_path_traversal_is_not_found(self):
+        self.assertEqual(self.get(self.employee, name='../../settings.py').status_code, 404)
+
+    def test_range_requests_return_partial_content(self):
+        response = self.get(self.employee, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+
+    def test_etag_revalidation(self):
+        etag = self.get(self.employee)['ETag']
+        self.assertEqual(self.get(self.employee, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+def png(width, height):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), 'red').save(buffer, 'PNG')
+    return ContentFile(buffer.getvalue(), name='photo.png')
+
+
+class ThumbnailTests(TemporaryMediaMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = create_user('employee')
+        self.client.force_authenticate(self.user)
+
+    def create_profile(self):
+        # Thumbnails are built once the profile commits
+        with override_settings(BACKGROUND_TASKS_EAGER=True), self.captureOnCommitCallbacks(execute=True):
+            return EmployeeProfile.objects.create(
+                user=self.user, profile_image=png(800, 400), resume='resumes/cv.doc', degree='degrees/cv.doc',
+                skills='Python', experience='', phone='1234567890'
+            )
+
+    def assert_variants(self, variants):
+        self.assertEqual(set(variants), {'source', *thumbnails.SIZES})
+        for label, size in thumbnails.SIZES.items():
+            with default_storage.open(variants[label], 'rb') as f:
+                image = Image.open(f)
+                self.assertEqual((image.format, image.size), ('WEBP', (size, size // 2)))
+
+    def test_saving_an_image_builds_webp_variants(self):
+        profile = self.create_profile()
+        profile.refresh_from_db()
+        self.assertEqual(profile.profile_image_thumbnails['source'], profile.profile_image.name)
+        self.assert_variants(profile.profile_image_thumbnails)
+
+    def test_serializers_expose_absolute_urls(self):
+        profile = self.create_profile()
+        profile.refresh_from_db()
+        expected = {
+            label: f'http://testserver/media/{profile.profile_image_thumbnails[label]}'
+            for label in thumbnails.SIZES
+        }
+        response = self.client.get(f'/api/accounts/employee-profiles/{profile.pk}/')
+        self.assertEqual(response.json()['profile_image_thumbnails'], expected)
+        response = self.client.get('/api/accounts/profile/')
+        self.assertEqual(response.json()['profile_thumbnails'], expected)
+
+    def test_build_thumbnails_fills_in_missing_variants(self):
+        with mock.patch.object(thumbnails, 'defer'):
+            profile = self.create_profile()
+        self.assertEqual(EmployeeProfile.objects.get().profile_image_thumbnails, {})
+
+        out = StringIO()
+        call_command('build_thumbnails', stdout=out)
+        self.assertIn('Employee Profiles: built 1, failed 0', out.getvalue())
+        self.assert_variants(EmployeeProfile.objects.get(pk=profile.pk).profile_image_thumbnails)
+        call_command('build_thumbnails', stdout=out)
+        self.assertIn('Employee Profiles: built 0, failed 0', out.getvalue())
+
+
+class CandidateSearchTests(APITestCase):
+    url = '/api/accounts/employee-profiles/search/'
+
+    def setUp(self):
+        # The corpus statistics are cached
+        cache.clear()
+        self.client.force_authenticate(create_user('employer', role='EMPLOYER'))
+
+    def create_profile(self, username, skills, experience='', resume_text=''):
+        # The resume is extracted once the profile commits
+        with override_settings(BACKGROUND_TASKS_EAGER=True), \
+                mock.patch.object(search, 'extract_resume_text', return_value=resume_text), \
+                self.captureOnCommitCallbacks(execute=True):
+            return EmployeeProfile.objects.create(
+                user=create_user(username), resume=f'resumes/{username}.pdf', degree=f'degrees/{username}.pdf',
+                skills=skills, experience=experience, phone='1234567890'
+            )
+
+    def search(self, query):
+        response = self.client.get(self.url, {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [profile['id'] for profile in response.json()['results']]
+
+    def test_skills_weigh_more_than_experience(self):
+        mentions = self.create_profile('mentions', 'Java', experience='Some Kotlin and more Kotlin')
+        lists = self.create_profile('lists', 'Kotlin, Java')
+        self.create_profile('other', 'Go')
+        self.assertEqual(self.search('kotlin'), [lists.pk, mentions.pk])
+
+    def test_matches_the_extracted_resume_text(self):
+        profile = self.create_profile('resume', 'Java', resume_text='Built Kafka pipelines')
+        self.assertEqual(self.search('kafka'), [profile.pk])
+        self.assertEqual(profile.search_document.resume_name, profile.resume.name)
+
+    def test_bulk_indexed_resumes_are_left_to_extract(self):
+        profile = self.create_profile('bulk', 'Java', resume_text='Built Kafka pipelines')
+        ProfileSearchDocument.objects.all().delete()
+        ProfileSearchPosting.objects.all().delete()
+        self.assertEqual(search.index_new_profiles(EmployeeProfile.objects.all()), 1)
+        self.assertEqual(ProfileSearchDocument.objects.get().resume_name, '')
+        self.assertEqual(self.search('kafka'), [])
+
+        with mock.patch.object(search, 'extract_resume_text', return_value='Built Kafka pipelines') as extract:
+            search.rebuild_index()
+        extract.assert_called_once_with(profile.resume.name)
+        self.assertEqual(self.search('kafka'), [profile.pk])
+
+
+class ClaimsAuthenticationTests(APITestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+        self.user = create_user('employer', role='EMPLOYER')
+
+    def authenticate(self, method):
+        request = getattr(APIRequestFactory(), method)('/', HTTP_AUTHORIZATION=bearer(self.user))
+        return ClaimsJWTAuthentication().authenticate(request)[0]
+
+    def test_reads_use_the_token_claims(self):
+        with self.assertNumQueries(0):
+            user = self.authenticate('get')
+            self.assertEqual((user.pk, user.role), (self.user.pk, 'EMPLOYER'))
+        # Other fields come from the user cache, in one query
+        with self.assertNumQueries(1):
+            self.assertEqual(user.date_joined, self.user.date_joined)
+
+    def test_writes_load_the_cached_user(self):
+        with self.assertNumQueries(1):
+            user = self.authenticate('post')
+        self.assertFalse(getattr(user, '_from_claims', False))
+        self.assertEqual(user.date_joined, self.user.date_joined)
+        with self.assertNumQueries(0):
+            self.authenticate('delete')
+
+    def test_deactivating_a_user_stops_writes_at_once(self):
+        self.authenticate('post')
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate('post')
+        self.assertEqual(self.authenticate('get').pk, self.user.pk)
+
+        self.client.credentials(HTTP_AUTHORIZATION=bearer(self.user))
+        self.assertEqual(self.client.post('/api/jobs/', {}).status_code, 401)
+
+
+def generate_key(kid):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+    return private_key, {**jwk, 'kid': kid, 'alg': 'RS256', 'use': 'sig'}
+
+
+def id_token(private_key, kid, **claims):
+    now = int(time.time())
+    claims = {
+        'iss': 'https://accounts.google.com', 'aud': 'client-id', 'sub': '1',
+        'email': 'google@example.com', 'email_verified': True, 'iat': now, 'exp': now + 600, **claims,
+    }
+    return jwt.encode(claims, private_key, algorithm='RS256', headers={'kid': kid})
+
+
+class FlakyKeySource:
+    """Serves ``jwks`` until ``failing`` is set, counting fetches."""
+
+    def __init__(self, jwks):
+        self.jwks = jwks
+        self.failing = False
+        self.fetches = 0
+
+    def fetch(self):
+        self.fetches += 1
+        if self.failing:
+            raise OSError('Key endpoint unreachable')
+        return self.jwks, 3600
+
+
+class GoogleKeyTests(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.private_key, cls.jwk = generate_key('key-1')
+        cls.jwks = {'keys': [cls.jwk]}
+
+    def setUp(self):
+        google_keys.reset_key_store()
+        self.addCleanup(google_keys.reset_key_store)
+
+    def test_key_source_is_built_from_settings(self):
+        with override_settings(
+            GOOGLE_KEY_SOURCE='accounts.google_keys.StaticKeySource',
+            GOOGLE_KEY_SOURCE_OPTIONS={'jwks': self.jwks},
+        ):
+            claims = google_keys.get_key_store().verify(id_token(self.private_key, 'key-1'), 'client-id')
+        self.assertEqual(claims['email'], 'google@example.com')
+
+    def test_invalid_tokens_are_rejected(self):
+        store = google_keys.KeyStore(google_keys.StaticKeySource(self.jwks))
+        other_key, _ = generate_key('key-1')
+        for label, token in (
+            ('audience', id_token(self.private_key, 'key-1', aud='other-client')),
+            ('issuer', id_token(self.private_key, 'key-1', iss='https://example.com')),
+            ('expired', id_token(self.private_key, 'key-1', exp=int(time.time()) - 60)),
+            ('signature', id_token(other_key, 'key-1')),
+        ):
+            with self.subTest(label), self.assertRaises(ValueError):
+                store.verify(token, 'client-id')
+
+    def test_unknown_key_refresh_is_throttled_after_failures(self):
+        now = [0.0]
+        source = FlakyKeySource(self.jwks)
+        store = google_keys.KeyStore(source, clock=lambda: now[0])
+        store.get_key('key-1')
+        source.failing = True
+
+        now[0] += google_keys.UNKNOWN_KID_COOLDOWN
+        with self.assertLogs('accounts.google_keys', 'WARNING'):
+            with self.assertRaises(ValueError):
+                store.get_key('rotated')
+        self.assertEqual(source.fetches, 2)
+        # Within the cooldown of the failed attempt nothing is fetched
+        now[0] += google_keys.UNKNOWN_KID_COOLDOWN / 2
+        with self.assertRaises(ValueError):
+            store.get_key('rotated')
+        self.assertEqual(source.fetches, 2)
+        self.assertIs(store.get_key('key-1'), store.keys['key-1'])
+
+    def test_rotated_key_is_fetched_after_the_cooldown(self):
+        now = [0.0]
+        source = FlakyKeySource(self.jwks)
+        store = google_keys.KeyStore(source, clock=lambda: now[0])
+        store.get_key('key-1')
+        new_key, new_jwk = generate_key('key-2')
+        source.jwks = {'keys': [self.jwk, new_jwk]}
+
+        now[0] += google_keys.UNKNOWN_KID_COOLDOWN
+        self.assertEqual(store.verify(id_token(new_key, 'key-2'), 'client-id')['sub'], '1')
+        self.assertEqual(source.fetches, 2)
+
+    def test_google_login_with_a_locally_signed_token(self):
+        google_keys.reset_key_store(google_keys.StaticKeySource(self.jwks))
+        with mock.patch.dict(os.environ, {'GOOGLE_CLIENT_ID': 'client-id'}):
+            response = self.client.post(
+                '/api/accounts/google/login/', {'token': id_token(self.private_key, 'key-1')}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['user']['email'], 'google@example.com')
+        self.assertTrue(User.objects.get(email='google@example.com').is_email_verified)
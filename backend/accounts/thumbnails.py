@@ -0,0 +1,98 @@
+"""
+Thumbnail variants of profile images and company logos.
+
+Each saved image gets WEBP copies at the fixed ``SIZES``. They are built
+in the background after the profile is committed and recorded in the
+model's ``*_thumbnails`` JSON field as ``{"source": <image name>, "small":
+<name>, ...}``. ``source`` tells whether the variants still belong to the
+current image.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from core.tasks import defer
+from .models import EmployeeProfile, CompanyProfile
+
+logger = logging.getLogger(__name__)
+
+SIZES = {
+    'small': 64,
+    'medium': 160,
+    'large': 320,
+}
+FORMAT = 'WEBP'
+QUALITY = 80
+
+# model: (image field, thumbnails field)
+IMAGE_FIELDS = {
+    EmployeeProfile: ('profile_image', 'profile_image_thumbnails'),
+    CompanyProfile: ('company_logo', 'company_logo_thumbnails'),
+}
+
+
+def variant_name(name, label):
+    stem = os.path.splitext(name)[0]
+    return f'thumbnails/{stem}_{label}.webp'
+
+
+def render(image, size):
+    variant = image.copy()
+    variant.thumbnail((size, size), Image.LANCZOS)
+    buffer = BytesIO()
+    variant.save(buffer, FORMAT, quality=QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def build_variants(name):
+    with default_storage.open(name, 'rb') as f:
+        image = ImageOps.exif_transpose(Image.open(f))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if image.mode in ('LA', 'PA') or 'transparency' in image.info else 'RGB')
+
+    variants = {'source': name}
+    for label, size in SIZES.items():
+        target = variant_name(name, label)
+        if default_storage.exists(target):
+            default_storage.delete(target)
+        variants[label] = default_storage.save(target, ContentFile(render(image, size)))
+    return variants
+
+
+def generate(model, pk, name):
+    image_field, thumbnails_field = IMAGE_FIELDS[model]
+    try:
+        variants = build_variants(name)
+    except (OSError, Image.DecompressionBombError) as exc:
+        logger.warning('Could not build thumbnails for %s: %s', name, exc)
+        return False
+    # Only record them if the image was not replaced in the meantime;
+    # update() also keeps post_save from scheduling this again
+    model.objects.filter(pk=pk, **{image_field: name}).update(**{thumbnails_field: variants})
+    return True
+
+
+def is_current(instance):
+    image_field, thumbnails_field = IMAGE_FIELDS[type(instance)]
+    image = getattr(instance, image_field)
+    thumbnails = getattr(instance, thumbnails_field) or {}
+    return thumbnails.get('source') == (image.name if image else None)
+
+
+def schedule(instance):
+    """Build thumbnails for ``instance`` after commit unless they are current."""
+    image_field, thumbnails_field = IMAGE_FIELDS[type(instance)]
+    if is_current(instance):
+        return
+    if getattr(instance, thumbnails_field):
+        # Stop serving the previous image's variants right away
+        setattr(instance, thumbnails_field, {})
+        type(instance).objects.filter(pk=instance.pk).update(**{thumbnails_field: {}})
+    image = getattr(instance, image_field)
+    if image:
+        defer(generate, type(instance), instance.pk, image.name)
@@ -0,0 +1,171 @@
+"""
+Chunked, resumable uploads stored by content hash.
+
+A client creates an ``Upload`` with the total size, then sends the bytes in
+any number of PATCH requests, each starting at the offset the server has
+already stored (``Upload-Offset``). Chunks are streamed straight from the
+request into a partial file on disk, so an interrupted upload resumes from
+the last stored byte instead of starting over. When the last byte arrives
+the file is hashed and copied into default storage under its SHA-256, so
+identical documents are stored once no matter how often they are uploaded.
+"""
+import hashlib
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File, locks
+from django.core.files.storage import default_storage
+from django.http import UnreadablePostError
+from django.utils import timezone
+
+from .models import Upload
+
+READ_SIZE = 64 * 1024
+ALLOWED_EXTENSIONS = ('.pdf', '.doc', '.docx', '.png', '.jpg', '.jpeg')
+
+
+class UploadError(Exception):
+    pass
+
+
+class OffsetMismatch(UploadError):
+    def __init__(self, offset):
+        super().__init__(f'Upload offset is {offset}')
+        self.offset = offset
+
+
+def partial_path(upload):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f'{upload.pk}.part')
+
+
+def extension(filename):
+    return os.path.splitext(filename)[1].lower()
+
+
+def validate(filename, size):
+    if extension(filename) not in ALLOWED_EXTENSIONS:
+        raise UploadError(f'Allowed file types: {", ".join(ALLOWED_EXTENSIONS)}')
+    if size <= 0 or size > settings.CHUNKED_UPLOAD_MAX_SIZE:
+        raise UploadError(f'Size must be between 1 and {settings.CHUNKED_UPLOAD_MAX_SIZE} bytes')
+
+
+def start(user, kind, filename, size, expected_sha256=''):
+    validate(filename, size)
+    upload = Upload.objects.create(
+        user=user,
+        kind=kind,
+        filename=os.path.basename(filename)[:255],
+        size=size,
+        expected_sha256=expected_sha256.lower(),
+    )
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    open(partial_path(upload), 'wb').close()
+    return upload
+
+
+def append(upload, offset, stream, length):
+    """
+    Write up to ``length`` bytes from ``stream`` at ``offset`` and return the
+    new offset. Whatever arrived before a dropped connection is kept, so the
+    client can resume from there. Completes the upload on its last byte.
+    """
+    if upload.status == 'COMPLETE':
+        raise OffsetMismatch(upload.offset)
+    path = partial_path(upload)
+    try:
+        partial = open(path, 'r+b')
+    except FileNotFoundError:
+        raise UploadError('Upload expired, start a new one')
+    with partial:
+        # One writer per upload; the offset is re-read under the lock
+        locks.lock(partial, locks.LOCK_EX)
+        try:
+            upload.refresh_from_db(fields=['offset', 'status'])
+            if upload.status == 'COMPLETE' or offset != upload.offset:
+                raise OffsetMismatch(upload.offset)
+            length = min(length, upload.size - offset, settings.CHUNKED_UPLOAD_CHUNK_SIZE)
+
+            received = 0
+            partial.seek(offset)
+            try:
+                while received < length:
+                    data = stream.read(min(READ_SIZE, length - received))
+                    if not data:
+                        break
+                    partial.write(data)
+                    received += len(data)
+            except (OSError, UnreadablePostError):
+                # The client went away mid-chunk
+                pass
+            partial.truncate()
+            partial.flush()
+
+            upload.offset = offset + received
+            Upload.objects.filter(pk=upload.pk).update(offset=upload.offset, updated_at=timezone.now())
+            if upload.offset == upload.size:
+                complete(upload, path)
+        finally:
+            locks.unlock(partial)
+
+    if upload.status == 'COMPLETE':
+        os.remove(path)
+    return upload.offset
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as partial:
+        for block in iter(lambda: partial.read(READ_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def content_name(sha256, filename):
+    return f'documents/{sha256[:2]}/{sha256}{extension(filename)}'
+
+
+def store(path, sha256, filename):
+    """
+    Copy the file at ``path`` into default storage under its content hash
+    and return the stored name. A file that is already stored is not
+    written again.
+    """
+    name = content_name(sha256, filename)
+    if not default_storage.exists(name):
+        with open(path, 'rb') as partial:
+            saved = default_storage.save(name, File(partial))
+        if saved != name:
+            # Another upload stored the same content in the meantime
+            default_storage.delete(saved)
+    return name
+
+
+def complete(upload, path):
+    sha256 = file_hash(path)
+    if upload.expected_sha256 and upload.expected_sha256 != sha256:
+        # Start over: the stored bytes are not the file the client meant
+        with open(path, 'r+b') as partial:
+            partial.truncate(0)
+        Upload.objects.filter(pk=upload.pk).update(offset=0)
+        upload.offset = 0
+        raise UploadError('Checksum mismatch, upload the file again')
+
+    upload.sha256 = sha256
+    upload.file = store(path, sha256, upload.filename)
+    upload.status = 'COMPLETE'
+    upload.save(update_fields=['sha256', 'file', 'status', 'updated_at'])
+
+
+def purge_stale(max_age=timedelta(days=1)):
+    """Delete pending uploads untouched for ``max_age`` and their partial files."""
+    stale = Upload.objects.filter(status='PENDING', updated_at__lt=timezone.now() - max_age)
+    count = 0
+    for upload in stale.iterator():
+        try:
+            os.remove(partial_path(upload))
+        except FileNotFoundError:
+            pass
+        upload.delete()
+        count += 1
+    return count
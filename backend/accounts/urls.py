@@ -1,10 +1,12 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (
     UserViewSet,
     EmployeeProfileViewSet,
-    CompanyProfileViewSet
+    CompanyProfileViewSet,
+    UploadViewSet
 )
 from .auth_views import (
     CustomTokenObtainPairView,
@@ -13,11 +15,14 @@ from .auth_views import (
     logout_view
 )
 from .google_auth import google_login
+from .async_views import HANDLERS
+from core.async_views import async_patterns
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet)
 router.register(r'employee-profiles', EmployeeProfileViewSet)
 router.register(r'company-profiles', CompanyProfileViewSet, basename='company-profile')
+router.register(r'uploads', UploadViewSet, basename='upload')
 
 urlpatterns = [
     # Authentication endpoints
@@ -30,4 +35,7 @@ urlpatterns = [
     
     # Include router URLs
     path('', include(router.urls)),
-] 
\ No newline at end of file
+]
+
+if settings.ASYNC_VIEWS:
+    urlpatterns = async_patterns(urlpatterns, HANDLERS)
@@ -0,0 +1,54 @@
+"""
+Bounded per-process LRU of full User rows.
+
+Saves and deletes invalidate entries in the process that made them; the TTL
+bounds how long another process can serve a stale copy.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class UserCache:
+    def __init__(self, maxsize=1024, ttl=60, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, user_id):
+        """Return a private copy of the user, loading it on a miss."""
+        from .models import User
+
+        now = self.clock()
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self.entries.move_to_end(user_id)
+                return copy.copy(entry[0])
+
+        user = User.objects.get(pk=user_id)
+        with self.lock:
+            self.entries[user_id] = (user, now + self.ttl)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return copy.copy(user)
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+user_cache = UserCache(
+    maxsize=getattr(settings, 'USER_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'USER_CACHE_TTL', 60),
+)
@@ -1,23 +1,29 @@
-from rest_framework import viewsets, status
+from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.core.mail import send_mail
 from django.conf import settings
-from .models import User, EmployeeProfile, CompanyProfile
-from .serializers import UserSerializer, EmployeeProfileSerializer, CompanyProfileSerializer
+from django.db import transaction
+from .models import User, EmployeeProfile, CompanyProfile, Upload
+from .serializers import UserSerializer, EmployeeProfileSerializer, CompanyProfileSerializer, UploadSerializer
+from core.replicas import ReplicaReadMixin
+from core.serializers import SparseQuerysetMixin
+from jobs.pagination import KeysetPagination
+from . import outbox, search, uploads
 
-class UserViewSet(viewsets.ModelViewSet):
-    queryset = User.objects.all()
+class UserViewSet(ReplicaReadMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
+    queryset = User.objects.select_related('employeeprofile', 'companyprofile')
     serializer_class = UserSerializer
 
     @action(detail=False, methods=['post'])
     def register(self, request):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
-            user = serializer.save()
-            # Send verification email
-            self.send_verification_email(user)
+            # The email is queued in the same transaction as the user, and
+            # sent by the send_outbox_emails worker
+            with transaction.atomic():
+                user = serializer.save()
+                self.send_verification_email(user)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -25,14 +31,36 @@ class UserViewSet(viewsets.ModelViewSet):
         # Implement email verification logic here
         subject = 'Verify your email'
         message = f'Click the link to verify your email: {settings.FRONTEND_URL}/verify/{user.id}'
-        send_mail(subject, message, settings.EMAIL_HOST_USER, [user.email])
+        outbox.enqueue(subject, message, [user.email], settings.EMAIL_HOST_USER)
 
-class EmployeeProfileViewSet(viewsets.ModelViewSet):
-    queryset = EmployeeProfile.objects.all()
+class EmployeeProfileViewSet(ReplicaReadMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
+    queryset = EmployeeProfile.objects.select_related('user')
     serializer_class = EmployeeProfileSerializer
     permission_classes = [IsAuthenticated]
+    replica_actions = ('list', 'retrieve', 'search')
+    search_query = None
 
-class CompanyProfileViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        # Candidate search for employers, ranked by relevance to ?q= over
+        # skills, experience and resume text
+        if request.user.role != 'EMPLOYER' and not request.user.is_staff:
+            return Response(
+                {'error': 'Only employers can search candidates'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        query = request.query_params.get('q', '')
+        if not query.strip():
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        self.search_query = query
+        profiles = search.search_profiles(self.filter_queryset(self.get_queryset()), query)
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(profiles, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+class CompanyProfileViewSet(ReplicaReadMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     serializer_class = CompanyProfileSerializer
     permission_classes = [IsAuthenticated]
 
@@ -74,4 +102,59 @@ class CompanyProfileViewSet(viewsets.ModelViewSet):
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST) 
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST) 
+
+class UploadViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Chunked, resumable uploads. POST the file's kind, name and size, then
+    PATCH the bytes in order with an ``Upload-Offset`` header; GET (or a
+    failed PATCH) reports the offset to resume from.
+    """
+    serializer_class = UploadSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return Upload.objects.filter(user=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            upload = uploads.start(request.user, **serializer.validated_data)
+        except uploads.UploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return self.upload_response(upload, status.HTTP_201_CREATED)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.upload_response(self.get_object())
+
+    def partial_update(self, request, *args, **kwargs):
+        upload = self.get_object()
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.headers['Content-Length'])
+        except (KeyError, ValueError):
+            return Response(
+                {'error': 'Upload-Offset and Content-Length headers are required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            # request.stream reads the body as it arrives, without parsing it
+            uploads.append(upload, offset, request.stream, length)
+        except uploads.OffsetMismatch as e:
+            response = Response(
+                {'error': str(e), 'offset': e.offset},
+                status=status.HTTP_409_CONFLICT
+            )
+            response['Upload-Offset'] = e.offset
+            return response
+        except uploads.UploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return self.upload_response(upload)
+
+    def upload_response(self, upload, response_status=status.HTTP_200_OK):
+        response = Response(self.get_serializer(upload).data, status=response_status)
+        response['Upload-Offset'] = upload.offset
+        response['Upload-Length'] = upload.size
+        return response
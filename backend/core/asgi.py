@@ -0,0 +1,23 @@
+"""
+ASGI config for core project.
+
+Serves the public job and profile reads with async views (ASYNC_VIEWS).
+Django runs the sync code of each ASGI request in a thread of its own, so
+database connections cannot be reused across requests and are closed
+after each one.
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+os.environ.setdefault('ASYNC_VIEWS', 'True')
+os.environ.setdefault('DATABASE_CONN_MAX_AGE', '0')
+
+application = get_asgi_application()
+
+# Ready before the first recommendation request, see jobs.recommend
+from jobs import recommend  # noqa: E402
+
+recommend.warm_up()
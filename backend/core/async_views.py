@@ -0,0 +1,117 @@
+"""
+Async serving of REST framework views.
+
+REST framework views are synchronous, so under ASGI every request to them
+holds a worker thread until the response is written. ``async_view`` wraps a
+view built with ``as_view()`` into a Django async view that serves its GET
+requests on the event loop: the view instance is set up as ``dispatch()``
+would, the same authentication, permission and throttle checks run (in a
+thread only where they can touch the database or the cache), and
+``handler(view, request)``, a coroutine reading with the async ORM, builds
+the response. Exceptions go through the view's ``handle_exception``, so
+errors look the same as from the sync view.
+
+``async_patterns`` swaps the views of named URL patterns for async ones.
+A handler returns None for requests it does not cover; those, and every
+other method, are served by the sync view in a thread. Viewsets with
+``ReplicaReadMixin`` read from a replica the same way they do synchronously.
+The async path stands in for ``dispatch()`` and ``initial()``, so a view
+that overrides either anywhere else keeps being served synchronously
+rather than having its override skipped.
+"""
+from asgiref.sync import sync_to_async
+from django.urls import URLPattern
+from django.views import View
+from rest_framework.views import APIView
+
+from .replicas import ReplicaReadMixin, ais_pinned
+
+# The versions of these methods that async_view reproduces
+COVERED_OVERRIDES = {
+    'dispatch': (View, APIView, ReplicaReadMixin),
+    'initial': (APIView, ReplicaReadMixin),
+}
+
+
+async def initial(view, request):
+    """``APIView.initial`` for async views; replica selection is left to ``async_view``."""
+    view.format_kwarg = view.get_format_suffix(**view.kwargs)
+    request.accepted_renderer, request.accepted_media_type = view.perform_content_negotiation(request)
+    request.version, request.versioning_scheme = view.determine_version(request, *view.args, **view.kwargs)
+    # Anonymous requests are authenticated without any I/O
+    if request._request.META.get('HTTP_AUTHORIZATION'):
+        await sync_to_async(view.perform_authentication)(request)
+    else:
+        view.perform_authentication(request)
+    view.check_permissions(request)
+    if view.throttle_classes:
+        await sync_to_async(view.check_throttles)(request)
+
+
+def covers(view_class):
+    """Whether async_view reproduces everything ``view_class`` does before its handler."""
+    return all(
+        cls in covered
+        for name, covered in COVERED_OVERRIDES.items()
+        for cls in view_class.__mro__ if name in vars(cls)
+    )
+
+
+def async_view(sync_view, handler):
+    view_class = sync_view.cls
+    if not covers(view_class):
+        return sync_view
+    actions = getattr(sync_view, 'actions', None)
+    serve_sync = sync_to_async(sync_view)
+
+    async def view(django_request, *args, **kwargs):
+        if django_request.method != 'GET':
+            return await serve_sync(django_request, *args, **kwargs)
+
+        self = view_class(**sync_view.initkwargs)
+        if actions is not None:
+            self.action_map = actions
+        self.args, self.kwargs = args, kwargs
+        request = self.initialize_request(django_request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            try:
+                await initial(self, request)
+                if getattr(self, 'uses_replica', None) and self.uses_replica(request) and not (
+                    request.user.is_authenticated and await ais_pinned(request.user.pk)
+                ):
+                    self.use_replica()
+                response = await handler(self, request)
+            finally:
+                if hasattr(self, 'release_replica'):
+                    self.release_replica()
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        if response is None:
+            return await serve_sync(django_request, *args, **kwargs)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    # What as_view() sets on the views it returns; Django's csrf_exempt()
+    # only wraps sync views
+    view.__name__ = sync_view.__name__
+    view.cls = view_class
+    view.initkwargs = sync_view.initkwargs
+    if actions is not None:
+        view.actions = actions
+    view.csrf_exempt = True
+    return view
+
+
+def async_patterns(patterns, handlers):
+    """``patterns`` with the views of the names in ``handlers`` replaced by ``async_view()``."""
+    return [
+        URLPattern(
+            pattern.pattern, async_view(pattern.callback, handlers[pattern.name]),
+            pattern.default_args, pattern.name
+        )
+        if isinstance(pattern, URLPattern) and pattern.name in handlers else pattern
+        for pattern in patterns
+    ]
@@ -0,0 +1,121 @@
+"""
+File responses for media that is served through Django.
+
+``serve_file`` answers conditional requests (ETag / Last-Modified) from a
+``stat`` alone, honours single byte ranges, and either hands the transfer
+to the web server (``MEDIA_OFFLOAD``: ``x-accel-redirect`` for nginx,
+``x-sendfile`` for Apache/lighttpd) or streams the file in fixed-size
+chunks, so a download never holds a worker or the file in memory for
+longer than necessary.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def file_etag(stat):
+    return f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+
+
+def parse_range(header, size):
+    """
+    Return ``(start, end)`` (inclusive) for a single byte range, None to
+    serve the whole file, or False if the range cannot be satisfied.
+    Multiple ranges are answered with the whole file, which HTTP allows.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def range_applies(request, etag, last_modified):
+    # If-Range: only honour Range if the client's copy is still current
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    date = parse_http_date_safe(if_range)
+    return date is not None and date >= int(last_modified)
+
+
+def read_chunks(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(CHUNK_SIZE, length))
+            if not data:
+                return
+            length -= len(data)
+            yield data
+
+
+def serve_file(request, path, name, cache_control='private, no-cache'):
+    """
+    Respond with the file at ``path``; ``name`` is its path relative to
+    MEDIA_ROOT, used for the offload header.
+    """
+    stat = os.stat(path)
+    etag = file_etag(stat)
+    last_modified = stat.st_mtime
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(last_modified))
+    if response is None:
+        content_type, encoding = mimetypes.guess_type(path)
+        content_type = content_type or 'application/octet-stream'
+        offload = getattr(settings, 'MEDIA_OFFLOAD', '')
+
+        if offload == 'x-accel-redirect':
+            # nginx sends the file and handles Range itself
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = quote(settings.MEDIA_ACCEL_PREFIX + name)
+        elif offload == 'x-sendfile':
+            response = HttpResponse(content_type=content_type)
+            response['X-Sendfile'] = path
+        else:
+            byte_range = None
+            if range_applies(request, etag, last_modified):
+                byte_range = parse_range(request.headers.get('Range'), stat.st_size)
+            if byte_range is False:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{stat.st_size}'
+                return response
+
+            start, end = byte_range or (0, stat.st_size - 1)
+            length = end - start + 1
+            body = read_chunks(path, start, length) if request.method != 'HEAD' else iter(())
+            response = StreamingHttpResponse(body, content_type=content_type, status=206 if byte_range else 200)
+            response['Content-Length'] = length
+            if byte_range:
+                response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        if encoding:
+            response['Content-Encoding'] = encoding
+        response['Accept-Ranges'] = 'bytes'
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = cache_control
+    return response
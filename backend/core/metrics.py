@@ -0,0 +1,363 @@
+"""
+Per-request timing and Prometheus metrics.
+
+``MetricsMiddleware`` tags every request with its endpoint (the DRF
+viewset and action, e.g. ``JobViewSet.list``, or the view function's
+name), times the whole request, the view and the rendering, and records
+them as histograms. A ``METRICS_SAMPLE_RATE`` share of requests also gets
+the detailed breakdown: SQL query count and time, through a database
+execute wrapper, and serializer time, reported by the serializers and
+projections while a sample is active. The same numbers go to the client
+in a ``Server-Timing`` header. The execute wrapper is installed on every
+database connection as it is opened, so queries that the async ORM runs in
+worker threads are counted too.
+
+Each worker process aggregates in memory and publishes a snapshot to the
+shared cache every ``FLUSH_INTERVAL`` seconds. Live workers are found
+through numbered slot keys: a worker claims a free slot with ``cache.add``
+(atomic, so no two workers share one) and keeps it alive by touching it on
+every flush, so both the slot and the snapshot of a dead worker expire
+after ``WORKER_TIMEOUT``. ``/metrics`` merges the snapshots of the other
+live workers with the scraped worker's own in-memory numbers into the
+Prometheus text format, without writing anything itself.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+FLUSH_INTERVAL = 15
+WORKER_KEY = 'core:metrics:worker:{}'
+WORKER_SLOT_KEY = 'core:metrics:slot:{}'
+WORKER_TIMEOUT = 5 * 60
+MAX_WORKERS = 256
+
+logger = logging.getLogger(__name__)
+
+HELP = {
+    'http_requests_total': ('counter', 'Requests by endpoint, method and status'),
+    'http_request_duration_seconds': ('histogram', 'Time from the first middleware to the response'),
+    'http_view_duration_seconds': ('histogram', 'Time spent in the view'),
+    'http_render_duration_seconds': ('histogram', 'Time spent rendering the response body'),
+    'http_db_queries': ('histogram', 'SQL queries per request, sampled'),
+    'http_db_duration_seconds': ('histogram', 'SQL time per request, sampled'),
+    'http_serialize_duration_seconds': ('histogram', 'Serializer time per request, sampled'),
+}
+
+_sample = ContextVar('metrics_sample', default=None)
+_collectors = []
+
+
+class Sample:
+    __slots__ = ('queries', 'db', 'serialize')
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+
+
+def record_query(execute, sql, params, many, context):
+    # The execute wrapper; the context variable follows the request into
+    # sync_to_async threads
+    sample = _sample.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        sample.db += time.perf_counter() - start
+        sample.queries += 1
+
+
+def install_execute_wrapper(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    # Also sent on every reconnect of the same connection object
+    install_execute_wrapper(connection)
+
+
+def current_sample():
+    """The detailed sample of the current request, or None if it is not sampled."""
+    return _sample.get()
+
+
+def add_serialize_time(seconds):
+    sample = _sample.get()
+    if sample is not None:
+        sample.serialize += seconds
+
+
+def register_collector(collect):
+    """
+    Add ``collect()``, returning ``(name, type, help, value)`` tuples read
+    when /metrics is scraped, e.g. counters already kept in the cache.
+    """
+    _collectors.append(collect)
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # (name, labels): count, or [bucket counts..., sum, count]
+        self.counters = {}
+        self.histograms = {}
+        self.buckets = {}
+
+    def inc(self, name, labels, amount=1):
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value, buckets=DURATION_BUCKETS):
+        key = (name, labels)
+        position = bisect_left(buckets, value)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(buckets) + 3)
+                self.buckets[name] = buckets
+            histogram[position] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': dict(self.counters),
+                'histograms': {key: list(values) for key, values in self.histograms.items()},
+                'buckets': dict(self.buckets),
+            }
+
+
+registry = Registry()
+worker_id = f'{socket.gethostname()}:{os.getpid()}'
+_last_flush = 0.0
+_slot = None
+
+
+def claim_slot():
+    for slot in range(MAX_WORKERS):
+        if cache.add(WORKER_SLOT_KEY.format(slot), worker_id, WORKER_TIMEOUT):
+            return slot
+    logger.warning('All %d metrics worker slots are taken; %s is not published', MAX_WORKERS, worker_id)
+    return None
+
+
+def flush():
+    """Publish this worker's metrics to the shared cache."""
+    global _last_flush, _slot
+    _last_flush = time.monotonic()
+    cache.set(WORKER_KEY.format(worker_id), registry.snapshot(), WORKER_TIMEOUT)
+    # A slot that expired may have been claimed by another worker since
+    key = WORKER_SLOT_KEY.format(_slot)
+    if _slot is None or cache.get(key) != worker_id or not cache.touch(key, WORKER_TIMEOUT):
+        _slot = claim_slot()
+
+
+def live_workers():
+    slots = cache.get_many([WORKER_SLOT_KEY.format(slot) for slot in range(MAX_WORKERS)])
+    return set(slots.values())
+
+
+def merged_snapshot():
+    workers = live_workers() - {worker_id}
+    snapshots = [
+        *cache.get_many([WORKER_KEY.format(worker) for worker in workers]).values(),
+        registry.snapshot(),
+    ]
+    counters, histograms, buckets = {}, {}, {}
+    for snapshot in snapshots:
+        for key, value in snapshot['counters'].items():
+            counters[key] = counters.get(key, 0) + value
+        for key, values in snapshot['histograms'].items():
+            total = histograms.setdefault(key, [0] * len(values))
+            for position, value in enumerate(values):
+                total[position] += value
+        buckets.update(snapshot['buckets'])
+    return counters, histograms, buckets
+
+
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def format_bound(bound):
+    return repr(float(bound)) if not isinstance(bound, int) else str(bound)
+
+
+def exposition():
+    counters, histograms, buckets = merged_snapshot()
+    lines, described = [], set()
+
+    def describe(name, metric_type, text):
+        if name not in described:
+            described.add(name)
+            lines.append(f'# HELP {name} {text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+
+    for (name, labels), value in sorted(counters.items()):
+        describe(name, *HELP.get(name, ('counter', name)))
+        lines.append(f'{name}{format_labels(labels)} {value}')
+    for (name, labels), values in sorted(histograms.items()):
+        describe(name, *HELP.get(name, ('histogram', name)))
+        cumulative = 0
+        for bound, count in zip(buckets[name], values):
+            cumulative += count
+            lines.append(f'{name}_bucket{format_labels(labels, [("le", format_bound(bound))])} {cumulative}')
+        lines.append(f'{name}_bucket{format_labels(labels, [("le", "+Inf")])} {values[-1]}')
+        lines.append(f'{name}_sum{format_labels(labels)} {values[-2]:.6f}')
+        lines.append(f'{name}_count{format_labels(labels)} {values[-1]}')
+    for collect in _collectors:
+        for name, metric_type, text, value in collect():
+            describe(name, metric_type, text)
+            lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """Records request metrics and sets Server-Timing; see the module docstring."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # Django calls sync hooks of async middleware in a thread; these
+            # only take timestamps
+            self.process_view = self.aprocess_view
+            self.process_template_response = self.aprocess_template_response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        sample, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _sample.reset(token)
+        self.record(request, response, sample)
+        if time.monotonic() - _last_flush > FLUSH_INTERVAL:
+            flush()
+        return response
+
+    async def __acall__(self, request):
+        sample, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _sample.reset(token)
+        self.record(request, response, sample)
+        if time.monotonic() - _last_flush > FLUSH_INTERVAL:
+            await sync_to_async(flush)()
+        return response
+
+    def start(self, request):
+        request._metrics = {'start': time.perf_counter()}
+        sampled = random.random() < getattr(settings, 'METRICS_SAMPLE_RATE', 0.1)
+        sample = None
+        if sampled:
+            sample = Sample()
+            # Connections opened before this module was imported
+            for connection in connections.all(initialized_only=True):
+                install_execute_wrapper(connection)
+        return sample, _sample.set(sample)
+
+    def record(self, request, response, sample):
+        timings = request._metrics
+        end = time.perf_counter()
+        endpoint = timings.get('endpoint', 'unmatched')
+        total = end - timings['start']
+        view = timings.get('view_end', end) - timings.get('view_start', timings['start'])
+        render = timings['render_end'] - timings['view_end'] if 'render_end' in timings else 0.0
+
+        labels = (('endpoint', endpoint), ('method', request.method))
+        registry.inc('http_requests_total', labels + (('status', response.status_code),))
+        registry.observe('http_request_duration_seconds', labels, total)
+        registry.observe('http_view_duration_seconds', labels, view)
+        registry.observe('http_render_duration_seconds', labels, render)
+        parts = [('total', total), ('view', view), ('render', render)]
+        if sample is not None:
+            registry.observe('http_db_queries', labels, sample.queries, QUERY_BUCKETS)
+            registry.observe('http_db_duration_seconds', labels, sample.db)
+            registry.observe('http_serialize_duration_seconds', labels, sample.serialize)
+            parts += [('db', sample.db, f'{sample.queries} queries'), ('serialize', sample.serialize)]
+
+        if getattr(settings, 'METRICS_SERVER_TIMING', True):
+            response['Server-Timing'] = ', '.join(
+                f'{part[0]};dur={part[1] * 1000:.1f}' + (f';desc="{part[2]}"' if len(part) > 2 else '')
+                for part in parts
+            )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = getattr(request, '_metrics', None)
+        if timings is None:
+            return None
+        cls = getattr(view_func, 'cls', None)
+        if cls is None:
+            timings['endpoint'] = getattr(view_func, '__name__', 'unknown')
+        else:
+            # ViewSets map methods to actions; @api_view functions keep their name
+            actions = getattr(view_func, 'actions', None) or {}
+            action = actions.get(request.method.lower())
+            timings['endpoint'] = f'{cls.__name__}.{action}' if action else cls.__name__
+        timings['view_start'] = time.perf_counter()
+        return None
+
+    def process_template_response(self, request, response):
+        # Called between the view returning and the response being rendered
+        timings = getattr(request, '_metrics', None)
+        if timings is not None:
+            timings['view_end'] = time.perf_counter()
+            response.add_post_render_callback(lambda rendered: self.rendered(timings))
+        return response
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        return MetricsMiddleware.process_view(self, request, view_func, view_args, view_kwargs)
+
+    async def aprocess_template_response(self, request, response):
+        return MetricsMiddleware.process_template_response(self, request, response)
+
+    def rendered(self, timings):
+        timings['render_end'] = time.perf_counter()
+
+
+def metrics_view(request):
+    # Prometheus scrapes with "Authorization: Bearer <METRICS_TOKEN>"; without
+    # a token configured the endpoint only exists in DEBUG
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            raise Http404
+    elif not settings.DEBUG:
+        raise Http404
+    return HttpResponse(exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,176 @@
+"""
+Read-only projections of serializers.
+
+A ``Projection`` renders rows fetched with ``values()`` into exactly the
+representation its serializer would produce from model instances, without
+instantiating models or running the per-field ``get_attribute`` machinery.
+Only serializers made of plain column fields, primary key relations and
+nested serializers of the same kind can be projected; ``Projection.build``
+returns None for anything else and callers fall back to the serializer.
+"""
+import time
+
+from rest_framework import fields as drf_fields
+from rest_framework import relations, serializers
+from rest_framework.permissions import BasePermission
+from rest_framework.response import Response
+from django.db import models
+from django.shortcuts import get_object_or_404
+
+from . import metrics
+from .serializers import _model_path
+
+# Serializer fields whose to_representation() takes the raw column value
+COLUMN_FIELDS = (
+    drf_fields.BooleanField,
+    drf_fields.CharField,
+    drf_fields.ChoiceField,
+    drf_fields.DateField,
+    drf_fields.DateTimeField,
+    drf_fields.DecimalField,
+    drf_fields.FloatField,
+    drf_fields.IntegerField,
+    drf_fields.JSONField,
+    drf_fields.UUIDField,
+)
+
+# (serializer field, model fields) pairs for which to_representation() returns
+# the column value unchanged, so it can be skipped
+IDENTITY_FIELDS = (
+    (drf_fields.CharField, (models.CharField, models.TextField)),
+    (drf_fields.IntegerField, (models.IntegerField, models.AutoField)),
+)
+
+
+def _leaf_field(model, source):
+    *relations, name = source.split('.')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+def _converter(field, model_field):
+    for serializer_field, model_fields in IDENTITY_FIELDS:
+        if (type(field).to_representation is serializer_field.to_representation
+                and isinstance(model_field, model_fields)):
+            return None
+    return field.to_representation
+
+
+class Projection:
+    def __init__(self, model, columns, prefix=''):
+        # columns: (field name, values() key, converter or None, nested Projection or None)
+        self.model = model
+        self.columns = columns
+        self.prefix = prefix
+        self.pk_key = f'{prefix}{model._meta.pk.name}'
+
+    @classmethod
+    def build(cls, serializer, model=None, prefix=''):
+        model = model or serializer.Meta.model
+        columns = []
+        for field in serializer._readable_fields:
+            if field.source == '*' or isinstance(field, serializers.ListSerializer):
+                return None
+            path = _model_path(model, field.source)
+            if path is None:
+                return None
+            key = f'{prefix}{path[0]}'
+            if isinstance(field, serializers.BaseSerializer):
+                related_model = model._meta.get_field(field.source.split('.')[-1]).related_model
+                nested = cls.build(field, related_model, prefix=f'{key}__')
+                if nested is None:
+                    return None
+                columns.append((field.field_name, key, None, nested))
+            elif isinstance(field, relations.PrimaryKeyRelatedField):
+                # values() already yields the related primary key
+                if field.pk_field is not None:
+                    return None
+                columns.append((field.field_name, key, None, None))
+            elif isinstance(field, drf_fields.ReadOnlyField):
+                columns.append((field.field_name, key, None, None))
+            elif isinstance(field, COLUMN_FIELDS):
+                converter = _converter(field, _leaf_field(model, field.source))
+                columns.append((field.field_name, key, converter, None))
+            else:
+                return None
+        return cls(model, columns, prefix)
+
+    def keys(self):
+        keys = [self.pk_key]
+        for _, key, _, nested in self.columns:
+            keys += nested.keys() if nested is not None else [key]
+        return list(dict.fromkeys(keys))
+
+    def values(self, queryset, extra=()):
+        """The values() queryset this projection renders."""
+        return queryset.values(*dict.fromkeys(self.keys() + list(extra)))
+
+    def represent(self, row):
+        data = {}
+        for name, key, convert, nested in self.columns:
+            if nested is not None:
+                # A missing related object renders as null, like the serializer
+                data[name] = None if row[nested.pk_key] is None else nested.represent(row)
+                continue
+            value = row[key]
+            if value is None or convert is None:
+                data[name] = value
+            else:
+                data[name] = convert(value)
+        return data
+
+    def represent_many(self, rows):
+        start = time.perf_counter()
+        represent = self.represent
+        data = [represent(row) for row in rows]
+        metrics.add_serialize_time(time.perf_counter() - start)
+        return data
+
+
+class ProjectionMixin:
+    """
+    Viewset mixin that serves list and retrieve from a ``Projection`` of the
+    serializer when it can be built, and from the serializer otherwise.
+    Columns listed in ``sparse_required_fields`` are fetched as well.
+    """
+    projection_actions = ('list', 'retrieve')
+
+    def get_projection(self):
+        if self.action not in self.projection_actions:
+            return None
+        return Projection.build(self.get_serializer())
+
+    def projected_queryset(self, projection):
+        queryset = self.filter_queryset(self.get_queryset())
+        return projection.values(queryset, getattr(self, 'sparse_required_fields', ()))
+
+    def list(self, request, *args, **kwargs):
+        projection = self.get_projection()
+        if projection is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.projected_queryset(projection)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(projection.represent_many(page))
+        return Response(projection.represent_many(queryset))
+
+    def get_retrieve_projection(self):
+        # Object permissions need a model instance
+        if any(
+            type(permission).has_object_permission is not BasePermission.has_object_permission
+            for permission in self.get_permissions()
+        ):
+            return None
+        return self.get_projection()
+
+    def retrieve(self, request, *args, **kwargs):
+        projection = self.get_retrieve_projection()
+        if projection is None:
+            return super().retrieve(request, *args, **kwargs)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(
+            self.projected_queryset(projection),
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        return Response(projection.represent(row))
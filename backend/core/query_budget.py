@@ -0,0 +1,136 @@
+"""
+Query budgets for API endpoints.
+
+Each budget states the most SQL queries an endpoint may run, independent of
+how many rows it returns. ``query_budget`` can wrap any block of code (in a
+test or a shell session) and ``check_query_budgets`` runs every budget in
+``ENDPOINT_BUDGETS`` against generated data, as does the test suite.
+"""
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(limit, label='', using='default'):
+    with CaptureQueriesContext(connections[using]) as context:
+        yield context
+    if len(context) > limit:
+        queries = '\n'.join(
+            f'{number}. {query["sql"]}'
+            for number, query in enumerate(context.captured_queries, start=1)
+        )
+        raise QueryBudgetExceeded(
+            f'{label or "Block"} ran {len(context)} queries, budget is {limit}:\n{queries}'
+        )
+
+
+# (label, user, method, url, budget). ``user`` names one of the fixture users
+# built by create_fixtures (or picked by benchmark_endpoints), or None for
+# an anonymous request. Budgets do not include the authentication lookup.
+ENDPOINT_BUDGETS = [
+    ('JobViewSet.list', None, 'get', '/api/jobs/', 1),
+    ('JobViewSet.list (search)', None, 'get', '/api/jobs/?q=python+developer', 4),
+    ('JobViewSet.list (archived)', None, 'get', '/api/jobs/?archived=1', 1),
+    ('JobViewSet.list (ndjson)', None, 'get', '/api/jobs/?format=ndjson', 2),
+    ('JobViewSet.facets', None, 'get', '/api/jobs/facets/?location=remote', 3),
+    ('JobViewSet.retrieve', None, 'get', '/api/jobs/{job}/', 1),
+    ('JobViewSet.my_jobs', 'employer', 'get', '/api/jobs/my_jobs/', 1),
+    ('JobViewSet.export', 'employer', 'get', '/api/jobs/export/', 1),
+    # Includes building the job matrix on first use
+    ('JobViewSet.recommended', 'employee', 'get', '/api/jobs/recommended/', 4),
+    ('JobApplicationViewSet.list (employer)', 'employer', 'get', '/api/applications/', 1),
+    ('JobApplicationViewSet.list (employee)', 'employee', 'get', '/api/applications/', 1),
+    ('JobApplicationViewSet.list (archived)', 'employee', 'get', '/api/applications/?archived=1', 1),
+    ('JobApplicationViewSet.recent', 'employer', 'get', '/api/applications/recent/', 1),
+    ('JobApplicationViewSet.retrieve', 'employer', 'get', '/api/applications/{application}/', 1),
+    ('UserViewSet.list', 'employer', 'get', '/api/accounts/users/', 1),
+    ('UserViewSet.retrieve', 'employer', 'get', '/api/accounts/users/{employee}/', 1),
+    ('EmployeeProfileViewSet.list', 'employer', 'get', '/api/accounts/employee-profiles/', 1),
+    ('EmployeeProfileViewSet.search', 'employer', 'get', '/api/accounts/employee-profiles/search/?q=python+django', 4),
+    ('EmployeeProfileViewSet.retrieve', 'employer', 'get', '/api/accounts/employee-profiles/{profile}/', 1),
+    ('CompanyProfileViewSet.list', 'employer', 'get', '/api/accounts/company-profiles/', 1),
+    ('CompanyProfileViewSet.retrieve', 'employer', 'get', '/api/accounts/company-profiles/{employer}/', 1),
+    ('get_user_profile', 'employee', 'get', '/api/accounts/profile/', 1),
+]
+
+
+def request_endpoint(fixtures, label, user, method, url, budget):
+    """
+    Make the request of one ``ENDPOINT_BUDGETS`` entry within its budget and
+    return the response and the captured queries.
+    """
+    client = APIClient(HTTP_HOST='localhost')
+    if user:
+        client.force_authenticate(fixtures[user])
+    url = url.format(**{name: obj.pk for name, obj in fixtures.items()})
+    with query_budget(budget, label) as context:
+        response = getattr(client, method)(url)
+        if response.streaming:
+            b''.join(response.streaming_content)
+    return response, context
+
+
+def create_fixtures(rows):
+    """
+    Create an employer and ``rows`` jobs, applications and candidate
+    profiles, and return the objects the URLs in ``ENDPOINT_BUDGETS`` name.
+    """
+    from accounts import search as profile_search
+    from accounts.models import User, EmployeeProfile, CompanyProfile
+    from jobs.models import Job, JobApplication
+
+    employer = User.objects.create_user(
+        email='budget-employer@example.com', username='budget-employer',
+        password='budget', role='EMPLOYER'
+    )
+    company = CompanyProfile.objects.create(
+        user=employer, company_name='Budget Inc', company_description='Budget',
+        industry='Software', company_size='10', location='Remote'
+    )
+    User.objects.bulk_create([
+        User(email=f'budget-employee-{i}@example.com', username=f'budget-employee-{i}', role='EMPLOYEE')
+        for i in range(rows)
+    ])
+    employees = list(User.objects.filter(email__startswith='budget-employee-').order_by('pk'))
+    EmployeeProfile.objects.bulk_create([
+        EmployeeProfile(
+            user=employee, resume='resumes/budget.pdf', degree='degrees/budget.pdf',
+            skills='Python, Django', experience='Some', phone='0'
+        )
+        for employee in employees
+    ])
+    for profile in EmployeeProfile.objects.filter(user__in=employees):
+        profile_search.index_profile(profile, resume_text='')
+
+    deadline = timezone.now() + timedelta(days=30)
+    jobs = [
+        Job.objects.create(
+            title=f'Python Developer {i}', description='Python developer for Django APIs',
+            requirements='Python', salary_range='1', location='Remote',
+            job_type='FULL_TIME', deadline=deadline, employer=employer
+        )
+        for i in range(rows)
+    ]
+    JobApplication.objects.bulk_create([
+        JobApplication(job=job, applicant=employees[0], cover_letter='Hello')
+        for job in jobs
+    ])
+    application = JobApplication.objects.filter(applicant=employees[0]).first()
+
+    return {
+        'employer': employer,
+        'employee': employees[0],
+        'profile': EmployeeProfile.objects.get(user=employees[0]),
+        'company': company,
+        'job': jobs[0],
+        'application': application,
+    }
@@ -0,0 +1,109 @@
+"""
+Query plan checks for the hot query shapes.
+
+``hot_queries`` builds the queries the API runs most often. ``plan_problems``
+asks the database for each query's plan and reports full table scans and
+sorts that could not be served from an index; ``check_query_plans`` runs them
+all. Planners happily scan tiny tables, so run the check against a database
+with realistic volumes.
+"""
+import json
+
+from django.db import connections
+from django.db.models import Count
+from django.utils import timezone
+
+
+def _mysql_problems(plan):
+    problems = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            table = node.get('table_name')
+            if table and node.get('access_type') == 'ALL':
+                problems.append(f'full table scan of {table}')
+            if node.get('using_filesort'):
+                problems.append('filesort')
+            if node.get('using_temporary_table'):
+                problems.append('temporary table')
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(json.loads(plan))
+    return problems
+
+
+def _sqlite_problems(plan):
+    problems = []
+    for line in plan.splitlines():
+        detail = line.split(None, 3)[-1] if line[:1].isdigit() else line
+        if detail.startswith('SCAN ') and 'INDEX' not in detail:
+            problems.append(f'full table scan: {detail}')
+        elif 'USE TEMP B-TREE FOR' in detail:
+            problems.append(f'sort: {detail}')
+    return problems
+
+
+def _postgresql_problems(plan):
+    problems = []
+    for line in plan.splitlines():
+        node = line.strip().lstrip('->').strip()
+        if node.startswith('Seq Scan'):
+            problems.append(f'full table scan: {node}')
+        elif node.startswith('Sort ') and 'Incremental' not in node:
+            problems.append(f'sort: {node}')
+    return problems
+
+
+def plan_problems(queryset, allow_sort=False):
+    vendor = connections[queryset.db].vendor
+    if vendor == 'mysql':
+        plan = queryset.explain(format='JSON')
+        problems = _mysql_problems(plan)
+    elif vendor == 'postgresql':
+        plan = queryset.explain()
+        problems = _postgresql_problems(plan)
+    else:
+        plan = queryset.explain()
+        problems = _sqlite_problems(plan)
+    if allow_sort:
+        problems = [
+            problem for problem in problems
+            if not problem.startswith(('sort', 'filesort', 'temporary table'))
+        ]
+    return plan, problems
+
+
+def hot_queries(employer, applicant, job):
+    """
+    Return ``(label, queryset, allow_sort)`` for every hot query, built from
+    the same pieces the views use.
+    """
+    from jobs.models import Job, JobApplication
+    from jobs.pagination import after
+    from jobs import search
+
+    latest = Job.objects.order_by('-created_at', '-id')
+    # Listings leave out expired jobs by default
+    open_jobs = latest.filter(deadline__gte=timezone.now())
+    queries = [
+        ('job list', open_jobs[:21], False),
+        ('job list after cursor', open_jobs.filter(after(job.created_at, job.pk))[:21], False),
+        ('job list by type', open_jobs.filter(job_type=job.job_type)[:21], False),
+        ('job list with expired', latest[:21], False),
+        ('my jobs', latest.filter(employer=employer), False),
+        ('employer applications', JobApplication.objects.filter(job__employer=employer), False),
+        ('employee applications', JobApplication.objects.filter(applicant=applicant), False),
+        ('already applied', JobApplication.objects.filter(job=job, applicant=applicant), False),
+    ]
+    # Grouping and ordering by count or score are inherently sorts over the
+    # matched jobs
+    queries += [
+        ('job type counts', open_jobs.order_by().values('job_type').annotate(count=Count('pk')).order_by('-count'), True),
+        ('search', search.search_jobs(open_jobs, job.title)[:21], True),
+        ('search with expired', search.search_jobs(latest, job.title)[:21], True),
+    ]
+    return queries
@@ -0,0 +1,137 @@
+"""
+Read replicas.
+
+Viewsets using ``ReplicaReadMixin`` serve the safe actions listed in
+``replica_actions`` from one of ``REPLICA_DATABASES``; everything else,
+including any read inside a transaction, goes to the primary. Replicas
+lag behind the primary, so a user who just wrote something is pinned to
+the primary for ``REPLICA_MAX_LAG`` seconds and sees their own writes.
+Which database a request reads from is a context variable set by the
+viewset, so reads outside a request (commands, background tasks) are
+never routed to a replica.
+"""
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_KEY = 'core:replicas:pin:{}'
+
+_replica = ContextVar('replica', default=None)
+
+
+def replica_databases():
+    return getattr(settings, 'REPLICA_DATABASES', [])
+
+
+def max_lag():
+    return getattr(settings, 'REPLICA_MAX_LAG', 5)
+
+
+def current_replica():
+    """The replica the current request reads from, or None."""
+    return _replica.get()
+
+
+def pin(user_id):
+    cache.set(PIN_KEY.format(user_id), True, max_lag())
+
+
+async def apin(user_id):
+    await cache.aset(PIN_KEY.format(user_id), True, max_lag())
+
+
+def is_pinned(user_id):
+    return cache.get(PIN_KEY.format(user_id)) is not None
+
+
+async def ais_pinned(user_id):
+    return await cache.aget(PIN_KEY.format(user_id)) is not None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = _replica.get()
+        # A transaction must see its own writes
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *replica_databases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    Viewset mixin that reads from a replica for ``replica_actions``, unless
+    the user is pinned to the primary after a recent write.
+    """
+    replica_actions = ('list', 'retrieve')
+
+    def uses_replica(self, request):
+        return bool(replica_databases()) and request.method in SAFE_METHODS and self.action in self.replica_actions
+
+    def use_replica(self):
+        self._replica_token = _replica.set(random.choice(replica_databases()))
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.uses_replica(request) and not (request.user.is_authenticated and is_pinned(request.user.pk)):
+            self.use_replica()
+
+    def release_replica(self):
+        token = self.__dict__.pop('_replica_token', None)
+        if token is not None:
+            _replica.reset(token)
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            self.release_replica()
+
+
+class ReplicaPinMiddleware:
+    """Pins a user who successfully wrote something to the primary; see the module docstring."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        user_id = self.writer(request, response)
+        if user_id is not None:
+            pin(user_id)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        user_id = self.writer(request, response)
+        if user_id is not None:
+            await apin(user_id)
+        return response
+
+    def writer(self, request, response):
+        if replica_databases() and request.method not in SAFE_METHODS and response.status_code < 400:
+            # REST framework sets request.user once it has authenticated
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                return user.pk
+        return None
@@ -0,0 +1,161 @@
+import time
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+from . import metrics
+
+
+def query_param_set(request, name):
+    value = request.query_params.get(name) if request is not None else None
+    if not value:
+        return None
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+
+class SparseFieldsMixin:
+    """
+    Sparse fieldsets for read requests.
+
+    ``?fields=id,title`` limits the top-level representation to the listed
+    fields; naming a field the serializer lacks is a validation error. Nested objects named in ``expandable_fields`` are rendered with a
+    lean serializer by default; ``?expand=job`` swaps in the full one.
+    Nested serializers never read the query parameters themselves.
+    """
+    expandable_fields = {}
+
+    def is_root(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS or not self.is_root():
+            return fields
+
+        expand = query_param_set(request, 'expand') or set()
+        for name, (serializer_class, kwargs) in self.expandable_fields.items():
+            if name in expand and name in fields:
+                fields[name] = serializer_class(**kwargs)
+
+        requested = query_param_set(request, 'fields')
+        if requested:
+            unknown = requested - set(fields)
+            if unknown:
+                raise serializers.ValidationError({'fields': f'Unknown fields: {", ".join(sorted(unknown))}'})
+            for name in list(fields):
+                if name not in requested:
+                    fields.pop(name)
+        return fields
+
+    def to_representation(self, instance):
+        # Timed for sampled requests, once per top-level object
+        if metrics.current_sample() is None or not self.is_root():
+            return super().to_representation(instance)
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            metrics.add_serialize_time(time.perf_counter() - start)
+
+
+def _model_path(model, source):
+    """
+    Translate a dotted serializer source into ``(column, relations)`` for
+    ``only()``/``select_related()``, or None if it is not a plain model
+    field path (a property or method, say).
+    """
+    parts = source.split('.')
+    relations = []
+    for position, part in enumerate(parts):
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return None
+        is_last = position == len(parts) - 1
+        if field.is_relation:
+            if field.many_to_many or field.one_to_many:
+                return None
+            if not is_last:
+                relations.append('__'.join(parts[:position + 1]))
+                model = field.related_model
+        elif not is_last:
+            return None
+    return '__'.join(parts), relations
+
+
+def _serializer_paths(serializer, model, prefix=''):
+    columns, relations = [f'{prefix}{model._meta.pk.name}'], []
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*':
+            # SerializerMethodField and friends may read anything
+            return None
+        if isinstance(field, serializers.ListSerializer):
+            return None
+        path = _model_path(model, field.source)
+        if path is None:
+            return None
+        column, field_relations = path
+        relations += [f'{prefix}{relation}' for relation in field_relations]
+        if isinstance(field, serializers.BaseSerializer):
+            related_model = model._meta.get_field(field.source.split('.')[-1]).related_model
+            nested = _serializer_paths(field, related_model, prefix=f'{prefix}{column}__')
+            if nested is None:
+                return None
+            relations.append(f'{prefix}{column}')
+            columns += nested[0]
+            relations += nested[1]
+        else:
+            columns.append(f'{prefix}{column}')
+    return columns, relations
+
+
+def narrow_queryset(queryset, serializer, required=()):
+    """
+    Restrict ``queryset`` to the columns and joins ``serializer`` reads,
+    so unrequested TEXT columns are never fetched. ``required`` names
+    extra columns the caller needs, such as the pagination key. Returns the
+    queryset unchanged when the serializer reads something that can't be
+    mapped to columns.
+    """
+    paths = _serializer_paths(serializer, queryset.model)
+    if paths is None:
+        return queryset
+    columns, relations = paths
+    columns += required
+    # Naming a relation in only() loads all of its columns, so it is only
+    # listed when none of its columns are
+    columns += [
+        relation for relation in relations
+        if not any(column.startswith(f'{relation}__') for column in columns)
+    ]
+    relations = [
+        relation for relation in dict.fromkeys(relations)
+        if not any(other.startswith(f'{relation}__') for other in relations)
+    ]
+    queryset = queryset.select_related(None)
+    if relations:
+        # select_related() without arguments would follow every foreign key
+        queryset = queryset.select_related(*relations)
+    return queryset.only(*dict.fromkeys(columns))
+
+
+class SparseQuerysetMixin:
+    """
+    Viewset mixin that narrows read querysets to the serializer's fields.
+    ``sparse_required_fields`` lists columns the view itself reads, such as
+    the ordering used for pagination.
+    """
+    sparse_required_fields = ()
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method in SAFE_METHODS:
+            queryset = narrow_queryset(queryset, self.get_serializer(), self.sparse_required_fields)
+        return queryset
@@ -31,6 +31,16 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 # Media files configuration
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Let the web server send media files once Django has checked access:
+# 'x-accel-redirect' (nginx, internal location at MEDIA_ACCEL_PREFIX) or
+# 'x-sendfile' (Apache mod_xsendfile, lighttpd). Empty streams from Django.
+MEDIA_OFFLOAD = os.getenv('MEDIA_OFFLOAD', '')
+MEDIA_ACCEL_PREFIX = os.getenv('MEDIA_ACCEL_PREFIX', '/protected-media/')
+
+# Chunked uploads (accounts.uploads): partial files are kept outside MEDIA_ROOT
+CHUNKED_UPLOAD_DIR = os.getenv('CHUNKED_UPLOAD_DIR', os.path.join(BASE_DIR, 'upload_chunks'))
+CHUNKED_UPLOAD_MAX_SIZE = 50 * 1024 * 1024
+CHUNKED_UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
 
 # ... other settings ...
 
@@ -50,7 +60,7 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -76,6 +86,10 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
 }
 
+# Per-process cache of full User rows behind ClaimsJWTAuthentication
+USER_CACHE_SIZE = 1024
+USER_CACHE_TTL = 60
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://localhost:5173",
@@ -96,8 +110,37 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'upload-offset',
+    'idempotency-key',
 ]
 
+CORS_EXPOSE_HEADERS = ['upload-offset', 'upload-length']
+
+# Request metrics (see core.metrics): the share of requests that also get
+# SQL and serializer timings, and the bearer token /metrics requires
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', '0.1'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Job recommendations (jobs.recommend): the matrix saved by
+# build_recommendations, loaded at startup instead of scanning the jobs
+# table. Empty builds it from the database in every process.
+RECOMMENDATION_MATRIX_PATH = os.getenv('RECOMMENDATION_MATRIX_PATH', '')
+
+# Cache settings: a shared Redis cache in production, per-process memory otherwise
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Email settings
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = os.getenv('EMAIL_HOST')
@@ -105,6 +148,11 @@ EMAIL_PORT = os.getenv('EMAIL_PORT')
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 EMAIL_USE_TLS = True
+EMAIL_TIMEOUT = 30
+DEFAULT_FROM_EMAIL = os.getenv('EMAIL_HOST_USER', 'webmaster@localhost')
+
+# Used to build links in outgoing emails
+FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:5173')
 
 # Database settings
 DATABASES = {
@@ -117,10 +165,35 @@ DATABASES = {
         'PORT': os.getenv('DATABASE_PORT'),
         'OPTIONS': {
             'init_command': "SET sql_mode='STRICT_TRANS_TABLES'"
-        }
+        },
+        # Keep connections open between requests, checking them before reuse
+        'CONN_MAX_AGE': int(os.getenv('DATABASE_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Read replicas (see core.replicas): comma-separated host[:port] list, each
+# reached with the primary's name and credentials
+REPLICA_DATABASES = []
+for number, replica in enumerate(filter(None, os.getenv('DATABASE_REPLICA_HOSTS', '').split(','))):
+    host, _, port = replica.strip().partition(':')
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(alias)
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+# Seconds a user reads from the primary after writing; should exceed the
+# replication lag
+REPLICA_MAX_LAG = float(os.getenv('REPLICA_MAX_LAG', '5'))
+
+# Serve the public job and profile reads with async views (see
+# core.async_views); core.asgi turns this on
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+
 # Google OAuth2 settings
 SOCIAL_AUTH_GOOGLE_OAUTH2_KEY = os.getenv('GOOGLE_CLIENT_ID')
 SOCIAL_AUTH_GOOGLE_OAUTH2_SECRET = os.getenv('GOOGLE_CLIENT_SECRET')
@@ -135,12 +208,15 @@ AUTHENTICATION_BACKENDS = (
 )
 
 MIDDLEWARE = [
+    # First, so its timings cover every other middleware
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.replicas.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -0,0 +1,54 @@
+"""
+In-process background work.
+
+``defer`` runs a function on a small thread pool once the current
+transaction commits, so request handlers can hand off slow work (such as
+image processing) without waiting for it and without the work seeing
+uncommitted rows. Work queued this way is lost if the process exits, so
+anything deferred must be safe to redo later, e.g. from a backfill command.
+With ``BACKGROUND_TASKS_EAGER`` the function runs synchronously on commit
+instead, which management commands and local debugging can rely on.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'BACKGROUND_TASK_WORKERS', 2),
+                    thread_name_prefix='background-task',
+                )
+    return _executor
+
+
+def run(func, *args, **kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Background task %s failed', getattr(func, '__name__', func))
+    finally:
+        # Worker threads keep their own database connections
+        close_old_connections()
+
+
+def defer(func, *args, **kwargs):
+    def submit():
+        if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+            func(*args, **kwargs)
+        else:
+            get_executor().submit(run, func, *args, **kwargs)
+
+    transaction.on_commit(submit)
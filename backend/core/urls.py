@@ -1,10 +1,15 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
+from accounts.media import serve_media
+from core.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/accounts/', include('accounts.urls')),
     path('api/', include('jobs.urls')),  # This will include all job-related URLs
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT) 
\ No newline at end of file
+    # Media goes through access control; see MEDIA_OFFLOAD for production
+    path(f'{settings.MEDIA_URL.strip("/")}/<path:path>', serve_media, name='media'),
+    # Prometheus scrape target
+    path('metrics', metrics_view, name='metrics'),
+] 
\ No newline at end of file
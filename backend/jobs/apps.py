@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class JobsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'jobs'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from core import metrics
+        from .cache import metric_samples
+        metrics.register_collector(metric_samples)
@@ -0,0 +1,77 @@
+"""
+Archival of long-expired jobs.
+
+Jobs whose deadline passed more than ``ARCHIVE_AFTER`` ago are moved, with
+their applications, into ArchivedJob and ArchivedJobApplication under
+their original ids, one batch per transaction. That keeps the Job and
+JobApplication tables, and with them every listing, count and search,
+sized by the open jobs rather than by the whole history.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .bulk import delete_in, notify_changed
+from .models import (
+    Job, JobApplication, JobSearchDocument, JobSearchPosting, ArchivedJob, ArchivedJobApplication
+)
+
+ARCHIVE_AFTER = timedelta(days=90)
+
+
+def copy(instance, model):
+    return model(**{field.attname: getattr(instance, field.attname) for field in instance._meta.concrete_fields})
+
+
+def expired_job_ids(cutoff, limit):
+    # Range scan of job_deadline_idx
+    return list(
+        Job.objects.filter(deadline__lt=cutoff)
+        .order_by('deadline')
+        .values_list('pk', flat=True)[:limit]
+    )
+
+
+def archive_jobs(job_ids):
+    """Move the jobs and their applications; returns how many of each."""
+    with transaction.atomic():
+        # The row locks hold back new applications to these jobs until the
+        # jobs are gone, after which their foreign key rejects them
+        jobs = list(Job.objects.select_for_update().filter(pk__in=job_ids).order_by())
+        if not jobs:
+            return 0, 0
+        ids = [job.pk for job in jobs]
+        applications = list(JobApplication.objects.filter(job_id__in=ids).order_by())
+
+        ArchivedJob.objects.bulk_create([copy(job, ArchivedJob) for job in jobs])
+        ArchivedJobApplication.objects.bulk_create(
+            [copy(application, ArchivedJobApplication) for application in applications],
+            batch_size=1000
+        )
+        # Plain DELETEs: delete() would collect the cascade and send
+        # signals row by row, which notify_changed covers per batch
+        for model, field in (
+            (JobSearchPosting, 'job'),
+            (JobSearchDocument, 'job'),
+            (JobApplication, 'job'),
+            (Job, 'pk'),
+        ):
+            delete_in(model, field, ids)
+
+        employer_ids = {job.employer_id for job in jobs}
+        transaction.on_commit(lambda: notify_changed(employer_ids, ids))
+    return len(jobs), len(applications)
+
+
+def archive_expired(older_than=ARCHIVE_AFTER, batch_size=500):
+    """Archive every job that expired more than ``older_than`` ago, a batch at a time."""
+    cutoff = timezone.now() - older_than
+    archived_jobs = archived_applications = 0
+    while True:
+        job_ids = expired_job_ids(cutoff, batch_size)
+        if not job_ids:
+            return archived_jobs, archived_applications
+        jobs, applications = archive_jobs(job_ids)
+        archived_jobs += jobs
+        archived_applications += applications
@@ -0,0 +1,60 @@
+"""
+Async versions of the public job reads, served under ASGI (see
+core.async_views). They cover JSON responses built from the job
+projection; search, streaming and the other formats are left to the sync
+actions.
+"""
+from django.http import Http404
+from rest_framework.response import Response
+
+from . import cache
+
+
+def projected_json(request, projection):
+    return projection is not None and request.accepted_renderer.format == 'json'
+
+
+async def job_list(view, request):
+    projection = view.get_projection()
+    if not projected_json(request, projection) or request.query_params.get('q'):
+        return None
+
+    async def build():
+        queryset = view.projected_queryset(projection)
+        page = await view.paginator.apaginate_queryset(queryset, request, view)
+        return view.get_paginated_response(projection.represent_many(page))
+    return await cache.acached_response(view, request, build, vary=view.open_after)
+
+
+async def job_detail(view, request):
+    projection = view.get_retrieve_projection()
+    if not projected_json(request, projection):
+        return None
+
+    async def build():
+        lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+        row = await (
+            view.projected_queryset(projection)
+            .filter(**{view.lookup_field: view.kwargs[lookup_url_kwarg]})
+            .afirst()
+        )
+        if row is None:
+            raise Http404
+        return Response(projection.represent(row))
+    return await cache.acached_response(view, request, build)
+
+
+async def job_facets(view, request):
+    async def build():
+        rows = []
+        for queryset in view.facet_querysets():
+            rows.append([row async for row in queryset])
+        return Response(view.facet_payload(*rows))
+    return await cache.acached_response(view, request, build, vary=view.open_after)
+
+
+HANDLERS = {
+    'job-list': job_list,
+    'job-detail': job_detail,
+    'job-facets': job_facets,
+}
@@ -0,0 +1,169 @@
+"""
+Bulk job import.
+
+``import_jobs`` reads CSV or NDJSON rows as the request body arrives,
+validates each row with the job serializer's fields and inserts valid
+rows with ``bulk_create`` in batches, all inside one transaction. By
+default a file with any invalid row is rolled back as a whole, so a fixed
+file can be imported again without duplicating the rows that were valid;
+with ``skip_invalid`` the valid rows are kept. Only the first
+``MAX_REPORTED_ERRORS`` row errors are returned.
+
+``bulk_create`` sends no signals, so the search index, the recommendation
+change log and the caches are updated here. ``delete_in`` is the matching
+plain DELETE for callers that remove rows in bulk (archival, the seeder).
+"""
+import codecs
+import csv
+import json
+
+from django.db import connections, router, transaction
+from rest_framework import serializers
+
+from .models import Job
+from . import cache, recommend, search
+
+BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+CSV_TYPES = ('text/csv',)
+NDJSON_TYPES = ('application/x-ndjson', 'application/jsonl')
+
+
+class BulkImportError(Exception):
+    pass
+
+
+def csv_rows(lines):
+    reader = csv.DictReader(lines)
+    try:
+        for row in reader:
+            # Short rows leave None; long rows collect extras under None
+            row.pop(None, None)
+            yield {key: value for key, value in row.items() if value is not None}
+    except csv.Error as e:
+        raise BulkImportError(f'Malformed CSV on line {reader.line_num}: {e}')
+
+
+def ndjson_rows(lines):
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            # Reported against the row like a validation error
+            yield None
+
+
+def read_rows(stream, content_type):
+    """Yield the rows of ``stream``, decoded by ``content_type``."""
+    media_type = content_type.split(';')[0].strip().lower()
+    # utf-8-sig drops the byte order mark spreadsheet exports start with
+    lines = codecs.iterdecode(stream if stream is not None else [], 'utf-8-sig')
+    if media_type in CSV_TYPES:
+        return csv_rows(lines)
+    if media_type in NDJSON_TYPES:
+        return ndjson_rows(lines)
+    raise BulkImportError('Send the jobs as text/csv or application/x-ndjson')
+
+
+def validate_row(serializer, row):
+    if not isinstance(row, dict):
+        return None, {'non_field_errors': ['Each row must be a JSON object']}
+    try:
+        return serializer.run_validation(row), None
+    except serializers.ValidationError as e:
+        return None, e.detail
+
+
+def insert_batch(jobs, employer):
+    """Insert ``jobs`` and index exactly those; returns their ids."""
+    if connections[router.db_for_write(Job)].features.can_return_rows_from_bulk_insert:
+        Job.objects.bulk_create(jobs)
+        new_jobs = jobs
+    else:
+        # MySQL does not return the primary keys. Auto-increment ids only
+        # grow, so the batch is the employer's jobs above the highest id
+        # this transaction saw before inserting it
+        last_id = Job.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        Job.objects.bulk_create(jobs)
+        new_jobs = list(
+            Job.objects.filter(employer=employer, id__gt=last_id)
+            .only('id', 'title', 'description', 'requirements')
+        )
+    search.index_new_jobs(new_jobs)
+    return [job.pk for job in new_jobs]
+
+
+def import_jobs(stream, content_type, employer, serializer, skip_invalid=False):
+    """
+    Import jobs for ``employer`` from ``stream``. ``serializer`` is an
+    unbound job serializer used to validate each row. Returns a summary
+    with the number of jobs created and the row errors.
+    """
+    rows = read_rows(stream, content_type)
+    created, errors, error_count = [], [], 0
+    batch = []
+    try:
+        with transaction.atomic():
+            for number, row in enumerate(rows, start=1):
+                data, row_errors = validate_row(serializer, row)
+                if row_errors is not None:
+                    error_count += 1
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        errors.append({'row': number, 'errors': row_errors})
+                    continue
+                if error_count and not skip_invalid:
+                    # Everything will be rolled back; only keep validating
+                    continue
+                batch.append(Job(employer=employer, **data))
+                if len(batch) >= BATCH_SIZE:
+                    created += insert_batch(batch, employer)
+                    batch = []
+            if batch and (skip_invalid or not error_count):
+                created += insert_batch(batch, employer)
+
+            if error_count and not skip_invalid:
+                transaction.set_rollback(True)
+                created = []
+            elif created:
+                transaction.on_commit(lambda: notify_changed([employer.pk], created))
+    except UnicodeDecodeError:
+        raise BulkImportError('The file is not UTF-8 encoded')
+
+    return {
+        'created': len(created),
+        'error_count': error_count,
+        'errors': errors,
+    }
+
+
+def notify_changed(employer_ids, job_ids):
+    """What the Job save and delete signals do, for rows written in bulk."""
+    cache.bump_generation()
+    for employer_id in employer_ids:
+        cache.bump_stats_version(employer_id)
+    recommend.record_changes(job_ids)
+
+
+def delete_in(model, field, values, batch_size=1000):
+    """
+    Run ``DELETE FROM <table> WHERE <field> IN (values)`` in batches and
+    return the number of rows deleted. Unlike ``QuerySet.delete()`` it
+    neither loads the rows to collect the cascade nor sends delete signals,
+    so callers delete dependent rows first and call ``notify_changed``.
+    """
+    values = list(values)
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    column = model._meta.pk.column if field == 'pk' else model._meta.get_field(field).column
+    deleted = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(values), batch_size):
+            batch = values[start:start + batch_size]
+            cursor.execute(
+                f'DELETE FROM {quote(model._meta.db_table)} WHERE {quote(column)} IN ({", ".join(["%s"] * len(batch))})',
+                batch
+            )
+            deleted += cursor.rowcount
+    return deleted
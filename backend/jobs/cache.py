@@ -0,0 +1,230 @@
+"""
+Response cache for the public job endpoints.
+
+Entries are keyed by the request path, the accepted renderer, the normalized
+query string and a generation counter. Saving or deleting a Job or a
+CompanyProfile bumps the generation, which orphans every cached entry at once
+instead of relying on a TTL guess; orphans simply age out of the backend.
+An entry built from a read replica soon after a bump may predate the write
+behind it, so it is only kept until the replica has caught up.
+"""
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+
+from core import replicas
+
+GENERATION_KEY = 'jobs:cache:generation'
+HITS_KEY = 'jobs:cache:hits'
+MISSES_KEY = 'jobs:cache:misses'
+CHANGED_KEY = 'jobs:cache:changed'
+ENTRY_TIMEOUT = 60 * 60
+STATS_TIMEOUT = 5 * 60
+
+
+def _incr(key, initial=0):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Missing or evicted; if another process adds it first, incr theirs
+        if cache.add(key, initial + 1, None):
+            return initial + 1
+        return cache.incr(key)
+
+
+def _fresh_generation():
+    # Seeded from the clock so a generation lost to eviction or a cache
+    # restart can never come back with a value older entries were stored under
+    return int(time.time() * 1000)
+
+
+def generation():
+    value = cache.get(GENERATION_KEY)
+    if value is None:
+        cache.add(GENERATION_KEY, _fresh_generation(), None)
+        value = cache.get(GENERATION_KEY, 0)
+    return value
+
+
+def _changed():
+    # Set before the bump, so a reader of the new value sees it
+    cache.set(CHANGED_KEY, time.time(), None)
+
+
+def entry_timeout(timeout):
+    if replicas.current_replica() is not None:
+        changed = cache.get(CHANGED_KEY)
+        if changed is not None and time.time() - changed < replicas.max_lag():
+            return replicas.max_lag()
+    return timeout
+
+
+def bump_generation():
+    _changed()
+    return _incr(GENERATION_KEY, initial=_fresh_generation())
+
+
+def stats_version(employer_id):
+    value = cache.get(f'jobs:stats:version:{employer_id}')
+    if value is None:
+        cache.add(f'jobs:stats:version:{employer_id}', _fresh_generation(), None)
+        value = cache.get(f'jobs:stats:version:{employer_id}', 0)
+    return value
+
+
+def bump_stats_version(employer_id):
+    _changed()
+    return _incr(f'jobs:stats:version:{employer_id}', initial=_fresh_generation())
+
+
+def application_version_key(job_id):
+    return f'jobs:stats:applications:{job_id}'
+
+
+def application_versions(job_ids):
+    """The current application version of each job, starting missing ones."""
+    keys = {application_version_key(job_id): job_id for job_id in job_ids}
+    values = cache.get_many(keys)
+    for key in keys.keys() - values.keys():
+        cache.add(key, _fresh_generation(), None)
+        values[key] = cache.get(key, 0)
+    return {keys[key]: value for key, value in values.items()}
+
+
+def bump_application_version(job_id):
+    # Applications are versioned per job, so saving one needs no lookup of
+    # the job's employer
+    _changed()
+    return _incr(application_version_key(job_id), initial=_fresh_generation())
+
+
+def cached_employer_stats(employer_id, params, build):
+    """
+    Serve ``build()``, which returns the stats and the application versions
+    of the jobs they cover, from the cache. Entries are versioned per
+    employer like the response cache, and are rebuilt once an application to
+    any of the jobs has changed; the timeout keeps the time-relative windows
+    ("new", "closing soon") current.
+    """
+    suffix = ':'.join(str(param) for param in params)
+    key = f'jobs:stats:{employer_id}:{stats_version(employer_id)}:{suffix}'
+    entry = cache.get(key)
+    if entry is not None:
+        data, versions = entry
+        current = cache.get_many([application_version_key(job_id) for job_id in versions])
+        if current == {application_version_key(job_id): value for job_id, value in versions.items()}:
+            return data
+    data, versions = build()
+    cache.set(key, (data, versions), entry_timeout(STATS_TIMEOUT))
+    return data
+
+
+def get_stats():
+    return {
+        'hits': cache.get(HITS_KEY, 0),
+        'misses': cache.get(MISSES_KEY, 0),
+        'generation': generation(),
+    }
+
+
+def metric_samples():
+    # Response cache counters for /metrics, see core.metrics
+    return [
+        ('jobs_response_cache_hits_total', 'counter', 'Job response cache hits', cache.get(HITS_KEY, 0)),
+        ('jobs_response_cache_misses_total', 'counter', 'Job response cache misses', cache.get(MISSES_KEY, 0)),
+    ]
+
+
+def normalized_query(request):
+    params = sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values
+        if value != ''
+    )
+    return '&'.join(f'{key}={value}' for key, value in params)
+
+
+def cache_key(request, vary=None):
+    raw = '|'.join([
+        request.path,
+        request.accepted_renderer.format,
+        normalized_query(request),
+        str(vary or ''),
+    ])
+    digest = hashlib.sha1(raw.encode()).hexdigest()
+    return f'jobs:cache:{generation()}:{digest}'
+
+
+def not_modified(request, etag):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    return bool(if_none_match) and etag in parse_etags(if_none_match)
+
+
+def finish(request, etag, content, content_type, cache_status):
+    if not_modified(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type=content_type)
+    response['ETag'] = etag
+    response['X-Cache'] = cache_status
+    # Clients may keep the body but must revalidate it with If-None-Match
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def lookup(request, vary=None):
+    key = cache_key(request, vary)
+    entry = cache.get(key)
+    _incr(HITS_KEY if entry is not None else MISSES_KEY)
+    return key, entry
+
+
+def store(view, request, key, response):
+    renderer = request.accepted_renderer
+    content = renderer.render(response.data, request.accepted_media_type, view.get_renderer_context())
+    content_type = request.accepted_media_type
+    if renderer.charset:
+        content_type = f'{content_type}; charset={renderer.charset}'
+    etag = quote_etag(hashlib.sha256(content).hexdigest())
+    cache.set(key, (etag, content, content_type), entry_timeout(ENTRY_TIMEOUT))
+    return finish(request, etag, content, content_type, cache_status='MISS')
+
+
+def cached_response(view, request, build, vary=None):
+    """
+    Serve ``build()`` (a DRF view call) through the cache. Only JSON is
+    cached: the browsable API embeds per-user content such as CSRF tokens.
+    ``vary`` is any other value the response depends on, such as the time
+    expired jobs are cut off at.
+    """
+    if request.accepted_renderer.format != 'json':
+        return build()
+
+    key, entry = lookup(request, vary)
+    if entry is not None:
+        return finish(request, *entry, cache_status='HIT')
+    response = build()
+    if response.status_code != 200:
+        return response
+    return store(view, request, key, response)
+
+
+async def acached_response(view, request, build, vary=None):
+    """``cached_response`` for async views, where ``build`` is a coroutine function."""
+    if request.accepted_renderer.format != 'json':
+        return await build()
+
+    # Django's cache backends implement their async methods this way too
+    key, entry = await sync_to_async(lookup)(request, vary)
+    if entry is not None:
+        return finish(request, *entry, cache_status='HIT')
+    response = await build()
+    if response.status_code != 200:
+        return response
+    return await sync_to_async(store)(view, request, key, response)
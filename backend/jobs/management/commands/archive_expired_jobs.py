@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from jobs import archive
+
+
+class Command(BaseCommand):
+    help = 'Move jobs that expired long ago, and their applications, to the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=archive.ARCHIVE_AFTER.days,
+            help='Archive jobs whose deadline passed more than this many days ago'
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Jobs moved per transaction')
+
+    def handle(self, *args, **options):
+        jobs, applications = archive.archive_expired(
+            older_than=timedelta(days=options['days']),
+            batch_size=options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(f'Archived {jobs} jobs and {applications} applications'))
@@ -0,0 +1,101 @@
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from jobs.models import Job, JobApplication
+
+
+class Command(BaseCommand):
+    help = 'Fire concurrent applies at one job and check that each applicant is recorded exactly once'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='Concurrent clients')
+        parser.add_argument('--requests', type=int, default=200, help='Applies per scenario')
+
+    def handle(self, *args, **options):
+        threads, requests = options['threads'], options['requests']
+        # The threads use their own connections, so fixtures are committed
+        # (and deleted again afterwards) rather than rolled back
+        run = uuid.uuid4().hex[:8]
+        employer = User.objects.create_user(
+            email=f'apply-bench-{run}@example.com', username=f'apply-bench-{run}',
+            password='bench', role='EMPLOYER'
+        )
+        try:
+            User.objects.bulk_create([
+                User(email=f'apply-bench-{run}-{i}@example.com', username=f'apply-bench-{run}-{i}', role='EMPLOYEE')
+                for i in range(requests)
+            ])
+            employees = list(User.objects.filter(email__startswith=f'apply-bench-{run}-').order_by('pk'))
+            job = Job.objects.create(
+                title='Apply benchmark', description='Benchmark', requirements='Benchmark',
+                salary_range='1', location='Remote', job_type='FULL_TIME',
+                deadline=timezone.now() + timedelta(days=1), employer=employer
+            )
+            url = f'/api/jobs/{job.pk}/apply/'
+            failures = []
+
+            # The same employee clicking many times: one application, the
+            # rest told they already applied
+            statuses, elapsed = self.fire(threads, [(employees[0], url, None)] * requests)
+            failures += self.expect('duplicate clicks', statuses, {200: 1, 400: requests - 1}, elapsed)
+            failures += self.expect_rows('duplicate clicks', job, employees[0], 1)
+
+            # Retries with one Idempotency-Key: every response is a success
+            # for the same application
+            key = uuid.uuid4().hex
+            statuses, elapsed = self.fire(threads, [(employees[1], url, key)] * requests)
+            failures += self.expect('idempotent retries', statuses, {200: requests}, elapsed)
+            failures += self.expect_rows('idempotent retries', job, employees[1], 1)
+
+            # Different employees at once: every one of them gets in
+            others = employees[2:]
+            statuses, elapsed = self.fire(threads, [(employee, url, None) for employee in others])
+            failures += self.expect('distinct applicants', statuses, {200: len(others)}, elapsed)
+            if JobApplication.objects.filter(job=job).count() != len(others) + 2:
+                failures.append('distinct applicants: wrong number of applications stored')
+        finally:
+            User.objects.filter(email__startswith=f'apply-bench-{run}').delete()
+
+        if failures:
+            raise CommandError('\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('Every applicant was recorded exactly once'))
+
+    def fire(self, threads, calls):
+        def apply(call):
+            user, url, key = call
+            client = APIClient(HTTP_HOST='localhost')
+            client.force_authenticate(user)
+            headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+            try:
+                return client.post(url, {'cover_letter': 'Hello'}, format='json', **headers).status_code
+            finally:
+                close_old_connections()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            statuses = Counter(executor.map(apply, calls))
+        return statuses, time.perf_counter() - start
+
+    def expect(self, label, statuses, expected, elapsed):
+        total = sum(statuses.values())
+        self.stdout.write(
+            f'{label}: {total} requests in {elapsed:.2f}s ({total / elapsed:,.0f} req/s), '
+            f'statuses {dict(sorted(statuses.items()))}'
+        )
+        if statuses != Counter(expected):
+            return [f'{label}: expected statuses {expected}, got {dict(statuses)}']
+        return []
+
+    def expect_rows(self, label, job, applicant, count):
+        if JobApplication.objects.filter(job=job, applicant=applicant).count() != count:
+            return [f'{label}: expected {count} application(s)']
+        return []
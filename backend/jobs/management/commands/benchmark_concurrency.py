@@ -0,0 +1,297 @@
+import asyncio
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from wsgiref.util import setup_testing_defaults
+
+import numpy as np
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from accounts.models import User
+from accounts.serializers import CustomTokenObtainPairSerializer
+from jobs.models import Job
+
+DEFAULT_PATHS = ('/api/jobs/', '/api/jobs/facets/', '/api/jobs/{job}/', '/api/accounts/profile/')
+PERCENTILES = (50, 95, 99)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the throughput and latency of the WSGI deployment and the ASGI deployment with async '
+        'views under many concurrent clients that receive their responses slowly'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mode', choices=('both', 'wsgi', 'asgi'), default='both',
+            help='Run one deployment, or both in separate processes and compare them'
+        )
+        parser.add_argument('--clients', type=int, default=200, help='Concurrent clients')
+        parser.add_argument('--requests', type=int, default=10, help='Requests per client')
+        parser.add_argument(
+            '--workers', type=int, default=16,
+            help='Requests the WSGI deployment serves at once (worker processes times threads)'
+        )
+        parser.add_argument(
+            '--client-delay', type=float, default=100,
+            help='Milliseconds each response takes to reach the client'
+        )
+        parser.add_argument(
+            '--path', action='append', default=[],
+            help='Path to request, "{job}" standing for an open job; may be repeated'
+        )
+        parser.add_argument('--output', help='Write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        if options['mode'] == 'both':
+            results = {mode: self.run_child(mode, options) for mode in ('wsgi', 'asgi')}
+        else:
+            results = {options['mode']: self.run(options)}
+
+        for mode, result in results.items():
+            self.stdout.write(
+                f'{mode} (async views {"on" if result["async_views"] else "off"}): '
+                f'{result["throughput"]:.0f} requests/s, p50 {result["p50_ms"]:.1f} ms, '
+                f'p95 {result["p95_ms"]:.1f} ms, p99 {result["p99_ms"]:.1f} ms, '
+                f'{result["peak_in_flight"]} requests in flight at most'
+            )
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+        failures = [
+            f'{mode} returned {result["errors"]}' for mode, result in results.items() if result['errors']
+        ]
+        if len(results) == 2:
+            wsgi, asgi = results['wsgi'], results['asgi']
+            self.stdout.write(
+                f'ASGI served {asgi["throughput"] / wsgi["throughput"]:.1f}x the requests per second of WSGI '
+                f'at {options["clients"]} clients'
+            )
+            failures += [
+                f'{path}: the deployments returned different responses'
+                for path, digest in wsgi['digests'].items() if asgi['digests'].get(path) != digest
+            ]
+        if failures:
+            raise CommandError('\n'.join(failures))
+
+    def run_child(self, mode, options):
+        # Settings are read once per process, so each deployment gets its own
+        env = {**os.environ, 'ASYNC_VIEWS': str(mode == 'asgi')}
+        if mode == 'asgi':
+            # As core.asgi does
+            env['DATABASE_CONN_MAX_AGE'] = '0'
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, f'{mode}.json')
+            command = [
+                sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'benchmark_concurrency',
+                '--mode', mode, '--output', output,
+                '--clients', str(options['clients']), '--requests', str(options['requests']),
+                '--workers', str(options['workers']), '--client-delay', str(options['client_delay']),
+                *[argument for path in options['path'] for argument in ('--path', path)],
+            ]
+            self.stdout.write(f'Running the {mode} deployment...')
+            # Errors are reported by this process, from the output
+            subprocess.run(command, env=env, stdout=subprocess.DEVNULL)
+            if not os.path.exists(output):
+                raise CommandError(f'The {mode} run failed')
+            with open(output) as f:
+                return json.load(f)[mode]
+
+    def run(self, options):
+        paths = self.resolve_paths(options['path'] or DEFAULT_PATHS)
+        mode = options['mode']
+        # Sampled requests would add the metrics execute wrapper to the timings
+        with override_settings(METRICS_SAMPLE_RATE=0):
+            if mode == 'wsgi':
+                driver = WSGIDriver(self.token(), options['client_delay'] / 1000, options['workers'])
+            else:
+                driver = ASGIDriver(self.token(), options['client_delay'] / 1000)
+            # Fills the response cache and opens the connections
+            digests = {path: driver.warm_up(path) for path in paths}
+            urls = [paths[i % len(paths)] for i in range(options['requests'])]
+            start = time.perf_counter()
+            timings, statuses = driver.run(options['clients'], urls)
+            elapsed = time.perf_counter() - start
+
+        timings = np.array(timings) * 1000
+        result = {
+            'async_views': settings.ASYNC_VIEWS,
+            'clients': options['clients'],
+            'requests': len(timings),
+            'throughput': round(len(timings) / elapsed, 1),
+            'peak_in_flight': driver.peak,
+            'errors': {status: count for status, count in statuses.items() if status >= 400},
+            'digests': digests,
+        }
+        for percentile in PERCENTILES:
+            result[f'p{percentile}_ms'] = round(float(np.percentile(timings, percentile)), 3)
+        return result
+
+    def resolve_paths(self, paths):
+        job = Job.objects.filter(deadline__gte=timezone.now()).order_by('-created_at', '-id').first()
+        if job is None:
+            raise CommandError('The database has no open jobs to request; run seed_data first')
+        return [path.format(job=job.pk) for path in paths]
+
+    def token(self):
+        # Every client is the same signed-in job seeker
+        user = User.objects.filter(role='EMPLOYEE').order_by('pk').first()
+        if user is None:
+            raise CommandError('The database has no employees; run seed_data first')
+        return str(CustomTokenObtainPairSerializer.get_token(user).access_token)
+
+
+def digest(status, body):
+    return f'{status}:{hashlib.sha256(body).hexdigest()}'
+
+
+class Driver:
+    in_flight = 0
+    peak = 0
+
+    def started(self):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+
+    def finished(self):
+        self.in_flight -= 1
+
+
+class WSGIDriver(Driver):
+    """
+    Calls the WSGI handler from client threads, at most ``workers`` at a
+    time; a worker is busy until the client has received the whole body.
+    """
+
+    def __init__(self, token, delay, workers):
+        self.handler = WSGIHandler()
+        self.token = token
+        self.delay = delay
+        self.workers = threading.Semaphore(workers)
+        self.lock = threading.Lock()
+
+    def request(self, url):
+        path, _, query = url.partition('?')
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query,
+            'HTTP_HOST': 'localhost', 'HTTP_ACCEPT': 'application/json',
+            'HTTP_AUTHORIZATION': f'Bearer {self.token}',
+        }
+        setup_testing_defaults(environ)
+        status = None
+
+        def start_response(value, headers, exc_info=None):
+            nonlocal status
+            status = int(value.split()[0])
+
+        with self.workers:
+            with self.lock:
+                self.started()
+            response = self.handler(environ, start_response)
+            try:
+                body = []
+                for chunk in response:
+                    body.append(chunk)
+                    time.sleep(self.delay)
+            finally:
+                response.close()
+                with self.lock:
+                    self.finished()
+        return status, b''.join(body)
+
+    def warm_up(self, url):
+        return digest(*self.request(url))
+
+    def run(self, clients, urls):
+        timings, statuses = [], Counter()
+
+        def client():
+            for url in urls:
+                start = time.perf_counter()
+                status, _ = self.request(url)
+                timings.append(time.perf_counter() - start)
+                statuses[status] += 1
+
+        threads = [threading.Thread(target=client) for _ in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return timings, statuses
+
+
+class ASGIDriver(Driver):
+    """Calls the ASGI handler from client tasks on one event loop, like an ASGI server does."""
+
+    def __init__(self, token, delay):
+        self.handler = ASGIHandler()
+        self.token = token
+        self.delay = delay
+
+    async def request(self, url):
+        path, _, query = url.partition('?')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+            'root_path': '', 'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+            'headers': [
+                (b'host', b'localhost'), (b'accept', b'application/json'),
+                (b'authorization', f'Bearer {self.token}'.encode()),
+            ],
+        }
+        status, body = None, []
+        requested = False
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            # The client stays connected
+            await asyncio.Future()
+
+        async def send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            elif message['type'] == 'http.response.body':
+                body.append(message.get('body', b''))
+                await asyncio.sleep(self.delay)
+
+        self.started()
+        try:
+            await self.handler(scope, receive, send)
+        finally:
+            self.finished()
+        return status, b''.join(body)
+
+    def warm_up(self, url):
+        return digest(*asyncio.run(self.request(url)))
+
+    def run(self, clients, urls):
+        timings, statuses = [], Counter()
+
+        async def client():
+            for url in urls:
+                start = time.perf_counter()
+                status, _ = await self.request(url)
+                timings.append(time.perf_counter() - start)
+                statuses[status] += 1
+
+        async def main():
+            await asyncio.gather(*(client() for _ in range(clients)))
+
+        asyncio.run(main())
+        return timings, statuses
@@ -0,0 +1,199 @@
+import json
+import platform
+import time
+from collections import Counter
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User, EmployeeProfile, CompanyProfile
+from core.query_budget import ENDPOINT_BUDGETS
+from jobs import cache
+from jobs.models import Job, JobApplication
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure latency percentiles and queries per request of the API endpoints against the current '
+        'database (see seed_data), optionally failing on regressions against a baseline run'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=30, help='Measured requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=3, help='Unmeasured requests per endpoint first')
+        parser.add_argument(
+            '--endpoint', action='append', default=[],
+            help='Only run endpoints whose label contains this text; may be repeated'
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Invalidate the job response cache before every request'
+        )
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--baseline', help='Compare with the results of an earlier run')
+        parser.add_argument(
+            '--metric', choices=[f'p{p}' for p in PERCENTILES], default='p95',
+            help='Latency percentile compared with the baseline'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Allowed latency increase over the baseline, as a fraction'
+        )
+        parser.add_argument(
+            '--min-delta-ms', type=float, default=1.0,
+            help='Latency increases smaller than this are noise, whatever the fraction'
+        )
+        parser.add_argument(
+            '--query-threshold', type=int, default=0,
+            help='Allowed increase in queries per request over the baseline'
+        )
+
+    def handle(self, *args, **options):
+        users = self.pick_fixtures()
+        endpoints = [
+            endpoint for endpoint in ENDPOINT_BUDGETS
+            if not options['endpoint'] or any(text in endpoint[0] for text in options['endpoint'])
+        ]
+        if not endpoints:
+            raise CommandError('No endpoint matches --endpoint')
+
+        results, failures = {}, []
+        # Sampled requests would add the metrics execute wrapper to the timings
+        with override_settings(METRICS_SAMPLE_RATE=0):
+            for label, user, method, url, budget in endpoints:
+                url = url.format(**{name: obj.pk for name, obj in users.items()})
+                result = self.measure(users.get(user), method, url, options)
+                result['budget'] = budget
+                results[label] = result
+                self.stdout.write(
+                    f'{label}: p50 {result["p50_ms"]:.1f} ms, p95 {result["p95_ms"]:.1f} ms, '
+                    f'p99 {result["p99_ms"]:.1f} ms, {result["queries"]} queries'
+                )
+
+        run = {
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'iterations': options['iterations'],
+            'cold': options['cold'],
+            'rows': self.row_counts(),
+            'endpoints': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(run, f, indent=2)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            failures += self.compare(run, baseline, options)
+
+        if failures:
+            raise CommandError('\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('Benchmark finished'))
+
+    def pick_fixtures(self):
+        # The busiest employer and employee, so lists are as long as they get
+        employer = (
+            User.objects.filter(role='EMPLOYER', companyprofile__isnull=False)
+            .annotate(jobs=Count('posted_jobs')).order_by('-jobs', 'pk').first()
+        )
+        employee = (
+            User.objects.filter(role='EMPLOYEE', employeeprofile__isnull=False)
+            .annotate(applications=Count('jobapplication')).order_by('-applications', 'pk').first()
+        )
+        job = Job.objects.filter(deadline__gte=timezone.now()).order_by('-created_at', '-id').first()
+        application = JobApplication.objects.filter(job__employer=employer).order_by('-pk').first()
+        if None in (employer, employee, job, application):
+            raise CommandError('The database has no data to benchmark; run seed_data first')
+        return {
+            'employer': employer,
+            'employee': employee,
+            'profile': EmployeeProfile.objects.get(user=employee),
+            'company': CompanyProfile.objects.get(user=employer),
+            'job': job,
+            'application': application,
+        }
+
+    def measure(self, user, method, url, options):
+        client = APIClient(HTTP_HOST='localhost')
+        if user is not None:
+            client.force_authenticate(user)
+
+        def request():
+            if options['cold']:
+                cache.bump_generation()
+            response = getattr(client, method)(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            # Timings of error responses say nothing about the endpoint, so
+            # the run stops before any results (or a baseline) are written
+            if not 200 <= response.status_code < 300:
+                raise CommandError(f'{method.upper()} {url} returned {response.status_code}')
+            return response
+
+        for _ in range(options['warmup']):
+            request()
+        timings, queries, statuses = [], [], Counter()
+        for _ in range(options['iterations']):
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = request()
+                timings.append(time.perf_counter() - start)
+            queries.append(len(context))
+            statuses[str(response.status_code)] += 1
+
+        timings = np.array(timings) * 1000
+        result = {'method': method.upper(), 'url': url}
+        for percentile in PERCENTILES:
+            result[f'p{percentile}_ms'] = round(float(np.percentile(timings, percentile)), 3)
+        result.update({
+            'mean_ms': round(float(timings.mean()), 3),
+            'max_ms': round(float(timings.max()), 3),
+            'queries': int(np.median(queries)),
+            'max_queries': max(queries),
+            'statuses': dict(statuses),
+        })
+        return result
+
+    def row_counts(self):
+        return {
+            'users': User.objects.count(),
+            'employee_profiles': EmployeeProfile.objects.count(),
+            'company_profiles': CompanyProfile.objects.count(),
+            'jobs': Job.objects.count(),
+            'applications': JobApplication.objects.count(),
+        }
+
+    def compare(self, run, baseline, options):
+        if run['rows'] != baseline.get('rows'):
+            self.stdout.write(self.style.WARNING(
+                f'The baseline was measured with other data: {baseline.get("rows")} rows, now {run["rows"]}'
+            ))
+        if run['cold'] != baseline.get('cold'):
+            self.stdout.write(self.style.WARNING('Only one of the runs used --cold'))
+        metric = f'{options["metric"]}_ms'
+        regressions = []
+        for label, result in run['endpoints'].items():
+            previous = baseline.get('endpoints', {}).get(label)
+            if previous is None:
+                continue
+            before, after = previous[metric], result[metric]
+            if after > before * (1 + options['threshold']) and after - before >= options['min_delta_ms']:
+                regressions.append(
+                    f'{label}: {options["metric"]} {before:.1f} ms -> {after:.1f} ms '
+                    f'(+{(after / before - 1) * 100 if before else float("inf"):.0f}%)'
+                )
+            if result['max_queries'] > previous['max_queries'] + options['query_threshold']:
+                regressions.append(f'{label}: {previous["max_queries"]} -> {result["max_queries"]} queries per request')
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS(f'No regressions against {options["baseline"]}'))
+        return regressions
@@ -0,0 +1,83 @@
+import random
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from jobs.recommend import JobMatrix
+from jobs.seed import SKILLS, TITLES
+
+
+class Command(BaseCommand):
+    help = 'Measure build, incremental update and top-k query times of the recommendation matrix'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jobs', type=int, default=100000, help='Synthetic jobs in the matrix')
+        parser.add_argument('--queries', type=int, default=200, help='Profiles to rank jobs for')
+        parser.add_argument('--added', type=int, default=500, help='Jobs appended incrementally')
+        parser.add_argument('--limit', type=int, default=20, help='Recommendations per query')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        # Synthetic rows rather than the database, so the numbers reflect
+        # the matrix and not the fixture inserts
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        rows = [self.job_row(rng, job_id, now) for job_id in range(1, options['jobs'] + 1)]
+
+        start = time.perf_counter()
+        matrix = JobMatrix.from_rows(rows)
+        build = time.perf_counter() - start
+        self.stdout.write(f'build: {options["jobs"]:,} jobs in {build:.2f}s, {matrix.base.nnz:,} non-zeros')
+
+        added = [
+            dict(zip(('id', 'title', 'description', 'requirements', 'deadline'),
+                     self.job_row(rng, options['jobs'] + i, now)))
+            for i in range(1, options['added'] + 1)
+        ]
+        start = time.perf_counter()
+        for job in added:
+            matrix.upsert([job])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f'incremental: {elapsed / len(added) * 1000:.2f} ms per job ({len(added)} jobs)')
+
+        limit = options['limit']
+        timings = []
+        for _ in range(options['queries']):
+            profile = {
+                'skills': ', '.join(rng.sample(SKILLS, 6)),
+                'experience': f'{rng.randint(1, 10)} years of {" ".join(rng.sample(SKILLS, 3))}',
+            }
+            indices, values = matrix.query_vector(profile)
+            start = time.perf_counter()
+            top = matrix.top(indices, values, limit, now=now)
+            timings.append(time.perf_counter() - start)
+            self.verify(matrix, indices, values, top, limit, now)
+
+        timings = np.array(timings) * 1000
+        self.stdout.write(
+            f'query: p50 {np.percentile(timings, 50):.2f} ms, p95 {np.percentile(timings, 95):.2f} ms, '
+            f'max {timings.max():.2f} ms (top {limit} of {len(matrix):,} jobs)'
+        )
+
+    def job_row(self, rng, job_id, now):
+        skills = rng.sample(SKILLS, rng.randint(3, 8))
+        return (
+            job_id,
+            f'{skills[0].title()} {rng.choice(TITLES)}',
+            f'We are looking for someone with {", ".join(skills)} experience. ' * 3,
+            ', '.join(skills[:4]),
+            now + timedelta(days=rng.randint(-10, 60)),
+        )
+
+    def verify(self, matrix, indices, values, top, limit, now):
+        # Compare the scores against a full sort of every open job
+        scores = np.concatenate([matrix.base[:, indices] @ values, matrix.delta[:, indices] @ values])
+        deadlines = np.concatenate([matrix.base_deadlines, matrix.delta_deadlines])
+        active = np.concatenate([matrix.base_active, matrix.delta_active])
+        scores = scores[active & (deadlines >= now.timestamp()) & (scores > 0)]
+        expected = np.sort(scores)[::-1][:limit]
+        if not np.allclose(expected, [score for _, score in top], atol=1e-6):
+            raise CommandError('Top-k scores differ from a full sort')
@@ -0,0 +1,98 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from accounts.models import User, CompanyProfile
+from core.projection import Projection
+from jobs.models import Job, JobApplication
+from jobs.serializers import JobSerializer, JobApplicationSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare rows/sec of the serializer and values() projection paths for list endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Jobs and applications to generate')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per path; the best is reported')
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        # Fixtures live in a transaction that is rolled back afterwards
+        with transaction.atomic():
+            self.create_fixtures(rows)
+            cases = [
+                ('JobSerializer', JobSerializer, Job.objects.select_related('employer__companyprofile')),
+                ('JobApplicationSerializer', JobApplicationSerializer,
+                 JobApplication.objects.select_related('job__employer__companyprofile')),
+            ]
+            for label, serializer_class, queryset in cases:
+                queryset = queryset.order_by('-pk')
+                projection = Projection.build(serializer_class())
+                if projection is None:
+                    raise CommandError(f'{label} cannot be projected')
+
+                instances = list(queryset)
+                values = list(projection.values(queryset))
+                results = {}
+                for path, fetch, serialize in [
+                    ('serializer', lambda: list(queryset), lambda rows: serializer_class(rows, many=True).data),
+                    ('projection', lambda: list(projection.values(queryset)), projection.represent_many),
+                ]:
+                    fetched = instances if path == 'serializer' else values
+                    # Serialization alone, then fetch and serialization together
+                    cpu, data = self.measure(lambda: serialize(fetched), repeat)
+                    total, _ = self.measure(lambda: serialize(fetch()), repeat)
+                    results[path] = (cpu, total, JSONRenderer().render(data))
+
+                if results['serializer'][2] != results['projection'][2]:
+                    raise CommandError(f'{label}: projection output differs from the serializer')
+                for path, (cpu, total, _) in results.items():
+                    self.stdout.write(
+                        f'{label} {path}: {rows / cpu:,.0f} rows/s serializing, '
+                        f'{rows / total:,.0f} rows/s with the query'
+                    )
+                self.stdout.write(
+                    f'{label} speedup: {results["serializer"][0] / results["projection"][0]:.1f}x serializing, '
+                    f'{results["serializer"][1] / results["projection"][1]:.1f}x with the query'
+                )
+            transaction.set_rollback(True)
+
+    def measure(self, path, repeat):
+        best, result = None, None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = path()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def create_fixtures(self, rows):
+        employer = User.objects.create_user(
+            email='bench-employer@example.com', username='bench-employer',
+            password='bench', role='EMPLOYER'
+        )
+        CompanyProfile.objects.create(
+            user=employer, company_name='Bench Inc', company_description='Bench',
+            industry='Software', company_size='10', location='Remote'
+        )
+        employee = User.objects.create_user(
+            email='bench-employee@example.com', username='bench-employee',
+            password='bench', role='EMPLOYEE'
+        )
+        deadline = timezone.now() + timedelta(days=30)
+        Job.objects.bulk_create([
+            Job(
+                title=f'Python Developer {i}', description='Python developer for Django APIs. ' * 20,
+                requirements='Python, Django, SQL', salary_range='1', location='Remote',
+                job_type='FULL_TIME', deadline=deadline, employer=employer
+            )
+            for i in range(rows)
+        ], batch_size=1000)
+        JobApplication.objects.bulk_create([
+            JobApplication(job_id=job_id, applicant=employee, cover_letter='Hello')
+            for job_id in Job.objects.filter(employer=employer).values_list('pk', flat=True)
+        ], batch_size=1000)
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from jobs import recommend
+
+
+class Command(BaseCommand):
+    help = 'Build the job recommendation matrix and save it for the app processes to load at startup'
+
+    def handle(self, *args, **options):
+        if not settings.RECOMMENDATION_MATRIX_PATH:
+            raise CommandError('Set RECOMMENDATION_MATRIX_PATH to save the matrix')
+        matrix = recommend.build_artifact()
+        self.stdout.write(self.style.SUCCESS(
+            f'Saved {len(matrix)} jobs to {settings.RECOMMENDATION_MATRIX_PATH}'
+        ))
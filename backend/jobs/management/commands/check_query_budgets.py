@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.query_budget import ENDPOINT_BUDGETS, QueryBudgetExceeded, create_fixtures, request_endpoint
+
+
+class Command(BaseCommand):
+    help = 'Check that every API endpoint stays within its SQL query budget'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, default=50,
+            help='Jobs, applications and profiles to generate; should exceed every budget'
+        )
+
+    def handle(self, *args, **options):
+        failures = []
+        # Everything runs inside a transaction that is rolled back, so the
+        # command is safe to point at a development database.
+        with transaction.atomic():
+            fixtures = create_fixtures(options['rows'])
+            for label, user, method, url, budget in ENDPOINT_BUDGETS:
+                try:
+                    response, context = request_endpoint(fixtures, label, user, method, url, budget)
+                except QueryBudgetExceeded as exc:
+                    failures.append(str(exc))
+                    self.stdout.write(self.style.ERROR(f'FAIL {label}'))
+                    continue
+                if response.status_code >= 400:
+                    failures.append(f'{label} returned {response.status_code}')
+                    self.stdout.write(self.style.ERROR(f'FAIL {label} ({response.status_code})'))
+                    continue
+                self.stdout.write(f'ok   {label}: {len(context)}/{budget} queries')
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError('\n\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('All endpoints within budget'))
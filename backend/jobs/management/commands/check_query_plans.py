@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from core.query_plans import hot_queries, plan_problems
+from jobs.models import Job
+
+
+class Command(BaseCommand):
+    help = 'Fail if any hot query plan uses a full table scan or an unindexed sort'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan')
+
+    def handle(self, *args, **options):
+        job = Job.objects.order_by('-created_at', '-id').first()
+        applicant = User.objects.filter(role='EMPLOYEE').first()
+        if job is None or applicant is None:
+            raise CommandError('Needs at least one job and one employee to build the queries')
+
+        failures = []
+        for label, queryset, allow_sort in hot_queries(job.employer, applicant, job):
+            plan, problems = plan_problems(queryset, allow_sort=allow_sort)
+            if options['verbose_plans']:
+                self.stdout.write(f'{label}:\n{plan}\n')
+            if problems:
+                failures.append(f'{label}: {", ".join(problems)}')
+                self.stdout.write(self.style.ERROR(f'FAIL {label}: {", ".join(problems)}'))
+            else:
+                self.stdout.write(f'ok   {label}')
+
+        if failures:
+            raise CommandError(f'{len(failures)} hot queries regressed')
+        self.stdout.write(self.style.SUCCESS('All hot queries use indexes'))
@@ -0,0 +1,92 @@
+import uuid
+from contextlib import ExitStack
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User, CompanyProfile
+from core import replicas
+
+
+class Command(BaseCommand):
+    help = (
+        'Check that read-only requests go to a replica and that a user who just wrote '
+        'something reads from the primary'
+    )
+
+    def handle(self, *args, **options):
+        if not settings.REPLICA_DATABASES:
+            raise CommandError('No replica is configured; set DATABASE_REPLICA_HOSTS')
+        # Requests read from the primary inside a transaction, so the
+        # fixtures are committed (and deleted again afterwards)
+        run = uuid.uuid4().hex[:8]
+        employer = User.objects.create_user(
+            email=f'replica-check-{run}@example.com', username=f'replica-check-{run}',
+            password='check', role='EMPLOYER'
+        )
+        failures = []
+        try:
+            CompanyProfile.objects.create(
+                user=employer, company_name='Replica Check', company_description='Check',
+                industry='Software', company_size='10', location='Remote'
+            )
+            client = APIClient(HTTP_HOST='localhost')
+            client.force_authenticate(employer)
+            anonymous = APIClient(HTTP_HOST='localhost')
+
+            # A filter nobody used before, so the response is not cached
+            failures += self.expect(
+                'anonymous job list', 'replica', lambda: anonymous.get(f'/api/jobs/?location={run}')
+            )
+            failures += self.expect(
+                'streamed job list', 'replica',
+                lambda: b''.join(anonymous.get('/api/jobs/?format=ndjson').streaming_content)
+            )
+            failures += self.expect('my jobs', 'replica', lambda: client.get('/api/jobs/my_jobs/'))
+
+            job = {
+                'title': 'Replica check', 'description': 'Check', 'requirements': 'Check',
+                'salary_range': '1', 'location': 'Remote', 'job_type': 'FULL_TIME',
+                'deadline': (timezone.now() + timedelta(days=1)).isoformat(),
+            }
+            failures += self.expect('posting a job', 'primary', lambda: client.post('/api/jobs/', job, format='json'))
+            response = None
+
+            def my_jobs():
+                nonlocal response
+                response = client.get('/api/jobs/my_jobs/')
+            failures += self.expect('my jobs right after posting', 'primary', my_jobs)
+            if not any(row['title'] == 'Replica check' for row in response.data):
+                failures.append('my jobs right after posting: the new job is missing')
+
+            cache.delete(replicas.PIN_KEY.format(employer.pk))
+            failures += self.expect('my jobs once the pin expired', 'replica', lambda: client.get('/api/jobs/my_jobs/'))
+        finally:
+            employer.delete()
+
+        if failures:
+            raise CommandError('\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('Reads are routed as expected'))
+
+    def expect(self, label, target, request):
+        with ExitStack() as stack:
+            contexts = {
+                alias: stack.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in [DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES]
+            }
+            request()
+        counts = {alias: len(context) for alias, context in contexts.items()}
+        self.stdout.write(f'{label}: {counts}')
+        on_primary = counts.pop(DEFAULT_DB_ALIAS)
+        on_replicas = sum(counts.values())
+        if target == 'replica' and (on_primary or not on_replicas):
+            return [f'{label}: expected every query on a replica, got {on_primary} on the primary']
+        if target == 'primary' and on_replicas:
+            return [f'{label}: expected every query on the primary, got {on_replicas} on replicas']
+        return []
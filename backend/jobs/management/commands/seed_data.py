@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs import seed
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with synthetic users, profiles, jobs and applications for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employers', type=int, default=5000)
+        parser.add_argument('--employees', type=int, default=500000)
+        parser.add_argument('--jobs', type=int, default=200000)
+        parser.add_argument('--applications', type=int, default=2000000)
+        parser.add_argument(
+            '--scale', type=float, default=1.0,
+            help='Multiply every count, e.g. 0.01 for a quick run'
+        )
+        parser.add_argument('--seed', type=int, default=0, help='The same seed produces the same data')
+        parser.add_argument('--batch-size', type=int, default=seed.BATCH_SIZE, help='Rows per insert')
+        parser.add_argument('--clear', action='store_true', help='Remove previously seeded data and exit')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            users = seed.clear()
+            self.stdout.write(self.style.SUCCESS(f'Removed {users:,} seeded users and everything they owned'))
+            return
+
+        counts = {
+            name: max(int(options[name] * options['scale']), 1)
+            for name in ('employers', 'employees', 'jobs', 'applications')
+        }
+        seeder = seed.Seeder(seed=options['seed'], batch_size=options['batch_size'], log=self.stdout.write)
+        try:
+            created = seeder.seed(**counts)
+        except seed.SeedError as exc:
+            raise CommandError(str(exc))
+        summary = ', '.join(f'{count:,} {name.replace("_", " ")}' for name, count in created.items())
+        self.stdout.write(self.style.SUCCESS(f'Created {summary}. Every seeded user\'s password is "{seed.PASSWORD}"'))
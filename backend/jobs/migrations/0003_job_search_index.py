@@ -0,0 +1,39 @@
+# Generated by Django 4.2 on 2026-10-18 04:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0002_alter_job_options_remove_job_is_active_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobSearchDocument',
+            fields=[
+                ('job', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='jobs.job')),
+                ('length', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='JobSearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('frequency', models.PositiveIntegerField()),
+                ('length', models.PositiveIntegerField()),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_postings', to='jobs.job')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='jobsearchposting',
+            index=models.Index(fields=['term', 'job', 'frequency', 'length'], name='job_search_term_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='jobsearchposting',
+            constraint=models.UniqueConstraint(fields=('term', 'job'), name='unique_job_search_posting'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2 on 2026-10-18 04:13
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_applications(apps, schema_editor):
+    # Keep the earliest application per (job, applicant) so the unique
+    # constraint can be added
+    JobApplication = apps.get_model('jobs', 'JobApplication')
+    duplicates = (
+        JobApplication.objects.values('job_id', 'applicant_id')
+        .annotate(keep=Min('id'), count=Count('id'))
+        .filter(count__gt=1)
+        .order_by()
+    )
+    for row in duplicates.iterator():
+        JobApplication.objects.filter(
+            job_id=row['job_id'],
+            applicant_id=row['applicant_id'],
+        ).exclude(id=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0003_job_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['-created_at', '-id'], name='job_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['job_type', '-created_at', '-id'], name='job_type_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['employer', '-created_at', '-id'], name='job_employer_created_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_applications, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='jobapplication',
+            constraint=models.UniqueConstraint(fields=('job', 'applicant'), name='unique_job_application'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 04:15
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0004_job_indexes_unique_application'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(django.db.models.functions.text.Lower(django.db.models.functions.text.Trim('location')), name='job_location_norm_idx'),
+        ),
+    ]
@@ -1,8 +1,17 @@
 from django.db import models
+from django.db.models.functions import Lower, Trim
 from accounts.models import User, CompanyProfile
 from django.conf import settings
 
-class Job(models.Model):
+class CompanyNameMixin:
+    @property
+    def company_name(self):
+        try:
+            return self.employer.companyprofile.company_name
+        except CompanyProfile.DoesNotExist:
+            return self.employer.username
+
+class Job(CompanyNameMixin, models.Model):
     JOB_TYPES = (
         ('FULL_TIME', 'Full Time'),
         ('PART_TIME', 'Part Time'),
@@ -26,17 +35,19 @@ class Job(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='job_created_idx'),
+            models.Index(fields=['job_type', '-created_at', '-id'], name='job_type_created_idx'),
+            models.Index(fields=['employer', '-created_at', '-id'], name='job_employer_created_idx'),
+            # Matches the normalized location the facet counts group by
+            models.Index(Lower(Trim('location')), name='job_location_norm_idx'),
+            # Open jobs for listings, expired ones for archive_expired_jobs
+            models.Index(fields=['deadline'], name='job_deadline_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
-    @property
-    def company_name(self):
-        try:
-            return self.employer.companyprofile.company_name
-        except:
-            return self.employer.username
-
 class JobApplication(models.Model):
     STATUS_CHOICES = [
         ('PENDING', 'Pending'),
@@ -49,4 +60,81 @@ class JobApplication(models.Model):
     applicant = models.ForeignKey(User, on_delete=models.CASCADE)
     applied_date = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
-    cover_letter = models.TextField() 
\ No newline at end of file
+    cover_letter = models.TextField()
+    # Client-supplied Idempotency-Key of the apply request that created it
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'applicant'], name='unique_job_application'),
+            models.UniqueConstraint(
+                fields=['applicant', 'idempotency_key'], name='unique_application_idempotency_key'
+            ),
+        ]
+
+class JobSearchDocument(models.Model):
+    job = models.OneToOneField(
+        Job,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document'
+    )
+    length = models.PositiveIntegerField()
+
+
+class JobSearchPosting(models.Model):
+    term = models.CharField(max_length=64)
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='search_postings')
+    frequency = models.PositiveIntegerField()
+    # Copy of the document length so ranking can be answered from the
+    # (term, job, frequency, length) index without joining the documents.
+    length = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'job'], name='unique_job_search_posting'),
+        ]
+        indexes = [
+            models.Index(fields=['term', 'job', 'frequency', 'length'], name='job_search_term_idx'),
+        ]
+
+
+class ArchivedJob(CompanyNameMixin, models.Model):
+    """A long-expired job moved out of Job by archive_expired_jobs, under its original id."""
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=200)
+    description = models.TextField()
+    requirements = models.TextField()
+    salary_range = models.CharField(max_length=100)
+    location = models.CharField(max_length=100)
+    job_type = models.CharField(max_length=20, choices=Job.JOB_TYPES)
+    deadline = models.DateTimeField()
+    created_at = models.DateTimeField()
+    employer = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='archived_jobs'
+    )
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='archived_job_created_idx'),
+            models.Index(fields=['employer', '-created_at', '-id'], name='archived_job_employer_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+
+class ArchivedJobApplication(models.Model):
+    """An application to an ArchivedJob, moved along with it."""
+    id = models.BigIntegerField(primary_key=True)
+    job = models.ForeignKey(ArchivedJob, on_delete=models.CASCADE)
+    applicant = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_applications')
+    applied_date = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=JobApplication.STATUS_CHOICES)
+    cover_letter = models.TextField()
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
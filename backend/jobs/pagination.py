@@ -0,0 +1,139 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(position):
+    data = json.dumps(position, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (TypeError, ValueError):
+        raise NotFound('Invalid cursor')
+
+
+def after(created_at, pk):
+    # Rows strictly after (created_at, id) in ('-created_at', '-id') order,
+    # written as a single range on created_at so the index can seek to it
+    return Q(created_at__lte=created_at) & ~Q(created_at=created_at, id__gte=pk)
+
+
+def row_position(row):
+    # Rows are model instances, or dicts when the queryset uses values()
+    if isinstance(row, dict):
+        return row['created_at'], row['id']
+    return row.created_at, row.pk
+
+
+def iterate_keyset(queryset, chunk_size=500):
+    """
+    Yield every row of ``queryset`` in ('-created_at', '-id') order, fetching
+    ``chunk_size`` rows per query so memory stays bounded on backends (such
+    as MySQL) that buffer the whole result set client side.
+    """
+    queryset = queryset.order_by('-created_at', '-id')
+    last = None
+    while True:
+        chunk = queryset
+        if last is not None:
+            chunk = chunk.filter(after(*last))
+        rows = list(chunk[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last = row_position(rows[-1])
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only cursor pagination keyed on (created_at, id), so every page
+    is a bounded index range scan no matter how deep the client pages.
+
+    Relevance-ranked search results have no stable keyset, so for those the
+    cursor carries an offset into the ranked results instead.
+    """
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def page_queryset(self, queryset, request, view=None):
+        """The (unevaluated) rows of the requested page, plus one to tell if there is a next page."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        position = decode_cursor(cursor) if cursor else {}
+
+        if getattr(view, 'search_query', None):
+            offset = position.get('o', 0) if isinstance(position, dict) else None
+            # bool is an int too
+            if type(offset) is not int or offset < 0:
+                raise NotFound('Invalid cursor')
+            self.next_position = {'o': offset + self.page_size}
+            return queryset[offset:offset + self.page_size + 1]
+
+        queryset = queryset.order_by('-created_at', '-id')
+        if position:
+            try:
+                created_at = parse_datetime(position['c'])
+                pk = int(position['i'])
+            except (KeyError, TypeError, ValueError):
+                raise NotFound('Invalid cursor')
+            if created_at is None:
+                raise NotFound('Invalid cursor')
+            queryset = queryset.filter(after(created_at, pk))
+        self.next_position = None
+        return queryset[:self.page_size + 1]
+
+    def finish_page(self, rows):
+        if rows and self.next_position is None:
+            created_at, pk = row_position(rows[min(len(rows), self.page_size) - 1])
+            self.next_position = {'c': created_at.isoformat(), 'i': pk}
+        self.has_next = len(rows) > self.page_size
+        return rows[:self.page_size]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.finish_page(list(self.page_queryset(queryset, request, view)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() with the async ORM."""
+        return self.finish_page([row async for row in self.page_queryset(queryset, request, view)])
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
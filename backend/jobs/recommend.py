@@ -0,0 +1,391 @@
+"""
+Skill-based job recommendations.
+
+Jobs and employee profiles are turned into TF-IDF vectors over a fixed-size
+hashed vocabulary (no vocabulary to keep in sync between processes), and
+open jobs are ranked by cosine similarity to the employee's skills and
+experience.
+
+Each process keeps the job vectors in memory as a ``JobMatrix``: a CSC
+``base`` matrix built in one pass over the jobs table, plus a small CSR
+``delta`` of rows for jobs saved since. Job saves and deletes are written
+to a change log in the shared cache; before answering, a process applies
+the log entries it has not seen (superseded rows are masked out) and
+rebuilds from the database when the log has gaps or the delta grows too
+large. A query is one sparse column slice of ``base`` plus a sparse
+product with ``delta``, followed by a partial sort for the top k.
+
+Building ``base`` scans the whole jobs table, so it never happens while a
+request waits once the process is warm: ``warm_up`` (called at startup)
+loads the artifact saved by ``build_recommendations``, or builds the
+matrix, in the background, and later rebuilds run in the background while
+the current matrix keeps serving.
+"""
+import logging
+import math
+import os
+import threading
+import zlib
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from core.tasks import defer
+from .models import Job
+
+logger = logging.getLogger(__name__)
+from .search import tokenize
+
+N_FEATURES = 2 ** 18
+# Requirements say the most about the skills a job needs
+JOB_FIELD_WEIGHTS = (
+    ('title', 2),
+    ('requirements', 2),
+    ('description', 1),
+)
+PROFILE_FIELD_WEIGHTS = (
+    ('skills', 2),
+    ('experience', 1),
+)
+# Rebuild once this share of rows is in the delta or superseded
+REBUILD_RATIO = 0.1
+MIN_REBUILD_ROWS = 1000
+
+SEQUENCE_KEY = 'jobs:recommend:sequence'
+CHANGE_KEY = 'jobs:recommend:change:{}'
+CHANGE_TIMEOUT = 24 * 60 * 60
+
+
+def feature(term):
+    # crc32 rather than hash(), which differs between processes
+    return zlib.crc32(term.encode()) % N_FEATURES
+
+
+def term_counts(obj, field_weights):
+    # obj is a model instance or a values() row
+    counts = Counter()
+    for field, weight in field_weights:
+        text = obj.get(field) if isinstance(obj, dict) else getattr(obj, field)
+        for term in tokenize(text):
+            counts[feature(term)] += weight
+    return counts
+
+
+def sublinear(counts):
+    indices = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+    values = np.fromiter((1 + math.log(count) for count in counts.values()), dtype=np.float32, count=len(counts))
+    return indices, values
+
+
+def normalized(indices, values, idf):
+    values = values * idf[indices]
+    norm = np.sqrt(np.dot(values, values))
+    return values / norm if norm else values
+
+
+def to_timestamp(value):
+    return value.timestamp() if value is not None else 0.0
+
+
+class JobMatrix:
+    def __init__(self, idf, base, base_ids, base_deadlines, sequence=0):
+        self.idf = idf
+        self.base = base
+        self.base_ids = base_ids
+        self.base_deadlines = base_deadlines
+        self.base_active = np.ones(len(base_ids), dtype=bool)
+        self.delta = sparse.csr_matrix((0, N_FEATURES), dtype=np.float32)
+        self.delta_ids = np.zeros(0, dtype=np.int64)
+        self.delta_deadlines = np.zeros(0, dtype=np.float64)
+        self.delta_active = np.zeros(0, dtype=bool)
+        self.rows = {int(job_id): ('base', row) for row, job_id in enumerate(base_ids)}
+        self.superseded = 0
+        self.sequence = sequence
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_rows(cls, rows, sequence=0):
+        """
+        Build the matrix from ``(id, title, description, requirements,
+        deadline)`` rows in two passes: document frequencies, then vectors.
+        """
+        rows = list(rows)
+        df = np.zeros(N_FEATURES, dtype=np.int64)
+        documents = []
+        for job_id, title, description, requirements, deadline in rows:
+            counts = term_counts(
+                {'title': title, 'description': description, 'requirements': requirements},
+                JOB_FIELD_WEIGHTS
+            )
+            indices, values = sublinear(counts)
+            df[indices] += 1
+            documents.append((job_id, indices, values, deadline))
+
+        idf = (np.log((1 + len(documents)) / (1 + df)) + 1).astype(np.float32)
+        indptr = np.zeros(len(documents) + 1, dtype=np.int64)
+        for position, (_, indices, _, _) in enumerate(documents):
+            indptr[position + 1] = indptr[position] + len(indices)
+        indices = np.concatenate([doc[1] for doc in documents]) if documents else np.zeros(0, dtype=np.int32)
+        data = (
+            np.concatenate([normalized(doc[1], doc[2], idf) for doc in documents])
+            if documents else np.zeros(0, dtype=np.float32)
+        )
+        base = sparse.csr_matrix((data, indices, indptr), shape=(len(documents), N_FEATURES)).tocsc()
+        return cls(
+            idf,
+            base,
+            np.array([doc[0] for doc in documents], dtype=np.int64),
+            np.array([to_timestamp(doc[3]) for doc in documents], dtype=np.float64),
+            sequence,
+        )
+
+    @classmethod
+    def from_database(cls, sequence=0, chunk_size=2000):
+        rows = (
+            Job.objects.order_by()
+            .values_list('id', 'title', 'description', 'requirements', 'deadline')
+            .iterator(chunk_size=chunk_size)
+        )
+        return cls.from_rows(rows, sequence)
+
+    def save(self, path):
+        """Write ``base`` to ``path``; the delta is not saved."""
+        # Renamed into place, so readers never see a partial file
+        temporary = f'{path}.tmp'
+        with open(temporary, 'wb') as f:
+            np.savez(
+                f, data=self.base.data, indices=self.base.indices, indptr=self.base.indptr,
+                idf=self.idf, ids=self.base_ids, deadlines=self.base_deadlines,
+                sequence=np.array(self.sequence, dtype=np.int64),
+            )
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            base = sparse.csc_matrix((f['data'], f['indices'], f['indptr']), shape=(len(f['ids']), N_FEATURES))
+            return cls(f['idf'], base, f['ids'], f['deadlines'], int(f['sequence']))
+
+    def __len__(self):
+        return int(self.base_active.sum() + self.delta_active.sum())
+
+    def needs_rebuild(self):
+        stale = self.superseded + len(self.delta_ids)
+        return stale > max(MIN_REBUILD_ROWS, REBUILD_RATIO * len(self.base_ids))
+
+    def remove(self, job_id):
+        location = self.rows.pop(job_id, None)
+        if location is None:
+            return
+        segment, row = location
+        (self.base_active if segment == 'base' else self.delta_active)[row] = False
+        self.superseded += 1
+
+    def upsert(self, jobs):
+        """Replace the rows of ``jobs`` (Job instances or dicts) with fresh vectors."""
+        vectors, ids, deadlines = [], [], []
+        for job in jobs:
+            job_id = job['id'] if isinstance(job, dict) else job.pk
+            self.remove(job_id)
+            indices, values = sublinear(term_counts(job, JOB_FIELD_WEIGHTS))
+            vectors.append((indices, normalized(indices, values, self.idf)))
+            ids.append(job_id)
+            deadlines.append(to_timestamp(job['deadline'] if isinstance(job, dict) else job.deadline))
+        if not ids:
+            return
+
+        indptr = np.cumsum([0] + [len(indices) for indices, _ in vectors])
+        rows = sparse.csr_matrix(
+            (np.concatenate([v for _, v in vectors]), np.concatenate([i for i, _ in vectors]), indptr),
+            shape=(len(ids), N_FEATURES),
+        )
+        start = len(self.delta_ids)
+        self.delta = sparse.vstack([self.delta, rows], format='csr')
+        self.delta_ids = np.concatenate([self.delta_ids, np.array(ids, dtype=np.int64)])
+        self.delta_deadlines = np.concatenate([self.delta_deadlines, np.array(deadlines, dtype=np.float64)])
+        self.delta_active = np.concatenate([self.delta_active, np.ones(len(ids), dtype=bool)])
+        for offset, job_id in enumerate(ids):
+            self.rows[job_id] = ('delta', start + offset)
+
+    def query_vector(self, profile):
+        counts = term_counts(profile, PROFILE_FIELD_WEIGHTS)
+        if not counts:
+            return None, None
+        indices, values = sublinear(counts)
+        return indices, normalized(indices, values, self.idf)
+
+    def top(self, indices, values, limit=20, exclude=(), now=None):
+        """Return up to ``limit`` ``(job_id, score)`` pairs, best first."""
+        now = to_timestamp(now or timezone.now())
+        scores = np.concatenate([
+            self.base[:, indices] @ values,
+            self.delta[:, indices] @ values if len(self.delta_ids) else np.zeros(0, dtype=np.float32),
+        ])
+        ids = np.concatenate([self.base_ids, self.delta_ids])
+        open_jobs = (
+            np.concatenate([self.base_active, self.delta_active])
+            & (np.concatenate([self.base_deadlines, self.delta_deadlines]) >= now)
+            & (scores > 0)
+        )
+        if exclude:
+            open_jobs &= ~np.isin(ids, np.fromiter(exclude, dtype=np.int64))
+
+        candidates = np.flatnonzero(open_jobs)
+        if len(candidates) > limit:
+            best = np.argpartition(-scores[candidates], limit - 1)[:limit]
+            candidates = candidates[best]
+        candidates = candidates[np.lexsort((-ids[candidates], -scores[candidates]))]
+        return [(int(ids[row]), float(scores[row])) for row in candidates]
+
+
+def record_changes(job_ids):
+    """Append saved or deleted jobs to the change log read by ``get_matrix``."""
+    job_ids = list(job_ids)
+    if not job_ids:
+        return
+    try:
+        sequence = cache.incr(SEQUENCE_KEY, len(job_ids))
+    except ValueError:
+        # A lost sequence makes every process rebuild
+        cache.add(SEQUENCE_KEY, 0, None)
+        sequence = cache.incr(SEQUENCE_KEY, len(job_ids))
+    # Readers rebuild instead of replaying this many changes, so the
+    # entries would never be read
+    if len(job_ids) <= MIN_REBUILD_ROWS:
+        first = sequence - len(job_ids) + 1
+        cache.set_many(
+            {CHANGE_KEY.format(first + offset): job_id for offset, job_id in enumerate(job_ids)},
+            CHANGE_TIMEOUT
+        )
+
+
+def record_change(job_id):
+    record_changes([job_id])
+
+
+def current_sequence():
+    return cache.get(SEQUENCE_KEY, 0)
+
+
+_matrix = None
+_matrix_lock = threading.Lock()
+_rebuild_scheduled = False
+
+
+def load_artifact():
+    """The matrix saved by ``build_recommendations``, if there is one."""
+    path = settings.RECOMMENDATION_MATRIX_PATH
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return JobMatrix.load(path)
+    except (OSError, ValueError, KeyError) as exc:
+        logger.warning('Could not load the recommendation matrix from %s: %s', path, exc)
+        return None
+
+
+def build_artifact():
+    """Build the matrix from the database and save it for processes to load."""
+    matrix = JobMatrix.from_database(current_sequence())
+    matrix.save(settings.RECOMMENDATION_MATRIX_PATH)
+    return matrix
+
+
+def load_matrix():
+    global _matrix
+    with _matrix_lock:
+        if _matrix is None:
+            # The change log brings an older artifact up to date
+            _matrix = load_artifact() or JobMatrix.from_database(current_sequence())
+        return _matrix
+
+
+def warm_up():
+    """Load or build this process's matrix in the background."""
+    defer(load_matrix)
+
+
+def rebuild():
+    global _matrix, _rebuild_scheduled
+    try:
+        # Changes made during the scan are replayed by the next get_matrix()
+        matrix = JobMatrix.from_database(current_sequence())
+        with _matrix_lock:
+            _matrix = matrix
+    finally:
+        _rebuild_scheduled = False
+
+
+def schedule_rebuild():
+    # Called with _matrix_lock held
+    global _rebuild_scheduled
+    if not _rebuild_scheduled:
+        _rebuild_scheduled = True
+        defer(rebuild)
+
+
+def get_matrix():
+    """
+    Return this process's JobMatrix, brought up to date with the change log
+    when it can be. When it can't, the matrix is rebuilt in the background
+    and the current one serves until then.
+    """
+    matrix = _matrix
+    if matrix is None:
+        # Only before warm_up() has finished, or without it
+        matrix = load_matrix()
+    sequence = current_sequence()
+    if matrix.sequence == sequence or _rebuild_scheduled:
+        return matrix
+
+    with _matrix_lock:
+        matrix = _matrix
+        sequence = current_sequence()
+        if sequence == matrix.sequence or _rebuild_scheduled:
+            return matrix
+        if sequence < matrix.sequence:
+            # The change log was lost
+            schedule_rebuild()
+            return matrix
+
+        keys = [CHANGE_KEY.format(number) for number in range(matrix.sequence + 1, sequence + 1)]
+        changes = cache.get_many(keys) if len(keys) <= MIN_REBUILD_ROWS else {}
+        if len(changes) < len(keys):
+            # Evicted or too many changes to replay
+            schedule_rebuild()
+            return matrix
+
+        job_ids = set(changes.values())
+        jobs = list(
+            Job.objects.filter(pk__in=job_ids)
+            .values('id', 'title', 'description', 'requirements', 'deadline')
+        )
+        # Queries hold matrix.lock, so they never see a half-applied batch
+        with matrix.lock:
+            for job_id in job_ids - {job['id'] for job in jobs}:
+                matrix.remove(job_id)
+            matrix.upsert(jobs)
+            matrix.sequence = sequence
+        if matrix.needs_rebuild():
+            schedule_rebuild()
+        return matrix
+
+
+def reset_matrix():
+    global _matrix
+    with _matrix_lock:
+        _matrix = None
+
+
+def recommend(profile, limit=20, exclude=()):
+    """``(job_id, score)`` pairs of the open jobs that best match ``profile``."""
+    matrix = get_matrix()
+    indices, values = matrix.query_vector(profile)
+    if indices is None:
+        return []
+    with matrix.lock:
+        return matrix.top(indices, values, limit, exclude)
@@ -0,0 +1,105 @@
+import csv
+import json
+from io import StringIO
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+async def in_thread(chunks):
+    next_chunk = sync_to_async(next)
+    while True:
+        chunk = await next_chunk(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def streaming_response(chunks, content_type, request=None):
+    # Under ASGI, Django reads a sync iterator to the end before sending
+    # anything, so there each chunk is produced in a thread instead
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        chunks = in_thread(chunks)
+    return StreamingHttpResponse(chunks, content_type=content_type)
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline-delimited JSON, one object per line. Lists render as one line
+    per item; anything else (e.g. an error body) renders as a single line.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(ndjson_lines(rows)).encode(self.charset)
+
+
+def stream_ndjson(rows, serialize, request=None, batch_size=500):
+    """
+    Serialize ``rows`` in batches with ``serialize(batch)`` and stream them
+    as NDJSON, so neither the result set nor the response body is ever held
+    in memory as a whole. Pass the ``request`` for this to hold under ASGI.
+    """
+    def generate():
+        iterator = iter(rows)
+        while True:
+            batch = list(islice(iterator, batch_size))
+            if not batch:
+                return
+            yield ''.join(ndjson_lines(serialize(batch)))
+
+    return streaming_response(generate(), NDJSONRenderer.media_type, request)
+
+
+def csv_lines(rows, fieldnames, header=False):
+    buffer = StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction='ignore')
+    if header:
+        writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Comma-separated values with a header row. Lists render as one row per
+    item; anything else (e.g. an error body) renders as a single row.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        fieldnames = list(dict.fromkeys(key for row in rows for key in row))
+        return csv_lines(rows, fieldnames, header=True).encode(self.charset)
+
+
+def stream_csv(rows, serialize, fieldnames, request=None, batch_size=500):
+    """Like ``stream_ndjson``, as CSV with a header row of ``fieldnames``."""
+    def generate():
+        yield csv_lines([], fieldnames, header=True)
+        iterator = iter(rows)
+        while True:
+            batch = list(islice(iterator, batch_size))
+            if not batch:
+                return
+            yield csv_lines(serialize(batch), fieldnames)
+
+    return streaming_response(generate(), CSVRenderer.media_type, request)
@@ -0,0 +1,188 @@
+import math
+import re
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Case, Count, F, FloatField, Sum, Value, When
+
+from .models import Job, JobSearchDocument, JobSearchPosting
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Title matches count more than matches in the body text
+FIELD_WEIGHTS = (
+    ('title', 3),
+    ('description', 1),
+    ('requirements', 1),
+)
+
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 10
+STATS_CACHE_KEY = 'jobs:search:stats'
+STATS_CACHE_TIMEOUT = 300
+
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+
+STOP_WORDS = frozenset("""
+    a an and are as at be but by for from has have in is it its of on or
+    our that the their this to was we will with you your
+""".split())
+
+
+def tokenize(text):
+    terms = []
+    for match in TOKEN_RE.findall((text or '').lower()):
+        # Keep "c++", "c#" and "node.js" intact but drop sentence punctuation
+        term = match.rstrip('.')
+        if term and term not in STOP_WORDS and len(term) <= MAX_TERM_LENGTH:
+            terms.append(term)
+    return terms
+
+
+def job_terms(job):
+    counts = Counter()
+    for field, weight in FIELD_WEIGHTS:
+        for term in tokenize(getattr(job, field)):
+            counts[term] += weight
+    return counts
+
+
+def build_postings(job):
+    counts = job_terms(job)
+    length = sum(counts.values())
+    postings = [
+        JobSearchPosting(term=term, job_id=job.pk, frequency=frequency, length=length)
+        for term, frequency in counts.items()
+    ]
+    return JobSearchDocument(job_id=job.pk, length=length), postings
+
+
+def index_job(job):
+    document, postings = build_postings(job)
+    with transaction.atomic():
+        JobSearchPosting.objects.filter(job_id=job.pk).delete()
+        JobSearchPosting.objects.bulk_create(postings)
+        JobSearchDocument.objects.update_or_create(
+            job_id=job.pk,
+            defaults={'length': document.length}
+        )
+
+
+def index_new_jobs(jobs):
+    """Index jobs that have no search document yet, in bulk."""
+    documents, postings = [], []
+    for job in jobs:
+        document, job_postings = build_postings(job)
+        documents.append(document)
+        postings.extend(job_postings)
+    JobSearchDocument.objects.bulk_create(documents)
+    JobSearchPosting.objects.bulk_create(postings, batch_size=5000)
+    return len(documents)
+
+
+def rebuild_index(batch_size=500):
+    indexed = 0
+    with transaction.atomic():
+        JobSearchPosting.objects.all().delete()
+        JobSearchDocument.objects.all().delete()
+
+        documents, postings = [], []
+        jobs = Job.objects.only('id', 'title', 'description', 'requirements').order_by()
+        for job in jobs.iterator(chunk_size=batch_size):
+            document, job_postings = build_postings(job)
+            documents.append(document)
+            postings.extend(job_postings)
+            if len(documents) >= batch_size:
+                JobSearchDocument.objects.bulk_create(documents)
+                JobSearchPosting.objects.bulk_create(postings, batch_size=batch_size * 10)
+                indexed += len(documents)
+                documents, postings = [], []
+
+        JobSearchDocument.objects.bulk_create(documents)
+        JobSearchPosting.objects.bulk_create(postings, batch_size=batch_size * 10)
+        indexed += len(documents)
+
+    cache.delete(STATS_CACHE_KEY)
+    return indexed
+
+
+def corpus_stats():
+    # Document count and average length drift slowly, so they are cached
+    # rather than recomputed for every query.
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is None:
+        stats = JobSearchDocument.objects.aggregate(count=Count('pk'), avg_length=Avg('length'))
+        stats['avg_length'] = stats['avg_length'] or 1.0
+        cache.set(STATS_CACHE_KEY, stats, STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def idf(document_count, document_frequency):
+    return math.log(1 + (document_count - document_frequency + 0.5) / (document_frequency + 0.5))
+
+
+def bm25_score(frequencies, stats, postings=''):
+    """
+    Aggregate scoring postings (with ``term``, ``frequency`` and ``length``
+    columns, reached through the ``postings`` lookup prefix) grouped per
+    document, given each query term's document frequency and the corpus
+    ``count`` and ``avg_length``.
+    """
+    document_count = max(stats['count'], max(frequencies.values()))
+    term_weight = Case(
+        *[
+            When(**{f'{postings}term': term}, then=Value(idf(document_count, df)))
+            for term, df in frequencies.items()
+        ],
+        default=Value(0.0),
+        output_field=FloatField()
+    )
+    frequency, length = F(f'{postings}frequency'), F(f'{postings}length')
+    length_norm = Value(K1 * (1 - B)) + Value(K1 * B / stats['avg_length']) * length
+    return Sum(
+        term_weight * Value(K1 + 1) * frequency / (frequency + length_norm),
+        output_field=FloatField()
+    )
+
+
+def query_terms(query):
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+
+def document_frequencies(postings, terms):
+    return dict(
+        postings.filter(term__in=terms)
+        .values_list('term')
+        .annotate(df=Count('pk'))
+        .order_by()
+    )
+
+
+def matching_jobs(query):
+    """
+    Subquery of the ids of jobs containing any term of ``query``, for
+    filtering without ranking.
+    """
+    return JobSearchPosting.objects.filter(term__in=query_terms(query)).values('job_id')
+
+
+def search_jobs(queryset, query):
+    """
+    Filter ``queryset`` to the jobs matching ``query``, best match first.
+    The jobs are joined to their postings of the query terms and scored in
+    one GROUP BY, so a page is a single scan of those postings, sorted and
+    cut with LIMIT/OFFSET by the database.
+    """
+    terms = query_terms(query)
+    frequencies = document_frequencies(JobSearchPosting.objects.all(), terms) if terms else {}
+    if not frequencies:
+        return queryset.none()
+    # The filter and the aggregate share one join to the postings
+    return (
+        queryset.filter(search_postings__term__in=terms)
+        .annotate(search_score=bm25_score(frequencies, corpus_stats(), postings='search_postings__'))
+        .order_by('-search_score', '-pk')
+    )
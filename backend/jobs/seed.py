@@ -0,0 +1,309 @@
+"""
+Synthetic data for load testing.
+
+``Seeder`` fills the database with employers and their company profiles,
+employees and their profiles, jobs and applications, shaped like
+production data: a few employers post most of the jobs, popular jobs get
+most of the applications, deadlines range from long expired to months
+ahead and every text field draws from one skills vocabulary, so search
+and recommendations find matches. The same seed produces the same rows
+(with timestamps relative to the time of the run).
+
+Rows are written with ``bulk_create``, one batch per transaction, and
+indexed for search as they go. Every seeded user's email starts with
+``EMAIL_PREFIX``; ``clear`` removes them and everything they own again.
+"""
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache as django_cache
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from accounts import search as profile_search
+from accounts.models import (
+    User, EmployeeProfile, CompanyProfile, ProfileSearchDocument, ProfileSearchPosting
+)
+from .bulk import delete_in, notify_changed
+from .models import (
+    Job, JobApplication, JobSearchDocument, JobSearchPosting, ArchivedJob, ArchivedJobApplication
+)
+from . import search
+
+EMAIL_PREFIX = 'seed-'
+PASSWORD = 'seed'
+BATCH_SIZE = 5000
+
+SKILLS = (
+    'python django flask fastapi java spring kotlin scala go rust c++ c# .net javascript typescript '
+    'react angular vue node.js sql postgresql mysql mongodb redis kafka spark hadoop airflow aws azure '
+    'gcp docker kubernetes terraform linux bash git ci/cd graphql rest grpc pandas numpy pytorch '
+    'tensorflow figma photoshop seo marketing sales accounting excel tableau powerbi salesforce sap '
+    'swift ios android flutter unity security networking testing selenium agile scrum'
+).split()
+TITLES = ('Developer', 'Engineer', 'Analyst', 'Architect', 'Consultant', 'Lead', 'Specialist')
+SENIORITY = ('Junior', '', '', 'Senior', 'Senior', 'Staff', 'Principal')
+FIRST_NAMES = (
+    'Aarav', 'Priya', 'Rahul', 'Ananya', 'Vikram', 'Divya', 'Arjun', 'Meera', 'Karthik', 'Lakshmi',
+    'James', 'Emma', 'Liam', 'Olivia', 'Noah', 'Sofia', 'Lucas', 'Mia', 'Ethan', 'Chloe'
+)
+LAST_NAMES = (
+    'Kumar', 'Sharma', 'Iyer', 'Reddy', 'Patel', 'Nair', 'Singh', 'Rao', 'Menon', 'Das',
+    'Smith', 'Johnson', 'Brown', 'Garcia', 'Miller', 'Davis', 'Martin', 'Lee', 'Walker', 'Hall'
+)
+COMPANY_WORDS = (
+    'Blue', 'Bright', 'Cloud', 'Data', 'Delta', 'Green', 'Nova', 'Pixel', 'Quantum', 'River',
+    'Silver', 'Summit', 'Swift', 'Vertex', 'Zen'
+)
+COMPANY_SUFFIXES = ('Labs', 'Systems', 'Technologies', 'Solutions', 'Software', 'Networks', 'Works')
+INDUSTRIES = ('Software', 'Finance', 'Healthcare', 'Retail', 'Education', 'Manufacturing', 'Media', 'Logistics')
+COMPANY_SIZES = ('1-10', '11-50', '51-200', '201-1000', '1000+')
+# Repeated entries make a location more common
+LOCATIONS = (
+    'Remote', 'Remote', 'Remote', 'Chennai', 'Chennai', 'Bangalore', 'Bangalore', 'Hyderabad', 'Pune',
+    'Mumbai', 'Delhi', 'Coimbatore', 'London', 'Berlin', 'New York', 'Singapore'
+)
+JOB_TYPE_WEIGHTS = (('FULL_TIME', 70), ('CONTRACT', 15), ('PART_TIME', 10), ('INTERNSHIP', 5))
+STATUS_WEIGHTS = (('PENDING', 50), ('REVIEWING', 25), ('REJECTED', 20), ('ACCEPTED', 5))
+
+# Jobs are posted over the past JOB_HISTORY, more of them recently, and
+# close after JOB_OPEN_DAYS
+JOB_HISTORY = timedelta(days=365)
+JOB_OPEN_DAYS = (14, 90)
+
+
+class SeedError(Exception):
+    pass
+
+
+@contextmanager
+def given_timestamps(model, *names):
+    """Let bulk_create keep the values set on auto_now_add fields."""
+    fields = [model._meta.get_field(name) for name in names]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def seeded_users():
+    return User.objects.filter(email__startswith=EMAIL_PREFIX)
+
+
+def last_pk(model):
+    return model.objects.aggregate(last=Max('pk'))['last'] or 0
+
+
+class Seeder:
+    def __init__(self, seed=0, batch_size=BATCH_SIZE, log=None):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+        # Hashing is deliberately slow, so every seeded user shares one hash
+        self.password = make_password(PASSWORD)
+
+    def seed(self, employers, employees, jobs, applications, profile_ratio=0.9):
+        """Create the rows; returns how many of each were created."""
+        if seeded_users().exists():
+            raise SeedError('The database is already seeded; clear it first')
+        if applications > employees * jobs // 2:
+            raise SeedError('Too many applications for the number of employees and jobs')
+
+        employer_ids = self.create_users('EMPLOYER', employers)
+        self.create_company_profiles(employer_ids)
+        employee_ids = self.create_users('EMPLOYEE', employees)
+        profiles = self.create_employee_profiles(employee_ids, profile_ratio)
+        job_rows = self.create_jobs(employer_ids, jobs)
+        self.create_applications(employee_ids, job_rows, applications)
+
+        notify_changed(employer_ids, [pk for pk, _, _ in job_rows])
+        django_cache.delete_many([search.STATS_CACHE_KEY, profile_search.STATS_CACHE_KEY])
+        return {
+            'employers': len(employer_ids),
+            'employees': len(employee_ids),
+            'employee_profiles': profiles,
+            'jobs': len(job_rows),
+            'applications': applications,
+        }
+
+    def batches(self, count):
+        for start in range(0, count, self.batch_size):
+            yield start, min(start + self.batch_size, count)
+
+    def skewed(self, items, power):
+        # Early items are picked far more often than later ones
+        return items[int(len(items) * self.rng.random() ** power)]
+
+    def sentence(self, skills):
+        return self.rng.choice((
+            'You will build and run services with {}.',
+            'Experience with {} is a strong plus.',
+            'Our team works with {} every day.',
+            'We expect hands-on knowledge of {}.',
+        )).format(', '.join(skills))
+
+    def create_users(self, role, count):
+        ids = []
+        for start, end in self.batches(count):
+            users = []
+            for number in range(start, end):
+                username = f'{EMAIL_PREFIX}{role.lower()}-{number}'
+                users.append(User(
+                    email=f'{username}@example.com', username=username, password=self.password,
+                    role=role, is_email_verified=True,
+                    first_name=self.rng.choice(FIRST_NAMES), last_name=self.rng.choice(LAST_NAMES),
+                    date_joined=self.now - JOB_HISTORY * self.rng.random(),
+                ))
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+            # bulk_create does not return primary keys on MySQL
+            pks = dict(
+                User.objects.filter(username__in=[user.username for user in users])
+                .values_list('username', 'pk')
+            )
+            ids.extend(pks[user.username] for user in users)
+            self.log(f'{role.lower()}s: {end:,}/{count:,}')
+        return ids
+
+    def create_company_profiles(self, employer_ids):
+        for start, end in self.batches(len(employer_ids)):
+            CompanyProfile.objects.bulk_create([
+                CompanyProfile(
+                    user_id=user_id,
+                    company_name=f'{self.rng.choice(COMPANY_WORDS)} {self.rng.choice(COMPANY_SUFFIXES)}',
+                    company_description=self.sentence(self.rng.sample(SKILLS, 4)),
+                    industry=self.rng.choice(INDUSTRIES),
+                    company_size=self.rng.choice(COMPANY_SIZES),
+                    location=self.rng.choice(LOCATIONS),
+                )
+                for user_id in employer_ids[start:end]
+            ])
+
+    def create_employee_profiles(self, employee_ids, profile_ratio):
+        created = 0
+        for start, end in self.batches(len(employee_ids)):
+            batch = [user_id for user_id in employee_ids[start:end] if self.rng.random() < profile_ratio]
+            profiles = []
+            for user_id in batch:
+                skills = self.rng.sample(SKILLS, self.rng.randint(3, 10))
+                title = f'{self.rng.choice(SENIORITY)} {skills[0].title()} {self.rng.choice(TITLES)}'.strip()
+                profiles.append(EmployeeProfile(
+                    user_id=user_id,
+                    resume=f'resumes/{EMAIL_PREFIX}{user_id}.pdf',
+                    degree=f'degrees/{EMAIL_PREFIX}{user_id}.pdf',
+                    skills=', '.join(skills),
+                    experience=f'{self.rng.randint(0, 20)} years as {title}. {self.sentence(skills[1:4])}',
+                    phone=str(self.rng.randint(7000000000, 9999999999)),
+                ))
+            with transaction.atomic():
+                EmployeeProfile.objects.bulk_create(profiles)
+                profile_search.index_new_profiles(
+                    EmployeeProfile.objects.filter(user_id__in=batch, search_document__isnull=True)
+                    .only('skills', 'experience', 'resume')
+                )
+            created += len(profiles)
+            self.log(f'employee profiles: {created:,}')
+        return created
+
+    def create_jobs(self, employer_ids, count):
+        """Returns ``(pk, created_at, deadline)`` for every job."""
+        rows = []
+        job_types, type_weights = zip(*JOB_TYPE_WEIGHTS)
+        for start, end in self.batches(count):
+            jobs = []
+            for _ in range(start, end):
+                skills = self.rng.sample(SKILLS, self.rng.randint(3, 8))
+                created_at = self.now - JOB_HISTORY * self.rng.random() ** 2
+                low, high = self.rng.randint(3, 30), self.rng.randint(31, 60)
+                jobs.append(Job(
+                    title=f'{self.rng.choice(SENIORITY)} {skills[0].title()} {self.rng.choice(TITLES)}'.strip(),
+                    description=' '.join(self.sentence(self.rng.sample(skills, 3)) for _ in range(4)),
+                    requirements=', '.join(skills[:5]),
+                    salary_range=f'{low} - {high} LPA',
+                    location=self.rng.choice(LOCATIONS),
+                    job_type=self.rng.choices(job_types, type_weights)[0],
+                    deadline=created_at + timedelta(days=self.rng.randint(*JOB_OPEN_DAYS)),
+                    created_at=created_at,
+                    employer_id=self.skewed(employer_ids, 3),
+                ))
+            with transaction.atomic():
+                after = last_pk(Job)
+                with given_timestamps(Job, 'created_at'):
+                    Job.objects.bulk_create(jobs)
+                # Only this command writes jobs while it runs, so the new
+                # rows are the ones past the previous last primary key
+                new_jobs = list(
+                    Job.objects.filter(pk__gt=after)
+                    .only('id', 'title', 'description', 'requirements', 'created_at', 'deadline')
+                    .order_by('pk')
+                )
+                search.index_new_jobs(new_jobs)
+            rows.extend((job.pk, job.created_at, job.deadline) for job in new_jobs)
+            self.log(f'jobs: {end:,}/{count:,}')
+        return rows
+
+    def create_applications(self, employee_ids, job_rows, count):
+        statuses, status_weights = zip(*STATUS_WEIGHTS)
+        # Spread evenly over the employees, each applying to distinct jobs
+        per_employee = count / len(employee_ids) if employee_ids else 0
+        pending, created = [], 0
+        for position, applicant_id in enumerate(employee_ids):
+            wanted = int((position + 1) * per_employee) - int(position * per_employee)
+            chosen = set()
+            while len(chosen) < wanted:
+                chosen.add(self.skewed(job_rows, 2))
+            for job_id, created_at, deadline in chosen:
+                closed = min(deadline, self.now)
+                pending.append(JobApplication(
+                    job_id=job_id, applicant_id=applicant_id,
+                    applied_date=created_at + (closed - created_at) * self.rng.random(),
+                    status=self.rng.choices(statuses, status_weights)[0],
+                    cover_letter=f'I would like to apply. {self.sentence(self.rng.sample(SKILLS, 3))}',
+                ))
+            if len(pending) >= self.batch_size or position == len(employee_ids) - 1:
+                with transaction.atomic(), given_timestamps(JobApplication, 'applied_date'):
+                    JobApplication.objects.bulk_create(pending)
+                created += len(pending)
+                pending = []
+                self.log(f'applications: {created:,}/{count:,}')
+        return created
+
+
+def clear():
+    """Delete every seeded user and everything they own; returns the number of users."""
+    users = seeded_users()
+    employers = users.filter(role='EMPLOYER')
+    user_ids = list(users.values_list('pk', flat=True))
+    employer_ids = list(employers.values_list('pk', flat=True))
+    job_ids = list(Job.objects.filter(employer__in=employers).values_list('pk', flat=True))
+    archived_job_ids = list(ArchivedJob.objects.filter(employer__in=employers).values_list('pk', flat=True))
+    profile_ids = list(EmployeeProfile.objects.filter(user__in=users).values_list('pk', flat=True))
+    with transaction.atomic():
+        # Plain DELETEs for the big tables, as in jobs.archive; delete()
+        # below only has the users' few remaining relations to collect
+        for model, field, values in (
+            (JobApplication, 'applicant', user_ids),
+            (JobApplication, 'job', job_ids),
+            (ArchivedJobApplication, 'applicant', user_ids),
+            (ArchivedJobApplication, 'job', archived_job_ids),
+            (JobSearchPosting, 'job', job_ids),
+            (JobSearchDocument, 'job', job_ids),
+            (Job, 'pk', job_ids),
+            (ArchivedJob, 'pk', archived_job_ids),
+            (ProfileSearchPosting, 'profile', profile_ids),
+            (ProfileSearchDocument, 'profile', profile_ids),
+            (EmployeeProfile, 'pk', profile_ids),
+            (CompanyProfile, 'user', user_ids),
+        ):
+            delete_in(model, field, values)
+        users.delete()
+    notify_changed(employer_ids, job_ids)
+    django_cache.delete_many([search.STATS_CACHE_KEY, profile_search.STATS_CACHE_KEY])
+    return len(user_ids)
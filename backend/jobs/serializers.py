@@ -1,7 +1,8 @@
 from rest_framework import serializers
-from .models import Job, JobApplication
+from core.serializers import SparseFieldsMixin
+from .models import Job, JobApplication, ArchivedJob, ArchivedJobApplication
 
-class JobSerializer(serializers.ModelSerializer):
+class JobSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     company_name = serializers.CharField(source='employer.companyprofile.company_name', read_only=True)
     
     class Meta:
@@ -21,8 +22,28 @@ class JobSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['employer', 'created_at']
 
-class JobApplicationSerializer(serializers.ModelSerializer):
-    job = JobSerializer(read_only=True)
+class JobSummarySerializer(serializers.ModelSerializer):
+    # What application lists display; ?expand=job returns the full job
+    company_name = serializers.CharField(source='employer.companyprofile.company_name', read_only=True)
+
+    class Meta:
+        model = Job
+        fields = [
+            'id',
+            'title',
+            'company_name',
+            'location',
+            'job_type',
+            'salary_range',
+            'deadline'
+        ]
+        read_only_fields = fields
+
+class JobApplicationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    job = JobSummarySerializer(read_only=True)
+    expandable_fields = {
+        'job': (JobSerializer, {'read_only': True}),
+    }
     
     class Meta:
         model = JobApplication
@@ -38,4 +59,23 @@ class JobApplicationSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data['applicant'] = self.context['request'].user
-        return super().create(validated_data) 
\ No newline at end of file
+        return super().create(validated_data)
+
+class ArchivedJobSerializer(JobSerializer):
+    class Meta(JobSerializer.Meta):
+        model = ArchivedJob
+        read_only_fields = JobSerializer.Meta.fields
+
+class ArchivedJobSummarySerializer(JobSummarySerializer):
+    class Meta(JobSummarySerializer.Meta):
+        model = ArchivedJob
+
+class ArchivedJobApplicationSerializer(JobApplicationSerializer):
+    job = ArchivedJobSummarySerializer(read_only=True)
+    expandable_fields = {
+        'job': (ArchivedJobSerializer, {'read_only': True}),
+    }
+
+    class Meta(JobApplicationSerializer.Meta):
+        model = ArchivedJobApplication
+        read_only_fields = JobApplicationSerializer.Meta.fields
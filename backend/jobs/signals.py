@@ -0,0 +1,47 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from accounts.models import CompanyProfile
+from .models import Job, JobApplication
+from . import cache, recommend, search
+
+
+@receiver(post_save, sender=Job)
+def index_job(sender, instance, raw=False, **kwargs):
+    # Postings and the search document are removed with the job by the
+    # cascade, so only saves need handling here.
+    if not raw:
+        search.index_job(instance)
+
+
+@receiver(post_save, sender=Job)
+@receiver(post_delete, sender=Job)
+@receiver(post_save, sender=CompanyProfile)
+@receiver(post_delete, sender=CompanyProfile)
+def invalidate_job_cache(sender, **kwargs):
+    # Bumped after commit so a concurrent request can't cache pre-commit
+    # rows under the new generation
+    transaction.on_commit(cache.bump_generation)
+
+
+@receiver(post_save, sender=Job)
+@receiver(post_delete, sender=Job)
+def record_recommendation_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        job_id = instance.pk
+        transaction.on_commit(lambda: recommend.record_change(job_id))
+
+
+@receiver(post_save, sender=Job)
+@receiver(post_delete, sender=Job)
+def invalidate_job_employer_stats(sender, instance, **kwargs):
+    transaction.on_commit(lambda: cache.bump_stats_version(instance.employer_id))
+
+
+@receiver(post_save, sender=JobApplication)
+@receiver(post_delete, sender=JobApplication)
+def invalidate_application_stats(sender, instance, raw=False, **kwargs):
+    # By job, so applying stays a single INSERT
+    if not raw:
+        job_id = instance.job_id
+        transaction.on_commit(lambda: cache.bump_application_version(job_id))
@@ -0,0 +1,935 @@
+import importlib
+import os
+import shutil
+import tempfile
+import unittest
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connection, connections
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.test import (
+    AsyncClient, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase, APITransactionTestCase
+from rest_framework.views import APIView
+
+from accounts import urls as accounts_urls
+from accounts.async_views import HANDLERS as account_handlers
+from accounts.models import User, CompanyProfile, EmployeeProfile
+from accounts.serializers import CustomTokenObtainPairSerializer
+from core import metrics, replicas, urls as core_urls
+from core.async_views import async_view
+from core.projection import Projection
+from core.query_budget import ENDPOINT_BUDGETS, create_fixtures, request_endpoint
+from core.query_plans import hot_queries, plan_problems
+from . import archive, recommend, urls as jobs_urls
+from .async_views import HANDLERS as job_handlers
+from .models import (
+    ArchivedJob, ArchivedJobApplication, Job, JobApplication, JobSearchDocument, JobSearchPosting,
+)
+from .pagination import encode_cursor
+from .serializers import JobApplicationSerializer, JobSerializer
+from .views import JobViewSet
+
+
+def create_employer(email='employer@example.com'):
+    employer = User.objects.create_user(
+        email=email, username=email.split('@')[0], password='secret', role='EMPLOYER'
+    )
+    CompanyProfile.objects.create(
+        user=employer, company_name='Acme', company_description='Acme',
+        industry='Software', company_size='10', location='Remote'
+    )
+    return employer
+
+
+def create_job(employer, title='Python Developer', **fields):
+    fields = {
+        'description': f'{title} for Django APIs', 'requirements': 'Python', 'salary_range': '1',
+        'location': 'Remote', 'job_type': 'FULL_TIME', 'deadline': timezone.now() + timedelta(days=30),
+        **fields,
+    }
+    return Job.objects.create(title=title, employer=employer, **fields)
+
+
+def create_employee(username='employee'):
+    return User.objects.create_user(
+        email=f'{username}@example.com', username=username, password='secret', role='EMPLOYEE'
+    )
+
+
+def read_pages(client, url):
+    ids = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200, response.status_code
+        data = response.json()
+        ids += [job['id'] for job in data['results']]
+        url = data['next']
+    return ids
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # More rows than any budget, so an N+1 query goes over it
+        cls.fixtures = create_fixtures(20)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_endpoints_within_budget(self):
+        for label, user, method, url, budget in ENDPOINT_BUDGETS:
+            with self.subTest(label):
+                response, _ = request_endpoint(self.fixtures, label, user, method, url, budget)
+                self.assertLess(response.status_code, 400)
+
+
+class QueryPlanTests(TestCase):
+    """
+    SQLite plans from the schema alone (nothing is ANALYZEd), so the test
+    database's handful of rows get the same plans as production volumes.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = create_employer()
+        cls.applicant = create_employee()
+        cls.job = create_job(cls.employer)
+        JobApplication.objects.create(job=cls.job, applicant=cls.applicant, cover_letter='Hello')
+
+    def setUp(self):
+        if connection.vendor == 'mysql':
+            self.skipTest('MySQL scans tables this small; run check_query_plans on seeded data instead')
+        if connection.vendor == 'postgresql':
+            # Only scans no index can replace remain, as on large tables.
+            # SET LOCAL ends with the test's transaction.
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def test_hot_queries_use_indexes(self):
+        for label, queryset, allow_sort in hot_queries(self.employer, self.applicant, self.job):
+            with self.subTest(label):
+                plan, problems = plan_problems(queryset, allow_sort=allow_sort)
+                self.assertEqual(problems, [], plan)
+
+
+class ProjectionTests(TestCase):
+    """The projection renders the same bytes as the serializer it replaces."""
+
+    @classmethod
+    def setUpTestData(cls):
+        job = create_job(create_employer())
+        # No CompanyProfile, so company_name is null
+        no_profile = User.objects.create_user(
+            email='noprofile@example.com', username='noprofile', password='secret', role='EMPLOYER'
+        )
+        other_job = create_job(no_profile, title='Data Engineer', job_type='CONTRACT')
+        applicant = create_employee()
+        JobApplication.objects.create(job=job, applicant=applicant, cover_letter='Hello')
+        JobApplication.objects.create(job=other_job, applicant=applicant, cover_letter='Hi', status='ACCEPTED')
+
+    def assert_same_json(self, serializer_class, queryset):
+        queryset = queryset.order_by('-pk')
+        projection = Projection.build(serializer_class())
+        self.assertIsNotNone(projection)
+        expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+        self.assertEqual(JSONRenderer().render(projection.represent_many(projection.values(queryset))), expected)
+        return expected
+
+    def test_jobs(self):
+        data = self.assert_same_json(JobSerializer, Job.objects.select_related('employer__companyprofile'))
+        self.assertIn(b'"company_name":null', data)
+
+    def test_applications(self):
+        self.assert_same_json(
+            JobApplicationSerializer, JobApplication.objects.select_related('job__employer__companyprofile')
+        )
+
+    def test_null_column(self):
+        # No column the serializers project is nullable yet, so null the
+        # deadline on the fetched row and the instance alike
+        job = Job.objects.select_related('employer__companyprofile').first()
+        projection = Projection.build(JobSerializer())
+        row = projection.values(Job.objects.filter(pk=job.pk)).get()
+        row['deadline'], job.deadline = None, None
+        self.assertEqual(
+            JSONRenderer().render(projection.represent(row)),
+            JSONRenderer().render(JobSerializer(job).data)
+        )
+
+
+class MetricsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        for name, value in (('registry', metrics.Registry()), ('_slot', None), ('worker_id', 'web-1:100')):
+            patcher = mock.patch.object(metrics, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def scrape(self, **headers):
+        with override_settings(METRICS_TOKEN='secret'):
+            return self.client.get('/metrics', **headers)
+
+    def test_requests_are_labelled_and_timed(self):
+        create_job(create_employer())
+        with override_settings(METRICS_SAMPLE_RATE=1.0):
+            response = self.client.get('/api/jobs/')
+        parts = [part.split(';')[0] for part in response['Server-Timing'].split(', ')]
+        self.assertEqual(parts, ['total', 'view', 'render', 'db', 'serialize'])
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+
+        labels = (('endpoint', 'JobViewSet.list'), ('method', 'GET'))
+        self.assertEqual(metrics.registry.counters[('http_requests_total', labels + (('status', 200),))], 1)
+        self.assertEqual(metrics.registry.histograms[('http_db_queries', labels)][-1], 1)
+
+    def test_histogram_buckets_are_cumulative(self):
+        for value in (0.003, 0.02, 0.025, 20):
+            metrics.registry.observe('http_request_duration_seconds', (('endpoint', 'x'),), value)
+        lines = self.scrape(HTTP_AUTHORIZATION='Bearer secret').content.decode().splitlines()
+        buckets = {
+            line.split('le="')[1].split('"')[0]: int(line.split()[-1])
+            for line in lines if line.startswith('http_request_duration_seconds_bucket')
+        }
+        self.assertEqual([buckets[bound] for bound in ('0.005', '0.01', '0.025', '10.0', '+Inf')], [1, 1, 3, 3, 4])
+        self.assertIn('http_request_duration_seconds_count{endpoint="x"} 4', lines)
+
+    def test_metrics_need_the_token(self):
+        self.assertEqual(self.scrape().status_code, 404)
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer wrong').status_code, 404)
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+        # Without a token, only in DEBUG
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+    def test_scrapes_merge_live_workers_without_writing(self):
+        metrics.registry.inc('jobs_total', ())
+        with mock.patch.object(metrics, 'worker_id', 'web-2:200'):
+            metrics.flush()
+        metrics.registry.inc('jobs_total', ())
+        with mock.patch.object(cache, 'set') as cache_set:
+            response = self.scrape(HTTP_AUTHORIZATION='Bearer secret')
+        cache_set.assert_not_called()
+        # web-2's published 1 plus this worker's 2
+        self.assertIn('jobs_total 3', response.content.decode().splitlines())
+
+    def test_workers_hold_distinct_slots_until_they_expire(self):
+        metrics.flush()
+        with mock.patch.object(metrics, 'worker_id', 'web-2:200'), mock.patch.object(metrics, '_slot', None):
+            metrics.flush()
+            self.assertEqual(metrics._slot, 1)
+        metrics.flush()
+        self.assertEqual(metrics._slot, 0)
+        self.assertEqual(metrics.live_workers(), {'web-1:100', 'web-2:200'})
+
+        # An expired slot is claimed again
+        cache.delete(metrics.WORKER_SLOT_KEY.format(0))
+        metrics.flush()
+        self.assertEqual(metrics._slot, 0)
+        self.assertEqual(metrics.live_workers(), {'web-1:100', 'web-2:200'})
+
+
+class JobCacheTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = create_employer()
+        cls.job = create_job(cls.employer)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_list_is_cached_with_etag(self):
+        first = self.client.get('/api/jobs/')
+        second = self.client.get('/api/jobs/')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertEqual(first.content, second.content)
+
+    def test_if_none_match_returns_304(self):
+        etag = self.client.get(f'/api/jobs/{self.job.pk}/')['ETag']
+        response = self.client.get(f'/api/jobs/{self.job.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_saving_a_job_invalidates_the_cache(self):
+        etag = self.client.get('/api/jobs/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.job.title = 'Senior Python Developer'
+            self.job.save()
+        response = self.client.get('/api/jobs/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['results'][0]['title'], 'Senior Python Developer')
+
+
+class KeysetPaginationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        employer = create_employer()
+        jobs = [create_job(employer, title=f'Python Developer {i}') for i in range(25)]
+        # Ties on created_at are broken by id
+        Job.objects.filter(pk__in=[job.pk for job in jobs[5:15]]).update(created_at=jobs[5].created_at)
+        cls.expected = list(Job.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cursor_pages_cover_every_job_once_in_order(self):
+        self.assertEqual(read_pages(self.client, '/api/jobs/?page_size=7'), self.expected)
+
+    def test_invalid_cursor_is_not_found(self):
+        self.assertEqual(self.client.get('/api/jobs/?cursor=bm9wZQ').status_code, 404)
+
+    def test_invalid_search_cursor_is_not_found(self):
+        for position in ({'o': -5}, {'o': 'x'}, {'o': True}, [1]):
+            with self.subTest(position=position):
+                url = f'/api/jobs/?q=python&cursor={encode_cursor(position)}'
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_search_pages_cover_every_match(self):
+        ids = read_pages(self.client, '/api/jobs/?q=python+developer&page_size=7')
+        self.assertEqual(sorted(ids), sorted(self.expected))
+
+    def test_expired_jobs_are_hidden(self):
+        expired = Job.objects.get(pk=self.expected[0])
+        Job.objects.filter(pk=expired.pk).update(deadline=timezone.now() - timedelta(days=1))
+        self.assertEqual(read_pages(self.client, '/api/jobs/'), self.expected[1:])
+
+
+class SearchTests(APITestCase):
+    def setUp(self):
+        # The corpus statistics are cached
+        cache.clear()
+        self.employer = create_employer()
+
+    def search(self, query):
+        response = self.client.get('/api/jobs/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [job['title'] for job in response.json()['results']]
+
+    def create_job(self, title, description):
+        return create_job(self.employer, title=title, description=description)
+
+    def test_title_and_term_frequency_rank_first(self):
+        self.create_job('Backend Developer', 'Kafka now and then')
+        self.create_job('Data Engineer', 'Kafka streams, Kafka connect and Kafka topics')
+        self.create_job('Kafka Engineer', 'Streaming pipelines')
+        self.create_job('Frontend Developer', 'React')
+        self.assertEqual(self.search('kafka'), ['Kafka Engineer', 'Data Engineer', 'Backend Developer'])
+        self.assertEqual(self.search('kafka react'), [
+            'Frontend Developer', 'Kafka Engineer', 'Data Engineer', 'Backend Developer',
+        ])
+        self.assertEqual(self.search('cobol'), [])
+
+    def test_saved_and_deleted_jobs_are_reindexed(self):
+        job = self.create_job('Backend Developer', 'Kafka pipelines')
+        self.assertEqual(self.search('kafka'), ['Backend Developer'])
+        with self.captureOnCommitCallbacks(execute=True):
+            job.description = 'Spark pipelines'
+            job.save()
+        self.assertEqual(self.search('kafka'), [])
+        self.assertEqual(self.search('spark'), ['Backend Developer'])
+        with self.captureOnCommitCallbacks(execute=True):
+            job.delete()
+        self.assertEqual(self.search('spark'), [])
+        self.assertFalse(JobSearchPosting.objects.exists())
+
+
+class FacetTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.acme = create_employer()
+        cls.globex = create_employer('globex@example.com')
+        create_job(cls.acme, location='Remote')
+        create_job(cls.acme, location=' remote', job_type='PART_TIME')
+        create_job(cls.acme, location='Berlin', job_type='PART_TIME')
+        create_job(cls.globex, location='Berlin')
+        create_job(cls.globex, location='Remote', deadline=timezone.now() - timedelta(days=1))
+
+    def setUp(self):
+        cache.clear()
+
+    def facets(self, **params):
+        response = self.client.get('/api/jobs/facets/', params)
+        self.assertEqual(response.status_code, 200)
+        return {
+            facet: {row['value']: row['count'] for row in rows}
+            for facet, rows in response.json().items()
+        }
+
+    def test_counts_open_jobs_per_facet(self):
+        self.assertEqual(self.facets(), {
+            'job_type': {'FULL_TIME': 2, 'PART_TIME': 2},
+            'location': {'remote': 2, 'berlin': 2},
+            'company': {self.acme.pk: 3, self.globex.pk: 1},
+        })
+
+    def test_each_facet_ignores_only_its_own_filter(self):
+        self.assertEqual(self.facets(job_type='PART_TIME', location='berlin'), {
+            'job_type': {'FULL_TIME': 1, 'PART_TIME': 1},
+            'location': {'remote': 1, 'berlin': 1},
+            'company': {self.acme.pk: 1},
+        })
+
+    def test_search_narrows_every_facet(self):
+        create_job(self.globex, title='Kafka Engineer', location='Remote', job_type='CONTRACT')
+        self.assertEqual(self.facets(q='kafka'), {
+            'job_type': {'CONTRACT': 1},
+            'location': {'remote': 1},
+            'company': {self.globex.pk: 1},
+        })
+
+
+class SparseFieldsTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = create_employer()
+        job = create_job(cls.employer)
+        JobApplication.objects.create(job=job, applicant=create_employee(), cover_letter='Hello')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.employer)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), ' '.join(query['sql'] for query in queries)
+
+    def test_fields_narrow_the_output_and_the_columns(self):
+        jobs, sql = self.get('/api/jobs/?fields=id,title,company_name')
+        self.assertEqual(set(jobs['results'][0]), {'id', 'title', 'company_name'})
+        self.assertNotIn('"description"', sql)
+        self.assertIn('"company_name"', sql)
+
+        jobs, sql = self.get('/api/jobs/')
+        self.assertIn('description', jobs['results'][0])
+        self.assertIn('"description"', sql)
+
+    def test_nested_jobs_are_lean_unless_expanded(self):
+        applications, sql = self.get('/api/applications/?fields=id,job')
+        self.assertEqual(set(applications[0]), {'id', 'job'})
+        self.assertNotIn('description', applications[0]['job'])
+        self.assertNotIn('"cover_letter"', sql)
+
+        applications, sql = self.get('/api/applications/?fields=id,job&expand=job')
+        self.assertIn('description', applications[0]['job'])
+
+    def test_unknown_fields_are_rejected(self):
+        for url in ('/api/jobs/?fields=id,salary', '/api/applications/?fields=id,password'):
+            with self.subTest(url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('fields', response.json())
+
+
+class RecommendationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        recommend.reset_matrix()
+        self.addCleanup(recommend.reset_matrix)
+        employer = create_employer()
+        self.android = create_job(employer, title='Android Developer', requirements='Kotlin, Android SDK')
+        self.backend = create_job(employer, title='Backend Developer', requirements='Python, Django')
+        # Expired, so never recommended however well it matches
+        expired = timezone.now() - timedelta(days=1)
+        create_job(employer, title='Kotlin Developer', requirements='Kotlin', deadline=expired)
+        self.employee = create_employee()
+        EmployeeProfile.objects.create(
+            user=self.employee, resume='resumes/cv.doc', degree='degrees/cv.doc',
+            skills='Kotlin, Android', experience='Mobile apps', phone='1234567890'
+        )
+        self.client.force_authenticate(self.employee)
+
+    def recommended(self):
+        response = self.client.get('/api/jobs/recommended/')
+        self.assertEqual(response.status_code, 200)
+        return [job['id'] for job in response.json()['results']]
+
+    def test_matching_skills_rank_first(self):
+        self.assertEqual(self.recommended()[0], self.android.pk)
+
+    def test_serves_the_saved_matrix(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with override_settings(RECOMMENDATION_MATRIX_PATH=os.path.join(directory, 'matrix.npz')):
+            recommend.build_artifact()
+            recommend.reset_matrix()
+            # Jobs saved after the artifact come from the change log
+            with self.captureOnCommitCallbacks(execute=True):
+                mobile = create_job(self.android.employer, title='Mobile Developer', requirements='Kotlin, Android')
+            with mock.patch.object(recommend.JobMatrix, 'from_database') as from_database:
+                self.assertEqual(set(self.recommended()[:2]), {self.android.pk, mobile.pk})
+            from_database.assert_not_called()
+
+    def test_rebuilds_in_the_background_when_changes_are_lost(self):
+        matrix = recommend.get_matrix()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.backend.requirements = 'Kotlin, Android'
+            self.backend.save()
+        cache.delete(recommend.CHANGE_KEY.format(recommend.current_sequence()))
+        with mock.patch.object(recommend, 'defer') as defer:
+            self.assertIs(recommend.get_matrix(), matrix)
+            self.assertIs(recommend.get_matrix(), matrix)
+        defer.assert_called_once_with(recommend.rebuild)
+
+        recommend.rebuild()
+        self.assertIsNot(recommend.get_matrix(), matrix)
+        self.assertIn(self.backend.pk, self.recommended()[:2])
+
+
+class AsyncViewTests(APITestCase):
+    """The async views (ASYNC_VIEWS) answer exactly as the sync views do."""
+    urlconfs = (jobs_urls, accounts_urls, core_urls)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.job = create_job(create_employer())
+        cls.employee = create_employee()
+        EmployeeProfile.objects.create(
+            user=cls.employee, resume='resumes/cv.doc', degree='degrees/cv.doc',
+            skills='Python', experience='', phone='1234567890'
+        )
+
+    def load_urlconfs(self):
+        # ASYNC_VIEWS is read when the URLconfs are imported
+        for module in self.urlconfs:
+            importlib.reload(module)
+        clear_url_caches()
+
+    @contextmanager
+    def async_views(self, served):
+        def spy(handler):
+            async def serve(view, request):
+                try:
+                    response = await handler(view, request)
+                except Exception:
+                    served.append(True)
+                    raise
+                served.append(response is not None)
+                return response
+            return serve
+
+        # The sync URLconfs are reloaded after the test, once ASYNC_VIEWS is restored
+        self.addCleanup(self.load_urlconfs)
+        with override_settings(ASYNC_VIEWS=True), \
+                mock.patch.dict(job_handlers, {name: spy(h) for name, h in job_handlers.items()}), \
+                mock.patch.dict(account_handlers, {name: spy(h) for name, h in account_handlers.items()}):
+            self.load_urlconfs()
+            yield
+
+    def assert_same_response(self, url, authorization=None, handled=True):
+        headers = {'Authorization': authorization} if authorization else {}
+        cache.clear()
+        expected = self.client.get(url, headers=headers)
+        cache.clear()
+        served = []
+        with self.async_views(served):
+            self.assertTrue(iscoroutinefunction(resolve(urlsplit(url).path).func))
+            response = async_to_sync(AsyncClient().get)(url, headers=headers)
+        # The handler answered rather than passing the request to the sync view
+        self.assertEqual(served, [True] if handled else [])
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.content, expected.content)
+        for header in ('Content-Type', 'ETag', 'Vary', 'WWW-Authenticate'):
+            self.assertEqual(response.get(header), expected.get(header), header)
+        return response
+
+    def test_job_reads(self):
+        urls = ('/api/jobs/', '/api/jobs/?job_type=FULL_TIME', f'/api/jobs/{self.job.pk}/', '/api/jobs/facets/')
+        for url in urls:
+            with self.subTest(url):
+                self.assertEqual(self.assert_same_response(url).status_code, 200)
+
+    def test_missing_job(self):
+        self.assertEqual(self.assert_same_response(f'/api/jobs/{self.job.pk + 1}/').status_code, 404)
+
+    def test_profile(self):
+        token = f'Bearer {CustomTokenObtainPairSerializer.get_token(self.employee).access_token}'
+        response = self.assert_same_response('/api/accounts/profile/', token)
+        self.assertEqual(response.json()['username'], self.employee.username)
+
+    def test_invalid_token(self):
+        # Refused before the handler runs
+        response = self.assert_same_response('/api/accounts/profile/', 'Bearer nope', handled=False)
+        self.assertEqual(response.status_code, 401)
+
+    def test_views_overriding_initial_stay_sync(self):
+        class AuditedJobViewSet(JobViewSet):
+            def initial(self, request, *args, **kwargs):
+                super().initial(request, *args, **kwargs)
+
+        view = AuditedJobViewSet.as_view({'get': 'list'})
+        self.assertIs(async_view(view, job_handlers['job-list']), view)
+
+
+class BulkUpdateStatusTests(APITestCase):
+    url = '/api/applications/bulk_update_status/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = create_employer()
+        job = create_job(cls.employer)
+        other_job = create_job(create_employer('other@example.com'))
+        cls.application = JobApplication.objects.create(job=job, applicant=create_employee(), cover_letter='Hello')
+        cls.other_application = JobApplication.objects.create(
+            job=other_job, applicant=create_employee('applicant'), cover_letter='Hello'
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.employer)
+
+    def test_updates_own_applications_only(self):
+        response = self.client.post(self.url, {
+            'status': 'ACCEPTED', 'ids': [self.application.pk, self.other_application.pk],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [
+            {'id': self.application.pk, 'result': 'updated'},
+            {'id': self.other_application.pk, 'result': 'not_found'},
+        ])
+        self.application.refresh_from_db()
+        self.other_application.refresh_from_db()
+        self.assertEqual(self.application.status, 'ACCEPTED')
+        self.assertEqual(self.other_application.status, 'PENDING')
+
+    def test_non_integer_ids_are_rejected(self):
+        for ids in ([self.application.pk + 0.5], ['x'], [True], [], None, str(self.application.pk)):
+            with self.subTest(ids=ids):
+                response = self.client.post(self.url, {'status': 'ACCEPTED', 'ids': ids}, format='json')
+                self.assertEqual(response.status_code, 400)
+        self.application.refresh_from_db()
+        self.assertEqual(self.application.status, 'PENDING')
+
+
+class RecentApplicationsTests(APITestCase):
+    def test_newest_applications_of_the_employer(self):
+        employer = create_employer()
+        job = create_job(employer)
+        create_job(create_employer('other@example.com'))
+        applications = [
+            JobApplication.objects.create(job=job, applicant=create_employee(f'employee-{i}'), cover_letter='Hello')
+            for i in range(4)
+        ]
+        self.client.force_authenticate(employer)
+        response = self.client.get('/api/applications/recent/?limit=3')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.json()], [a.pk for a in applications[::-1][:3]])
+        self.assertEqual(self.client.get('/api/applications/recent/?limit=x').status_code, 400)
+
+
+class ApplyTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = create_employer()
+        cls.job = create_job(cls.employer)
+        cls.other_job = create_job(cls.employer, title='Data Engineer')
+        cls.employee = create_employee()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.employee)
+
+    def apply(self, job, key=None):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        return self.client.post(f'/api/jobs/{job.pk}/apply/', {'cover_letter': 'Hello'}, format='json', **headers)
+
+    def test_apply_is_a_single_insert(self):
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.apply(self.job).status_code, 200)
+        # Leaving out the savepoint the test case's transaction needs
+        statements = [query['sql'] for query in context if 'SAVEPOINT' not in query['sql']]
+        self.assertEqual(len(statements), 1)
+        self.assertTrue(statements[0].startswith('INSERT'))
+
+    def test_second_application_is_rejected(self):
+        self.apply(self.job)
+        self.assertEqual(self.apply(self.job).status_code, 400)
+        self.assertEqual(JobApplication.objects.filter(job=self.job, applicant=self.employee).count(), 1)
+
+    def test_retry_with_the_same_key_succeeds(self):
+        first = self.apply(self.job, key='key-1')
+        retry = self.apply(self.job, key='key-1')
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.json()['id'], first.json()['id'])
+
+    def test_key_is_matched_before_the_job(self):
+        # This job already has an application under another key, and the
+        # key was used for another job: the key reuse is what is reported
+        self.apply(self.job, key='key-1')
+        self.apply(self.other_job, key='key-2')
+        self.assertEqual(self.apply(self.job, key='key-2').status_code, 422)
+        self.assertEqual(self.apply(self.job, key='key-3').status_code, 400)
+
+    def test_applying_refreshes_the_employer_stats(self):
+        self.client.force_authenticate(self.employer)
+        self.assertEqual(self.client.get('/api/applications/stats/').json()['totals']['total'], 0)
+        self.client.force_authenticate(self.employee)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.apply(self.job)
+        self.client.force_authenticate(self.employer)
+        self.assertEqual(self.client.get('/api/applications/stats/').json()['totals']['total'], 1)
+
+
+class ApplyConcurrencyTests(TransactionTestCase):
+    """Concurrent applies, each on its own connection, are recorded exactly once."""
+    requests = 20
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('In-memory SQLite fails concurrent writers instead of making them wait')
+        cache.clear()
+        self.job = create_job(create_employer())
+        self.employees = [create_employee(f'employee-{i}') for i in range(self.requests)]
+
+    def fire(self, calls):
+        def apply(call):
+            user, key = call
+            client = APIClient()
+            client.force_authenticate(user)
+            headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+            try:
+                return client.post(
+                    f'/api/jobs/{self.job.pk}/apply/', {'cover_letter': 'Hello'}, format='json', **headers
+                ).status_code
+            finally:
+                close_old_connections()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            return Counter(executor.map(apply, calls))
+
+    def test_duplicate_clicks(self):
+        statuses = self.fire([(self.employees[0], None)] * self.requests)
+        self.assertEqual(statuses, Counter({200: 1, 400: self.requests - 1}))
+        self.assertEqual(JobApplication.objects.filter(applicant=self.employees[0]).count(), 1)
+
+    def test_idempotent_retries(self):
+        statuses = self.fire([(self.employees[0], uuid.uuid4().hex)] * self.requests)
+        self.assertEqual(statuses, Counter({200: self.requests}))
+        self.assertEqual(JobApplication.objects.filter(applicant=self.employees[0]).count(), 1)
+
+    def test_unknown_job_is_not_found(self):
+        # Outside a test transaction, so the foreign key is checked at once
+        client = APIClient()
+        client.force_authenticate(self.employees[0])
+        self.assertEqual(client.post('/api/jobs/0/apply/', {}, format='json').status_code, 404)
+
+    def test_distinct_applicants(self):
+        statuses = self.fire([(employee, None) for employee in self.employees])
+        self.assertEqual(statuses, Counter({200: self.requests}))
+        self.assertEqual(JobApplication.objects.filter(job=self.job).count(), self.requests)
+
+
+class ImportJobsTests(APITestCase):
+    csv = (
+        'title,description,requirements,salary_range,location,job_type,deadline\n'
+        'Python Developer,Django APIs,Python,1,Remote,FULL_TIME,2099-01-01T00:00:00\n'
+        'Data Engineer,Pipelines,SQL,1,Remote,CONTRACT,2099-01-01T00:00:00\n'
+    )
+
+    def setUp(self):
+        self.employer = create_employer()
+        # A job of the same employer that was never indexed
+        self.unindexed = Job.objects.bulk_create([Job(
+            title='Old Job', description='Old', requirements='Old', salary_range='1', location='Remote',
+            job_type='FULL_TIME', deadline=timezone.now() + timedelta(days=1), employer=self.employer
+        )])[0]
+        self.client.force_authenticate(self.employer)
+
+    def import_jobs(self):
+        response = self.client.generic('POST', '/api/jobs/import/', self.csv, content_type='text/csv')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 2)
+
+    def assert_indexed_the_batch_only(self):
+        indexed = set(JobSearchDocument.objects.values_list('job__title', flat=True))
+        self.assertEqual(indexed, {'Python Developer', 'Data Engineer'})
+
+    def test_indexes_the_inserted_jobs(self):
+        self.import_jobs()
+        self.assert_indexed_the_batch_only()
+
+    def test_indexes_the_inserted_jobs_without_returned_ids(self):
+        # As on MySQL, where bulk_create leaves the primary keys unset
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            self.import_jobs()
+        self.assert_indexed_the_batch_only()
+
+
+class ArchivedJobsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_moves_long_expired_jobs_in_batches(self):
+        employer = create_employer()
+        long_ago = timezone.now() - archive.ARCHIVE_AFTER - timedelta(days=1)
+        archived = [create_job(employer, title=f'Cobol Developer {i}', deadline=long_ago) for i in range(3)]
+        recent = create_job(employer, title='Cobol Developer', deadline=timezone.now() - timedelta(days=1))
+        open_job = create_job(employer)
+        applications = [
+            JobApplication.objects.create(job=job, applicant=create_employee(f'employee-{i}'), cover_letter='Hello')
+            for i, job in enumerate([archived[0], archived[0], recent])
+        ]
+
+        with mock.patch.object(archive, 'archive_jobs', wraps=archive.archive_jobs) as archive_jobs, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(archive.archive_expired(batch_size=2), (3, 2))
+        self.assertEqual(archive_jobs.call_count, 2)
+
+        archived_ids = {job.pk for job in archived}
+        self.assertEqual(set(Job.objects.values_list('pk', flat=True)), {recent.pk, open_job.pk})
+        self.assertEqual(set(ArchivedJob.objects.values_list('pk', flat=True)), archived_ids)
+        self.assertEqual(
+            set(ArchivedJobApplication.objects.values_list('pk', flat=True)), {a.pk for a in applications[:2]}
+        )
+        self.assertEqual(list(JobApplication.objects.values_list('pk', flat=True)), [applications[2].pk])
+        self.assertFalse(JobSearchPosting.objects.filter(job_id__in=archived_ids).exists())
+        self.assertFalse(JobSearchDocument.objects.filter(job_id__in=archived_ids).exists())
+        self.assertTrue(JobSearchPosting.objects.filter(job=recent, term='cobol').exists())
+
+        response = self.client.get('/api/jobs/?archived=true')
+        self.assertEqual({job['id'] for job in response.json()['results']}, archived_ids)
+        response = self.client.get(f'/api/jobs/{archived[0].pk}/?archived=true')
+        self.assertEqual(response.json()['title'], archived[0].title)
+        self.assertEqual(self.client.get(f'/api/jobs/{archived[0].pk}/').status_code, 404)
+
+    def test_search_is_rejected(self):
+        self.assertEqual(self.client.get('/api/jobs/?archived=1').status_code, 200)
+        self.assertEqual(self.client.get('/api/jobs/?archived=1&q=python').status_code, 400)
+
+
+@override_settings(REPLICA_DATABASES=['replica_0'])
+class ReplicaRouterTests(SimpleTestCase):
+    """
+    The routing decisions on their own, so they are tested without a
+    replica configured (ReplicaRoutingTests covers a real one).
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User(pk=1, username='writer', role='EMPLOYER')
+
+    def job_view(self, method, action='list', user=None):
+        request = Request(getattr(APIRequestFactory(), method)('/api/jobs/'))
+        request.user = user or AnonymousUser()
+        view = JobViewSet(action=action, request=request, args=(), kwargs={}, format_kwarg=None)
+        return view, request
+
+    def test_reads_follow_the_request_replica_outside_transactions(self):
+        router = replicas.ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Job))
+        token = replicas._replica.set('replica_0')
+        self.addCleanup(replicas._replica.reset, token)
+        self.assertEqual(router.db_for_read(Job), 'replica_0')
+        with mock.patch.object(connection, 'in_atomic_block', True):
+            self.assertIsNone(router.db_for_read(Job))
+        self.assertEqual(router.db_for_write(Job), DEFAULT_DB_ALIAS)
+
+    def test_viewsets_use_a_replica_for_safe_replica_actions(self):
+        self.assertTrue(JobViewSet.uses_replica(*self.job_view('get')))
+        self.assertFalse(JobViewSet.uses_replica(*self.job_view('post', 'create')))
+        self.assertFalse(JobViewSet.uses_replica(*self.job_view('get', 'recommended')))
+        with override_settings(REPLICA_DATABASES=[]):
+            self.assertFalse(JobViewSet.uses_replica(*self.job_view('get')))
+
+    def test_pinned_users_read_from_the_primary(self):
+        view, request = self.job_view('get', user=self.user)
+        self.addCleanup(view.release_replica)
+        with mock.patch.object(APIView, 'initial'):
+            view.initial(request)
+            self.assertEqual(replicas.current_replica(), 'replica_0')
+            view.release_replica()
+            self.assertIsNone(replicas.current_replica())
+
+            replicas.pin(self.user.pk)
+            view.initial(request)
+            self.assertIsNone(replicas.current_replica())
+
+    def test_successful_writes_pin_the_writer(self):
+        cases = [
+            ('post', self.user, 201, True),
+            ('delete', self.user, 204, True),
+            ('post', self.user, 400, False),
+            ('get', self.user, 200, False),
+            ('post', AnonymousUser(), 201, False),
+        ]
+        for method, user, status, pinned in cases:
+            with self.subTest(method=method, status=status, user=user):
+                cache.clear()
+                request = getattr(RequestFactory(), method)('/api/jobs/')
+                request.user = user
+                replicas.ReplicaPinMiddleware(lambda request: HttpResponse(status=status))(request)
+                self.assertEqual(replicas.is_pinned(self.user.pk), pinned)
+
+        request = RequestFactory().post('/api/jobs/')
+        request.user = self.user
+        with override_settings(REPLICA_DATABASES=[]):
+            self.assertIsNone(replicas.ReplicaPinMiddleware(None).writer(request, HttpResponse(status=201)))
+
+
+@unittest.skipUnless(settings.REPLICA_DATABASES, 'No replica is configured; set DATABASE_REPLICA_HOSTS')
+class ReplicaRoutingTests(APITransactionTestCase):
+    """
+    Replicas mirror the primary in tests (TEST MIRROR), so every alias sees
+    the same rows and only the queries tell where a request read from.
+    Reads inside a transaction stay on the primary, hence a transaction
+    test case.
+    """
+    databases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+
+    def setUp(self):
+        cache.clear()
+        self.employer = create_employer()
+        self.client.force_authenticate(self.employer)
+
+    def queries(self, request):
+        # Queries per database: (primary, replicas)
+        with ExitStack() as stack:
+            contexts = [
+                stack.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in [DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES]
+            ]
+            response = request()
+        self.assertLess(response.status_code, 400)
+        return len(contexts[0]), sum(len(context) for context in contexts[1:])
+
+    def test_reads_go_to_a_replica(self):
+        for url in ('/api/jobs/', '/api/jobs/my_jobs/', '/api/applications/stats/'):
+            with self.subTest(url):
+                primary, replica = self.queries(lambda: self.client.get(url))
+                self.assertEqual(primary, 0)
+                self.assertGreater(replica, 0)
+
+    def test_writer_reads_from_the_primary_until_the_pin_expires(self):
+        job = {
+            'title': 'Replica check', 'description': 'Check', 'requirements': 'Check',
+            'salary_range': '1', 'location': 'Remote', 'job_type': 'FULL_TIME',
+            'deadline': (timezone.now() + timedelta(days=1)).isoformat(),
+        }
+        self.assertEqual(self.queries(lambda: self.client.post('/api/jobs/', job, format='json'))[1], 0)
+        primary, replica = self.queries(lambda: self.client.get('/api/jobs/my_jobs/'))
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+        cache.delete(replicas.PIN_KEY.format(self.employer.pk))
+        primary, replica = self.queries(lambda: self.client.get('/api/jobs/my_jobs/'))
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
@@ -1,12 +1,19 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from core.async_views import async_patterns
+from .async_views import HANDLERS
 from .views import JobViewSet, JobApplicationViewSet
 
 router = DefaultRouter()
 router.register(r'jobs', JobViewSet, basename='job')
 router.register(r'applications', JobApplicationViewSet, basename='job-application')
 
+router_urls = router.urls
+if settings.ASYNC_VIEWS:
+    router_urls = async_patterns(router_urls, HANDLERS)
+
 urlpatterns = [
-    path('', include(router.urls)),
+    path('', include(router_urls)),
     # Add any custom job URLs here
 ] 
\ No newline at end of file
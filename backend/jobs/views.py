@@ -1,38 +1,199 @@
-from rest_framework import viewsets, status, permissions
+from rest_framework import viewsets, status, permissions, serializers
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
-from django.db.models import Q
-from .models import Job, JobApplication
-from .serializers import JobSerializer, JobApplicationSerializer
-from accounts.models import User, CompanyProfile
+from rest_framework.settings import api_settings
+from datetime import timedelta
+from functools import cached_property
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q
+from django.db.models.functions import Lower, Trim
+from django.utils import timezone
+from .models import Job, JobApplication, ArchivedJob, ArchivedJobApplication
+from .serializers import (
+    JobSerializer, JobApplicationSerializer, ArchivedJobSerializer, ArchivedJobApplicationSerializer
+)
+from .pagination import KeysetPagination, iterate_keyset
+from .renderers import CSVRenderer, NDJSONRenderer, stream_csv, stream_ndjson
+from . import bulk, cache, recommend, search
+from accounts.models import User, EmployeeProfile, CompanyProfile
+from core.projection import ProjectionMixin
+from core.replicas import ReplicaReadMixin
+from core.serializers import SparseQuerysetMixin
 
-class JobViewSet(viewsets.ModelViewSet):
+FACET_LIMIT = 50
+MAX_BULK_UPDATE = 1000
+RECOMMENDATION_LIMIT = 20
+MAX_RECOMMENDATION_LIMIT = 100
+RECENT_APPLICATION_LIMIT = 5
+MAX_RECENT_APPLICATION_LIMIT = 50
+IDEMPOTENCY_KEY_MAX_LENGTH = 64
+ARCHIVE_ACTIONS = ('list', 'retrieve')
+APPLICATION_STATUSES = {value for value, _ in JobApplication.STATUS_CHOICES}
+APPLICATION_IDS = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+
+
+def flag(request, name):
+    return request.query_params.get(name) in ('1', 'true')
+
+
+def insert_application(**fields):
+    # A failed INSERT inside a transaction has to roll back to a savepoint;
+    # in autocommit mode (a normal request) it needs no transaction at all
+    if transaction.get_connection().in_atomic_block:
+        with transaction.atomic():
+            return JobApplication.objects.create(**fields)
+    return JobApplication.objects.create(**fields)
+
+class JobViewSet(ReplicaReadMixin, ProjectionMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     serializer_class = JobSerializer
-    
+    sparse_required_fields = ('created_at',)
+    pagination_class = KeysetPagination
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
+    projection_actions = ('list', 'retrieve', 'export')
+    # Not recommended: the recommendation change log can be ahead of a replica
+    replica_actions = ('list', 'retrieve', 'facets', 'my_jobs', 'export')
+    search_query = None
+
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'recommended', 'import_jobs', 'export']:
             permission_classes = [permissions.IsAuthenticated]
         else:
             permission_classes = [permissions.AllowAny]
         return [permission() for permission in permission_classes]
 
-    def get_queryset(self):
-        queryset = Job.objects.all()
-        
-        # Apply filters
+    @cached_property
+    def archived(self):
+        # ?archived=1 reads the archive tables instead, for list and retrieve
+        return self.action in ARCHIVE_ACTIONS and flag(self.request, 'archived')
+
+    @cached_property
+    def open_after(self):
+        # Listings leave out expired jobs unless ?include_expired=1. Rounded
+        # down to the minute so cached listings can be keyed on it
+        if self.action not in ('list', 'facets') or self.archived or flag(self.request, 'include_expired'):
+            return None
+        return timezone.now().replace(second=0, microsecond=0)
+
+    def get_serializer_class(self):
+        return ArchivedJobSerializer if self.archived else JobSerializer
+
+    def filter_jobs(self, queryset, skip=None):
+        # Apply filters; ``skip`` leaves one out so facet counts for that
+        # filter reflect every other active filter
         job_type = self.request.query_params.get('job_type', None)
         location = self.request.query_params.get('location', None)
-        
-        if job_type:
+
+        if self.open_after is not None:
+            queryset = queryset.filter(deadline__gte=self.open_after)
+        if job_type and skip != 'job_type':
             queryset = queryset.filter(job_type=job_type)
-        if location:
+        if location and skip != 'location':
             queryset = queryset.filter(location__icontains=location)
+        return queryset
+
+    def get_queryset(self):
+        model = ArchivedJob if self.archived else Job
+        queryset = self.filter_jobs(model.objects.select_related('employer__companyprofile'))
+        query = self.request.query_params.get('q', None)
             
         # For update/delete operations, only show user's own jobs
         if self.action in ['update', 'partial_update', 'destroy']:
             return queryset.filter(employer=self.request.user)
-            
-        return queryset.order_by('-created_at')
+
+        # Full-text search results are ordered by relevance instead of date;
+        # archived jobs are not in the search index, see list()
+        if query and self.action == 'list' and not self.archived:
+            self.search_query = query
+            return search.search_jobs(queryset, query)
+
+        return queryset.order_by('-created_at', '-id')
+
+    def list(self, request, *args, **kwargs):
+        if self.archived and request.query_params.get('q'):
+            return Response(
+                {'error': 'Archived jobs cannot be searched'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        # ?format=ndjson (or Accept: application/x-ndjson) streams every
+        # matching job instead of returning a single page
+        if request.accepted_renderer.format == NDJSONRenderer.format:
+            return stream_ndjson(*self.streamed_rows(), request=request)
+        return cache.cached_response(
+            self, request, lambda: super(JobViewSet, self).list(request, *args, **kwargs), vary=self.open_after
+        )
+
+    def streamed_rows(self, **filters):
+        # Every matching job, fetched a chunk at a time, and the function
+        # that serializes a batch of them
+        projection = self.get_projection()
+        if projection is not None:
+            queryset = self.projected_queryset(projection).filter(**filters)
+            serialize = projection.represent_many
+        else:
+            queryset = self.filter_queryset(self.get_queryset()).filter(**filters)
+            serialize = lambda batch: self.get_serializer(batch, many=True).data
+        # Streamed after the view returns, so bind the database chosen now
+        queryset = queryset.using(queryset.db)
+        rows = queryset.iterator() if self.search_query else iterate_keyset(queryset)
+        return rows, serialize
+
+    def retrieve(self, request, *args, **kwargs):
+        return cache.cached_response(self, request, lambda: super(JobViewSet, self).retrieve(request, *args, **kwargs))
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        return cache.cached_response(self, request, lambda: Response(self.facet_counts()), vary=self.open_after)
+
+    def facet_counts(self):
+        return self.facet_payload(*(list(queryset) for queryset in self.facet_querysets()))
+
+    def facet_querysets(self):
+        # One GROUP BY per facet, each ignoring its own filter
+        def base(skip=None):
+            queryset = self.filter_jobs(Job.objects.order_by(), skip=skip)
+            query = self.request.query_params.get('q', None)
+            if query:
+                queryset = queryset.filter(pk__in=search.matching_jobs(query))
+            return queryset
+
+        job_types = (
+            base(skip='job_type')
+            .values('job_type')
+            .annotate(count=Count('pk'))
+            .order_by('-count', 'job_type')
+        )
+        locations = (
+            base(skip='location')
+            .annotate(value=Lower(Trim('location')))
+            .values('value')
+            .annotate(count=Count('pk'))
+            .order_by('-count', 'value')[:FACET_LIMIT]
+        )
+        companies = (
+            base()
+            .values('employer_id', 'employer__companyprofile__company_name')
+            .annotate(count=Count('pk'))
+            .order_by('-count', 'employer_id')[:FACET_LIMIT]
+        )
+        return job_types, locations, companies
+
+    def facet_payload(self, job_types, locations, companies):
+        job_type_labels = dict(Job.JOB_TYPES)
+        return {
+            'job_type': [
+                {'value': row['job_type'], 'label': job_type_labels.get(row['job_type'], row['job_type']), 'count': row['count']}
+                for row in job_types
+            ],
+            'location': [
+                {'value': row['value'], 'count': row['count']}
+                for row in locations if row['value']
+            ],
+            'company': [
+                {'value': row['employer_id'], 'label': row['employer__companyprofile__company_name'], 'count': row['count']}
+                for row in companies
+            ],
+        }
 
     def create(self, request, *args, **kwargs):
         # Check if user is authenticated
@@ -73,49 +234,155 @@ class JobViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def my_jobs(self, request):
-        jobs = self.get_queryset().filter(employer=request.user)
+        jobs = self.filter_queryset(self.get_queryset()).filter(employer=request.user)
         serializer = self.get_serializer(jobs, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_jobs(self, request):
+        # CSV or NDJSON in the request body, read as it arrives
+        if request.user.role != 'EMPLOYER':
+            return Response(
+                {'error': 'Only employers can post jobs'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        if not CompanyProfile.objects.filter(user=request.user).exists():
+            return Response(
+                {'error': 'Please create a company profile before posting jobs'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        try:
+            summary = bulk.import_jobs(
+                request.stream, request.content_type, request.user, self.get_serializer(),
+                skip_invalid=flag(request, 'skip_invalid')
+            )
+        except bulk.BulkImportError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if summary['error_count'] and not summary['created']:
+            return Response(summary, status=status.HTTP_400_BAD_REQUEST)
+        return Response(summary, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'], renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        # The employer's jobs as CSV (default) or ?format=ndjson, streamed
+        if request.user.role != 'EMPLOYER':
+            return Response(
+                {'error': 'Only employers can export jobs'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        rows, serialize = self.streamed_rows(employer=request.user)
+        if request.accepted_renderer.format == NDJSONRenderer.format:
+            return stream_ndjson(rows, serialize, request)
+        return stream_csv(rows, serialize, list(self.get_serializer().fields), request)
+
+    @action(detail=False, methods=['get'])
+    def recommended(self, request):
+        # Open jobs ranked by how well they match the employee's skills and
+        # experience, leaving out jobs they have already applied for
+        if request.user.role != 'EMPLOYEE':
+            return Response(
+                {'error': 'Only employees can get job recommendations'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        try:
+            limit = int(request.query_params.get('limit', RECOMMENDATION_LIMIT))
+        except ValueError:
+            return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, MAX_RECOMMENDATION_LIMIT))
+
+        profile = EmployeeProfile.objects.filter(user=request.user).values('skills', 'experience').first()
+        if profile is None:
+            return Response({'results': []})
+        applied = set(
+            JobApplication.objects.filter(applicant=request.user).values_list('job_id', flat=True)
+        )
+        ranked = recommend.recommend(profile, limit, exclude=applied)
+
+        jobs = self.filter_queryset(self.get_queryset()).in_bulk([job_id for job_id, _ in ranked])
+        results = []
+        for job_id, score in ranked:
+            # Jobs deleted since the matrix was last synced are skipped
+            if job_id in jobs:
+                data = self.get_serializer(jobs[job_id]).data
+                data['score'] = round(score, 4)
+                results.append(data)
+        return Response({'results': results})
+
     @action(detail=True, methods=['post'])
     def apply(self, request, pk=None):
-        job = self.get_object()
-        
         # Check if user is an employee
         if request.user.role != 'EMPLOYEE':
             return Response(
                 {'error': 'Only employees can apply for jobs'}, 
                 status=status.HTTP_403_FORBIDDEN
             )
-            
-        # Check if already applied
-        if JobApplication.objects.filter(job=job, applicant=request.user).exists():
+        try:
+            job_id = int(pk)
+        except ValueError:
+            raise NotFound()
+        key = request.headers.get('Idempotency-Key') or None
+        if key is not None and len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return Response(
+                {'error': f'Idempotency-Key must be at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # A single INSERT: the unique (job, applicant) constraint rejects
+        # repeat applications and the foreign key unknown jobs, so the job
+        # is only looked up when the insert fails
+        try:
+            application = insert_application(
+                job_id=job_id,
+                applicant=request.user,
+                cover_letter=request.data.get('cover_letter', ''),
+                idempotency_key=key
+            )
+        except IntegrityError:
+            applications = JobApplication.objects.filter(applicant=request.user)
+            # A retry is recognised by its key before the job is matched, as
+            # the two may belong to different applications
+            existing = applications.filter(idempotency_key=key).values('id', 'job_id').first() if key else None
+            if existing is not None:
+                if existing['job_id'] != job_id:
+                    return Response(
+                        {'error': 'Idempotency-Key was already used for another job'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                    )
+                # A retry of a request that already succeeded
+                return Response({'message': 'Application submitted successfully', 'id': existing['id']})
+            if not applications.filter(job_id=job_id).exists():
+                raise NotFound()
             return Response(
                 {'error': 'You have already applied for this job'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
-            
-        # Create application
-        JobApplication.objects.create(
-            job=job,
-            applicant=request.user,
-            cover_letter=request.data.get('cover_letter', '')
-        )
         
-        return Response({'message': 'Application submitted successfully'})
+        return Response({'message': 'Application submitted successfully', 'id': application.pk})
 
-class JobApplicationViewSet(viewsets.ModelViewSet):
+class JobApplicationViewSet(ReplicaReadMixin, ProjectionMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     serializer_class = JobApplicationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    replica_actions = ('list', 'retrieve', 'recent', 'stats')
+
+    @cached_property
+    def archived(self):
+        # ?archived=1 reads applications to archived jobs instead
+        return self.action in ARCHIVE_ACTIONS and flag(self.request, 'archived')
+
+    def get_serializer_class(self):
+        return ArchivedJobApplicationSerializer if self.archived else JobApplicationSerializer
 
     def get_queryset(self):
         user = self.request.user
+        model = ArchivedJobApplication if self.archived else JobApplication
         if user.role == 'EMPLOYER':
             # Employers see applications for their jobs
-            return JobApplication.objects.filter(job__employer=user)
+            queryset = model.objects.filter(job__employer=user)
         else:
             # Employees see their own applications
-            return JobApplication.objects.filter(applicant=user).select_related('job', 'job__employer')
+            queryset = model.objects.filter(applicant=user)
+        return queryset.select_related('job__employer__companyprofile')
 
     def perform_create(self, serializer):
         serializer.save(applicant=self.request.user)
@@ -131,17 +398,166 @@ class JobApplicationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        if application.job.employer != request.user:
+        if new_status not in APPLICATION_STATUSES:
+            return Response(
+                {'error': f'Invalid status: {new_status}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if application.job.employer_id != request.user.id:
             return Response(
                 {'error': 'Not authorized to update this application'}, 
                 status=status.HTTP_403_FORBIDDEN
             )
 
         application.status = new_status
-        application.save()
+        application.save(update_fields=['status'])
         serializer = self.get_serializer(application)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def recent(self, request):
+        # The newest ?limit= applications, for dashboards that show a few
+        # next to the counts from stats
+        try:
+            limit = int(request.query_params.get('limit', RECENT_APPLICATION_LIMIT))
+        except ValueError:
+            return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, MAX_RECENT_APPLICATION_LIMIT))
+
+        applications = self.get_queryset().order_by('-applied_date', '-id')[:limit]
+        serializer = self.get_serializer(applications, many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['post'])
+    def bulk_update_status(self, request):
+        if request.user.role != 'EMPLOYER':
+            return Response(
+                {'error': 'Only employers can update application status'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        new_status = request.data.get('status')
+        if new_status not in APPLICATION_STATUSES:
+            return Response(
+                {'error': f'Invalid status: {new_status}' if new_status else 'Status is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        ids = request.data.get('ids')
+        if isinstance(ids, list) and len(ids) > MAX_BULK_UPDATE:
+            return Response(
+                {'error': f'At most {MAX_BULK_UPDATE} applications can be updated at once'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            # Rejects fractional ids rather than truncating them
+            ids = list(dict.fromkeys(APPLICATION_IDS.run_validation(ids)))
+        except serializers.ValidationError:
+            return Response(
+                {'error': 'ids must be a non-empty list of integer application ids'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # One query authorizes every id, one UPDATE changes them all.
+        # Applications of other employers are reported as not found.
+        with transaction.atomic():
+            authorized = set(
+                JobApplication.objects.filter(id__in=ids, job__employer=request.user)
+                .select_for_update()
+                .values_list('id', flat=True)
+            )
+            if authorized:
+                JobApplication.objects.filter(id__in=authorized).update(status=new_status)
+                # update() sends no signals
+                transaction.on_commit(lambda: cache.bump_stats_version(request.user.id))
+
+        return Response({
+            'status': new_status,
+            'updated': len(authorized),
+            'results': [
+                {'id': application_id, 'result': 'updated' if application_id in authorized else 'not_found'}
+                for application_id in ids
+            ],
+        })
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        if request.user.role != 'EMPLOYER':
+            return Response(
+                {'error': 'Only employers can view application statistics'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        try:
+            days = min(max(int(request.query_params.get('days', 7)), 1), 365)
+            deadline_days = min(max(int(request.query_params.get('deadline_days', 7)), 1), 365)
+        except ValueError:
+            return Response(
+                {'error': 'days and deadline_days must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        data = cache.cached_employer_stats(
+            request.user.id,
+            (days, deadline_days),
+            lambda: self.employer_stats(request.user, days, deadline_days)
+        )
+        return Response(data)
+
+    def employer_stats(self, employer, days, deadline_days):
+        now = timezone.now()
+        since = now - timedelta(days=days)
+        statuses = [value for value, _ in JobApplication.STATUS_CHOICES]
+
+        # One query for the jobs themselves, so jobs without applications
+        # still show up ...
+        jobs = {
+            job['id']: {
+                **job,
+                'total': 0,
+                'new': 0,
+                'by_status': dict.fromkeys(statuses, 0),
+            }
+            for job in Job.objects.filter(employer=employer)
+            .values('id', 'title', 'deadline')
+            .order_by('-created_at', '-id')
+        }
+        # ... their application versions, read first so an application saved
+        # while counting leaves the cached stats stale rather than current ...
+        versions = cache.application_versions(jobs)
+        # ... and one GROUP BY over the employer's applications
+        counts = (
+            JobApplication.objects.filter(job__employer=employer)
+            .values('job_id', 'status')
+            .annotate(total=Count('id'), new=Count('id', filter=Q(applied_date__gte=since)))
+            .order_by()
+        )
+
+        totals = {'total': 0, 'new': 0, 'by_status': dict.fromkeys(statuses, 0)}
+        for row in counts:
+            job = jobs.get(row['job_id'])
+            if job is None:
+                continue
+            for bucket in (job, totals):
+                bucket['total'] += row['total']
+                bucket['new'] += row['new']
+                bucket['by_status'][row['status']] = bucket['by_status'].get(row['status'], 0) + row['total']
+
+        closing_soon = [
+            {'id': job['id'], 'title': job['title'], 'deadline': job['deadline']}
+            for job in sorted(jobs.values(), key=lambda job: job['deadline'])
+            if now <= job['deadline'] <= now + timedelta(days=deadline_days)
+        ]
+
+        return {
+            'days': days,
+            'deadline_days': deadline_days,
+            'totals': totals,
+            'jobs': list(jobs.values()),
+            'closing_soon': closing_soon,
+        }, versions
+
     @action(detail=True, methods=['post'])
     def withdraw(self, request, pk=None):
         application = self.get_object()
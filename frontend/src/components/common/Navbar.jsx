@@ -115,7 +115,7 @@ const Navbar = () => {
                 color="inherit"
               >
                 <Avatar 
-                  src={user.profile_image ? `/media/${user.profile_image}` : undefined}
+                  src={user.profile_thumbnails?.small || (user.profile_image ? `/media/${user.profile_image}` : undefined)}
                   sx={{ 
                     width: 32, 
                     height: 32,
@@ -9,18 +9,22 @@ const EmployerDashboard = () => {
   const navigate = useNavigate();
   const [postedJobs, setPostedJobs] = useState([]);
   const [applications, setApplications] = useState([]);
+  const [stats, setStats] = useState(null);
   const [loading, setLoading] = useState(true);
   const [hasCompanyProfile, setHasCompanyProfile] = useState(false);
 
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const [jobsResponse, applicationsResponse] = await Promise.all([
+        const [jobsResponse, applicationsResponse, statsResponse] = await Promise.all([
           api.get('/jobs/my_jobs/'),
-          api.get('/applications/')
+          // Only the few shown; per-job counts come from the stats
+          api.get('/applications/recent/?limit=5'),
+          api.get('/applications/stats/')
         ]);
         setPostedJobs(jobsResponse.data);
         setApplications(applicationsResponse.data);
+        setStats(statsResponse.data);
       } catch (error) {
         console.error('Error fetching data:', error);
       } finally {
@@ -53,13 +57,15 @@ const EmployerDashboard = () => {
         status: newStatus
       });
       // Refresh applications
-      const response = await api.get('/jobs/applications/');
+      const response = await api.get('/applications/recent/?limit=5');
       setApplications(response.data);
     } catch (error) {
       console.error('Error updating status:', error);
     }
   };
 
+  const jobStats = (jobId) => stats?.jobs.find((job) => job.id === jobId);
+
   if (loading) {
     return <div>Loading...</div>;
   }
@@ -114,7 +120,10 @@ const EmployerDashboard = () => {
               <CardContent>
                 <Typography variant="h6">{job.title}</Typography>
                 <Typography color="textSecondary">{job.location}</Typography>
-                <Typography>Applications: {job.applications_count}</Typography>
+                <Typography>Applications: {jobStats(job.id)?.total ?? 0}</Typography>
+                <Typography color="textSecondary">
+                  New this week: {jobStats(job.id)?.new ?? 0}
+                </Typography>
                 <Box sx={{ mt: 1 }}>
                   <Chip 
                     label={job.is_active ? 'Active' : 'Closed'} 
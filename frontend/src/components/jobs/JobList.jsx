@@ -9,6 +9,8 @@ import api from '../../utils/api';
 const JobList = () => {
   const { user } = useAuth();
   const [jobs, setJobs] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
+  const [facets, setFacets] = useState({ job_type: [] });
   const [loading, setLoading] = useState(true);
   const [filters, setFilters] = useState({
     job_type: '',
@@ -37,8 +39,13 @@ const JobList = () => {
         url += `?${params.toString()}`;
       }
 
-      const response = await api.get(url);
-      setJobs(response.data);
+      const [response, facetsResponse] = await Promise.all([
+        api.get(url),
+        api.get(`/jobs/facets/?${params.toString()}`)
+      ]);
+      setJobs(response.data.results);
+      setNextPage(response.data.next);
+      setFacets(facetsResponse.data);
     } catch (error) {
       console.error('Error fetching jobs:', error);
     } finally {
@@ -46,6 +53,21 @@ const JobList = () => {
     }
   };
 
+  const loadMore = async () => {
+    try {
+      const response = await api.get(nextPage);
+      setJobs([...jobs, ...response.data.results]);
+      setNextPage(response.data.next);
+    } catch (error) {
+      console.error('Error fetching jobs:', error);
+    }
+  };
+
+  const jobTypeCount = (value) => {
+    const facet = facets.job_type.find((item) => item.value === value);
+    return facet ? facet.count : 0;
+  };
+
   const handleApply = async (jobId) => {
     try {
       await api.post(`/jobs/${jobId}/apply/`, {
@@ -87,7 +109,7 @@ const JobList = () => {
               <MenuItem value="">All Types</MenuItem>
               {jobTypes.map((type) => (
                 <MenuItem key={type.value} value={type.value}>
-                  {type.label}
+                  {type.label} ({jobTypeCount(type.value)})
                 </MenuItem>
               ))}
             </TextField>
@@ -152,6 +174,14 @@ const JobList = () => {
           </Grid>
         ))}
       </Grid>
+
+      {nextPage && (
+        <Box sx={{ display: 'flex', justifyContent: 'center', my: 4 }}>
+          <Button variant="outlined" onClick={loadMore}>
+            Load More
+          </Button>
+        </Box>
+      )}
     </Container>
   );
 };